@@ -1876,11 +1876,24 @@ import csv
 import math
 import sqlite3
 import logging
+import functools
+import gzip
+import hashlib
+import hmac
+import mimetypes
+import time
+import zlib
 from io import StringIO
 from pytz import timezone
-import uuid
 from datetime import datetime, date
-from database import Database
+from assets import AssetManifest, is_fingerprinted
+from database import Database, day_range, epoch_range, format_epochs
+from errorlog import ErrorLog
+from filestore import FileStore
+import images
+import instrumentation
+from querylog import SlowQueryLog
+import werkzeug.utils
 from werkzeug.utils import secure_filename
 from flask import (
     Flask,
@@ -1889,12 +1902,14 @@ from flask import (
     render_template,
     request,
     redirect,
+    send_file,
     send_from_directory,
     url_for,
     session,
     flash,
     jsonify,
     abort,
+    has_request_context,
 )
 from werkzeug.exceptions import HTTPException
 import traceback
@@ -1905,79 +1920,99 @@ app = Flask(__name__)
 app.secret_key = "your-secret-key-change-this-in-production"
 app.config["SECRET_KEY"] = "your-secret-key-here"
 
-# # Error logging setup
-# ERROR_FILE = "errors.json"
-
-
-# def log_error_to_json(error_data):
-#     """
-#     Append error details to errors.json in the main folder.
-#     """
-#     # Check if file exists; if not, create with empty list
-#     if not os.path.exists(ERROR_FILE):
-#         with open(ERROR_FILE, "w") as f:
-#             json.dump([], f)
-
-#     # Load existing errors
-#     with open(ERROR_FILE, "r") as f:
-#         try:
-#             errors = json.load(f)
-#         except json.JSONDecodeError:
-#             errors = []
-
-#     # Append new error
-#     errors.append(error_data)
-
-#     # Save back to file
-#     with open(ERROR_FILE, "w") as f:
-#         json.dump(errors, f, indent=4)
-
-
-# @app.errorhandler(Exception)
-# def handle_exception(e):
-#     """
-#     Global exception handler for all Flask routes.
-#     """
-#     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-#     # HTTP exceptions
-#     if isinstance(e, HTTPException):
-#         error_data = {
-#             "timestamp": timestamp,
-#             "type": "HTTPException",
-#             "error": e.name,
-#             "description": e.description,
-#             "code": e.code,
-#         }
-#         log_error_to_json(error_data)
-#         return jsonify(error_data), e.code
-
-#     # Non-HTTP exceptions
-#     error_data = {
-#         "timestamp": timestamp,
-#         "type": type(e).__name__,
-#         "error": str(e),
-#         "traceback": traceback.format_exc(),
-#         "code": 500,
-#     }
-#     log_error_to_json(error_data)
-#     return jsonify(
-#         {
-#             "error": "Internal Server Error",
-#             "description": "An unexpected error occurred. Check errors.json for details.",
-#             "code": 500,
-#         }
-#     ), 500
-
-
 # Initialize database
-db = Database()
+# One long-lived connection per worker thread; set DB_POOL_SIZE=0 to open a
+# fresh connection per call instead.
+app.config["DB_POOL_SIZE"] = int(os.environ.get("DB_POOL_SIZE", 8))
+# PRAGMA profile applied to every connection: dev, prod or bulk-load.
+app.config["DB_PROFILE"] = os.environ.get("DB_PROFILE", "prod")
+# Apply pending schema migrations at boot; with 0, boot refuses to start on an
+# outdated schema and `python -m migrations upgrade` has to be run first.
+app.config["DB_AUTO_MIGRATE"] = os.environ.get("DB_AUTO_MIGRATE", "1") == "1"
+# Seconds a listing's total row count is reused for the same filters while
+# paging; 0 recounts on every page.
+app.config["DB_COUNT_CACHE_TTL"] = float(os.environ.get("DB_COUNT_CACHE_TTL", 5))
+# Wiki page views are queued in memory and inserted in batches every
+# WIKI_VIEW_FLUSH_MS (or once WIKI_VIEW_BATCH are waiting); 0 inserts each view
+# synchronously. At most WIKI_VIEW_MAX_PENDING views are buffered per worker.
+app.config["WIKI_VIEW_FLUSH_MS"] = int(os.environ.get("WIKI_VIEW_FLUSH_MS", 500))
+app.config["WIKI_VIEW_BATCH"] = int(os.environ.get("WIKI_VIEW_BATCH", 200))
+app.config["WIKI_VIEW_MAX_PENDING"] = int(os.environ.get("WIKI_VIEW_MAX_PENDING", 10000))
+# Employee/project/type/category lookups are cached in-process and
+# revalidated against per-table version counters on every call.
+app.config["REFERENCE_CACHE"] = os.environ.get("REFERENCE_CACHE", "1") == "1"
+# Timestamps are stored in UTC and shown, and filtered by day, in this zone.
+app.config["DISPLAY_TZ"] = os.environ.get("DISPLAY_TZ", "Asia/Kolkata")
+display_tz = timezone(app.config["DISPLAY_TZ"])
+# HTML, JSON and CSV responses of at least GZIP_MIN_SIZE bytes are gzipped at
+# GZIP_LEVEL (1-9) for clients that accept it; 0 turns compression off.
+# Static files are sent from the .gz copies `python assets.py build` writes.
+app.config["GZIP_LEVEL"] = int(os.environ.get("GZIP_LEVEL", 6))
+app.config["GZIP_MIN_SIZE"] = int(os.environ.get("GZIP_MIN_SIZE", 1024))
+db = Database(
+    pool_size=app.config["DB_POOL_SIZE"],
+    profile=app.config["DB_PROFILE"],
+    auto_migrate=app.config["DB_AUTO_MIGRATE"],
+    count_cache_ttl=app.config["DB_COUNT_CACHE_TTL"],
+    view_flush_ms=app.config["WIKI_VIEW_FLUSH_MS"],
+    view_batch_size=app.config["WIKI_VIEW_BATCH"],
+    view_max_pending=app.config["WIKI_VIEW_MAX_PENDING"],
+    reference_cache=app.config["REFERENCE_CACHE"],
+)
+db.init_app(app)
+
+# Wall time, SQL statements, SQL time and rows fetched per request (see
+# instrumentation.py), exported at /admin/metrics. With SERVER_TIMING=1 the
+# numbers of each response are also sent in a Server-Timing header.
+app.config["REQUEST_METRICS"] = os.environ.get("REQUEST_METRICS", "1") == "1"
+app.config["SERVER_TIMING"] = os.environ.get("SERVER_TIMING", "0") == "1"
+# Lets a Prometheus scraper read /admin/metrics with "Authorization: Bearer <token>".
+app.config["METRICS_TOKEN"] = os.environ.get("METRICS_TOKEN", "")
+metrics = instrumentation.Metrics()
+# Statements taking at least this many ms, from execute to the last row
+# fetched, are logged with their query plan and listed at /admin/slow_queries
+# (see querylog.py). 0 turns the slow query log off.
+app.config["SLOW_QUERY_MS"] = float(os.environ.get("SLOW_QUERY_MS", 100))
+if app.config["SLOW_QUERY_MS"] > 0:
+    instrumentation.slow_queries = SlowQueryLog(app.config["SLOW_QUERY_MS"])
+
+
+@app.before_request
+def start_request_stats():
+    if app.config["REQUEST_METRICS"]:
+        instrumentation.begin()
+
+
+def finish_request_stats(endpoint, status):
+    stats = instrumentation.end()
+    if stats is not None:
+        metrics.observe(endpoint, status, stats.elapsed, stats)
+
+
+# Registered before the other after_request hooks, so it runs after them.
+@app.after_request
+def record_request_stats(response):
+    stats = instrumentation.current()
+    if stats is None:
+        return response
+    if app.config["SERVER_TIMING"]:
+        response.headers["Server-Timing"] = instrumentation.server_timing(stats, stats.elapsed)
+    endpoint = request.endpoint or "unmatched"
+    if response.is_streamed:
+        # Exports run their queries while the body is sent: count those too.
+        response.call_on_close(
+            functools.partial(finish_request_stats, endpoint, response.status_code)
+        )
+    else:
+        finish_request_stats(endpoint, response.status_code)
+    return response
+
 
 # Configuration
 POLICIES_FOLDER = "policies"
 UPLOAD_FOLDER = "static/bngImg"
 INVOICE_FOLDER = "static/invoices"
-WIKI_CAT_FOLDER = "static/wiki_categories"
+WIKI_CAT_FOLDER = "static/wikiCatImg"
 DATABASE_PATH = "project_tracking.db"
 
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
@@ -1989,6 +2024,27 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(INVOICE_FOLDER, exist_ok=True)
 os.makedirs(WIKI_CAT_FOLDER, exist_ok=True)
 
+# Invoices and policy PDFs, stored once per distinct content under their
+# SHA-256 (see filestore.py).
+app.config["FILE_STORE"] = os.environ.get("FILE_STORE", "files")
+file_store = FileStore(app.config["FILE_STORE"], db)
+# Browsers may reuse a downloaded invoice or policy this long before
+# revalidating it against its hash.
+STORED_FILE_MAX_AGE = 3600
+# Who sends the bytes of a stored file once the view has checked access:
+# "direct" streams it from this worker; "x-accel" (nginx) and "x-sendfile"
+# (Apache mod_xsendfile, lighttpd) return headers only and let the front
+# server send the file, so a download doesn't hold a worker thread.
+FILE_DELIVERY_MODES = ("direct", "x-accel", "x-sendfile")
+app.config["FILE_DELIVERY"] = os.environ.get("FILE_DELIVERY", "direct")
+if app.config["FILE_DELIVERY"] not in FILE_DELIVERY_MODES:
+    raise ValueError(f"FILE_DELIVERY must be one of {', '.join(FILE_DELIVERY_MODES)}")
+# Internal nginx location aliased to FILE_STORE, for "x-accel".
+app.config["FILE_ACCEL_PREFIX"] = os.environ.get("FILE_ACCEL_PREFIX", "/_files/")
+
+# Thumbnail and card-sized copies of uploaded images, encoded in the background.
+image_derivatives = images.DerivativeWorker()
+
 # Constants
 ALLOWED_EXTENSIONS = {"pdf"}
 
@@ -1996,6 +2052,38 @@ ALLOWED_EXTENSIONS = {"pdf"}
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Errors logged anywhere in the app, including the unhandled exceptions Flask
+# reports, are appended to a JSON Lines file by a background thread and
+# repeats are folded into counts (see errorlog.py). Browse them at /admin/errors.
+app.config["ERROR_LOG"] = os.environ.get("ERROR_LOG", "errors.jsonl")
+# Rotate at this size, keeping ERROR_LOG_BACKUPS older files.
+app.config["ERROR_LOG_MAX_BYTES"] = int(os.environ.get("ERROR_LOG_MAX_BYTES", 5 * 1024 * 1024))
+app.config["ERROR_LOG_BACKUPS"] = int(os.environ.get("ERROR_LOG_BACKUPS", 5))
+# Seconds during which repeats of an error are only counted.
+app.config["ERROR_LOG_WINDOW"] = int(os.environ.get("ERROR_LOG_WINDOW", 60))
+
+
+def error_context():
+    """Request details recorded with every error."""
+    if not has_request_context():
+        return None
+    return {
+        "method": request.method,
+        "path": request.path,
+        "endpoint": request.endpoint,
+        "user_id": session.get("user_id"),
+    }
+
+
+error_log = ErrorLog(
+    app.config["ERROR_LOG"],
+    max_bytes=app.config["ERROR_LOG_MAX_BYTES"],
+    backups=app.config["ERROR_LOG_BACKUPS"],
+    window=app.config["ERROR_LOG_WINDOW"],
+    context=error_context,
+)
+logging.getLogger().addHandler(error_log.handler)
+
 
 def ensure_policies_folder():
     """Create the policies folder if it doesn't exist."""
@@ -2013,21 +2101,258 @@ def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def generate_unique_filename(original_filename):
-    """Generate a unique filename with timestamp prefix."""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    unique_id = str(uuid.uuid4())[:8]
-    file_extension = os.path.splitext(original_filename)[1]
-    return f"{timestamp}_{unique_id}{file_extension}"
+def send_stored_file(sha256, name, as_attachment=False):
+    """
+    Send a file from the store with its hash as strong ETag; conditional and
+    Range requests are answered with 304 and 206 responses. With an offloading
+    FILE_DELIVERY the body is left to the front server, which also answers
+    Range requests.
+    """
+    path = file_store.path(sha256)
+    if not os.path.isfile(path):
+        abort(404)
+    mode = app.config["FILE_DELIVERY"]
+    if mode == "direct":
+        response = send_file(
+            path,
+            mimetype=mimetypes.guess_type(name)[0] or "application/octet-stream",
+            as_attachment=as_attachment,
+            download_name=name,
+            etag=sha256,
+            max_age=STORED_FILE_MAX_AGE,
+        )
+    else:
+        response = werkzeug.utils.send_file(
+            path,
+            request.environ,
+            mimetype=mimetypes.guess_type(name)[0] or "application/octet-stream",
+            as_attachment=as_attachment,
+            download_name=name,
+            etag=sha256,
+            max_age=STORED_FILE_MAX_AGE,
+            use_x_sendfile=True,
+            response_class=app.response_class,
+            conditional=False,
+        )
+        response.headers.pop("X-Sendfile")
+        if mode == "x-accel":
+            response.headers["X-Accel-Redirect"] = (
+                app.config["FILE_ACCEL_PREFIX"] + FileStore.relative(sha256)
+            )
+        else:
+            response.headers["X-Sendfile"] = path
+        # The front server sets the length of the body it sends; without one
+        # in front, the client gets an empty body rather than a hung request.
+        response.content_length = 0
+        response = response.make_conditional(request.environ)
+        if response.status_code == 304:
+            response.headers.pop("X-Accel-Redirect", None)
+            response.headers.pop("X-Sendfile", None)
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.expires = None
+    return response
 
 
 def get_db_connection():
     """Get database connection."""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = db.connect()
     conn.row_factory = sqlite3.Row
     return conn
 
 
+@app.template_global()
+def page_url(**changes):
+    """URL of the current page with some query arguments replaced or dropped."""
+    args = request.args.to_dict()
+    args.update(changes)
+    args = {k: v for k, v in args.items() if v not in (None, "")}
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+
+# Fingerprinted static files (`python assets.py build`); their URLs change
+# with their content, so browsers may keep them for a year.
+asset_manifest = AssetManifest(app.static_folder)
+STATIC_MAX_AGE = 365 * 24 * 3600
+COMPRESSIBLE_TYPES = {
+    "text/html", "text/css", "text/csv", "text/plain", "text/javascript",
+    "application/javascript", "application/json", "image/svg+xml",
+    "image/vnd.microsoft.icon", "font/ttf",
+}
+
+
+@app.template_global()
+def static_url(filename):
+    """
+    URL of a static file: its fingerprinted copy once built, else the file
+    itself, or the upstream URL of a vendored file not downloaded yet.
+    """
+    path, upstream = asset_manifest.resolve(filename)
+    if path is None and upstream:
+        return upstream
+    return url_for("static", filename=path or filename)
+
+
+@app.template_global()
+def has_static(filename):
+    return asset_manifest.resolve(filename)[0] is not None
+
+
+@app.template_global()
+def image_variants(folder, filename, size):
+    """
+    ``(webp URL or None, fallback URL)`` of an uploaded image at one of
+    ``images.SIZES``; the original until its derivatives are built.
+    """
+    webp, fallback = images.variants(os.path.join(app.static_folder, folder, filename), size)
+
+    def url(path):
+        return url_for("static", filename=os.path.relpath(path, app.static_folder).replace(os.sep, "/"))
+
+    return (url(webp) if webp else None), url(fallback)
+
+
+@app.after_request
+def cache_fingerprinted_static(response):
+    if request.endpoint == "static" and is_fingerprinted(request.view_args["filename"]):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = STATIC_MAX_AGE
+        response.cache_control.immutable = True
+    return response
+
+
+def accepts_gzip():
+    return app.config["GZIP_LEVEL"] > 0 and request.accept_encodings["gzip"] > 0
+
+
+def send_static_file(filename):
+    """Static files, from their precompressed ``.gz`` copy when there is one."""
+    mimetype = mimetypes.guess_type(filename)[0]
+    if mimetype in COMPRESSIBLE_TYPES and accepts_gzip():
+        source = os.path.join(app.static_folder, filename)
+        try:
+            fresh = os.path.getmtime(source + ".gz") >= os.path.getmtime(source)
+        except OSError:
+            fresh = False
+        if fresh:
+            response = send_from_directory(
+                app.static_folder, filename + ".gz", mimetype=mimetype,
+                max_age=app.get_send_file_max_age(filename),
+            )
+            response.content_encoding = "gzip"
+            response.vary.add("Accept-Encoding")
+            return response
+    response = app.send_static_file(filename)
+    if mimetype in COMPRESSIBLE_TYPES:
+        response.vary.add("Accept-Encoding")
+    return response
+
+
+app.view_functions["static"] = send_static_file
+
+
+def gzip_stream(chunks, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+@app.after_request
+def compress_response(response):
+    if (
+        response.mimetype not in COMPRESSIBLE_TYPES
+        or response.status_code != 200
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    if not accepts_gzip():
+        return response
+
+    level = app.config["GZIP_LEVEL"]
+    if response.is_streamed:
+        # Exports: compress chunk by chunk, the size is not known up front.
+        response.response = gzip_stream(response.iter_encoded(), level)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < app.config["GZIP_MIN_SIZE"]:
+            return response
+        response.set_data(gzip.compress(data, level, mtime=0))
+    response.content_encoding = "gzip"
+    # The compressed bytes differ from the ones the ETag was made for.
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+# Newest template or code file of this release; part of every validator so
+# a deploy never answers 304 for a page rendered by the previous one.
+def release_stamp():
+    template_dir = os.path.join(app.root_path, app.template_folder)
+    paths = [os.path.join(root, name) for root, _, files in os.walk(template_dir) for name in files]
+    paths += [os.path.join(app.root_path, name) for name in ("app.py", "database.py")]
+    return int(max(os.path.getmtime(path) for path in paths))
+
+
+RELEASE_STAMP = release_stamp()
+
+
+def conditional(*tables):
+    """
+    Answer conditional GETs for a session-scoped view from the version
+    stamps of ``tables`` (see Database.table_versions). The ETag covers the
+    URL, the signed-in user and the table versions; when ``If-None-Match``
+    (or, without it, ``If-Modified-Since``) matches, a 304 is sent before the
+    view runs, so neither its queries nor its template are evaluated.
+    Responses are ``private`` and vary on the session cookie. Requests with
+    pending flash messages always get a full page.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != "GET" or "user_id" not in session or session.get("_flashes"):
+                return view(*args, **kwargs)
+
+            versions, modified = db.table_versions(tables)
+            scope = (RELEASE_STAMP, request.full_path, session["user_id"], session.get("emp_type"))
+            etag = hashlib.sha1(repr((scope, versions)).encode()).hexdigest()
+            modified = max(modified, RELEASE_STAMP)
+
+            if request.if_none_match:
+                fresh = request.if_none_match.contains_weak(etag)
+            else:
+                since = request.if_modified_since
+                fresh = since is not None and modified <= since.timestamp()
+
+            if fresh:
+                response = app.response_class(status=304)
+            else:
+                response = app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            # A write later in the same second would not move a one-second
+            # Last-Modified; leave it to the ETag until the second is over.
+            if modified < int(time.time()):
+                response.last_modified = modified
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            response.vary.add("Cookie")
+            return response
+
+        return wrapper
+
+    return decorator
+
+
 @app.template_filter("todate")
 def todate(value):
     """
@@ -2099,7 +2424,6 @@ def logout():
 
 @app.route("/admin/dashboard")
 def admin_dashboard():
-    print(session)
     if "user_id" not in session or session["emp_type"] != "admin":
         return redirect(url_for("login"))
 
@@ -2318,20 +2642,24 @@ def add_project():
 
 
 @app.route("/admin/view_tasks")
+@conditional("tbl_task", "tbl_project", "tbl_employee")
 def view_tasks():
     if "user_id" not in session or session["emp_type"] != "admin":
         return redirect(url_for("login"))
 
-    # Pagination parameters
-    page = int(request.args.get("page", 1))
+    # Cursor pagination; "page" only numbers the page for display
+    cursor = request.args.get("cursor")
+    page = int(request.args.get("page", 1)) if cursor else 1
     page_size = 10
     project_filter = request.args.get("project_filter", "")
     status_filter = request.args.get("status_filter", "")
     employee_filter = request.args.get("employee_filter", "")
 
-    # Get paginated tasks and total task count
-    tasks, total_tasks = db.get_all_tasks_with_details_paginated(
-        page, page_size, project_filter, status_filter, employee_filter
+    # Get one page of tasks and total task count
+    tasks, total_tasks, next_cursor, prev_cursor = (
+        db.get_all_tasks_with_details_keyset(
+            page_size, cursor, project_filter, status_filter, employee_filter
+        )
     )
     employees = db.get_employees()
     projects = db.get_projects()
@@ -2348,6 +2676,8 @@ def view_tasks():
         page_size=page_size,
         total_tasks=total_tasks,
         total_pages=total_pages,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor,
         project_filter=project_filter,
         status_filter=status_filter,
         employee_filter=employee_filter,
@@ -2600,6 +2930,7 @@ def edit_task_detail(detail_id):
 
 
 @app.route("/api/task_details/<int:task_id>")
+@conditional("tbl_task", "tbl_task_details")
 def get_task_details(task_id):
     try:
         if "user_id" not in session:
@@ -2714,8 +3045,11 @@ def delete_leave_type(lt_id):
     if "user_id" not in session or session["emp_type"] != "admin":
         return redirect(url_for("login"))
 
-    db.delete_leave_type(lt_id)
-    flash("Leave type deleted", "success")
+    try:
+        db.delete_leave_type(lt_id)
+        flash("Leave type deleted", "success")
+    except Exception as e:
+        flash(str(e), "error")
     return redirect(url_for("admin_leave_types"))
 
 
@@ -2762,11 +3096,13 @@ def employee_celebrations():
 
 
 @app.route("/admin/leave_requests")
+@conditional("tbl_leave_request", "tbl_leave_type", "tbl_employee")
 def admin_leave_requests():
     if "user_id" not in session or session["emp_type"] != "admin":
         return redirect(url_for("login"))
 
-    # Pagination
+    # Pagination: newest-first listings page by cursor, other sorts by offset
+    cursor = request.args.get("cursor")
     page = int(request.args.get("page", 1))
     per_page = 10
     offset = (page - 1) * per_page
@@ -2796,7 +3132,17 @@ def admin_leave_requests():
     }
 
     # Get filtered and sorted results
-    requests, total = db.get_leave_requests_with_advanced_filters(**filters)
+    keyset = sort_by == "inserted_date" and sort_order.upper() != "ASC"
+    next_cursor = prev_cursor = None
+    if keyset:
+        if not cursor:
+            page = 1
+        del filters["sort_by"], filters["sort_order"], filters["offset"]
+        requests, total, next_cursor, prev_cursor = db.get_leave_requests_keyset(
+            cursor=cursor, **filters
+        )
+    else:
+        requests, total = db.get_leave_requests_with_advanced_filters(**filters)
     total_pages = math.ceil(total / per_page)
 
     # Get options for dropdowns
@@ -2809,6 +3155,9 @@ def admin_leave_requests():
         page=page,
         total_pages=total_pages,
         total_requests=total,
+        keyset=keyset,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor,
         employees=employees,
         leave_types=leave_types,
         # Pass current filter values back to template
@@ -2856,7 +3205,6 @@ def employee_leave():
 
     leave_types = db.get_leave_types()
     my_requests = db.get_leave_requests("WHERE lr.employee_id=?", (session["user_id"],))
-    print(my_requests)
     today_iso = date.today().isoformat()  # ← new
 
     return render_template(
@@ -2880,6 +3228,7 @@ def delete_leave_request(request_id):
 @app.route("/employee/delete_expense/<int:expense_id>", methods=["POST"])
 def delete_expense(expense_id):
     db.delete_expense(expense_id)
+    file_store.collect()
     flash("Expense deleted", "success")
     return redirect(url_for("existing_expenses"))
 
@@ -2915,8 +3264,11 @@ def delete_expense_type(et_id):
     if "user_id" not in session or session["emp_type"] != "admin":
         return redirect(url_for("login"))
 
-    db.delete_expense_type(et_id)
-    flash("Expense type deleted", "success")
+    try:
+        db.delete_expense_type(et_id)
+        flash("Expense type deleted", "success")
+    except Exception as e:
+        flash(str(e), "error")
     return redirect(url_for("admin_expense_types"))
 
 
@@ -2949,13 +3301,13 @@ def expense():
             else session["user_id"]
         )
 
-        invoice_path = None
+        # invoice_path keeps the uploaded name; the content is in file_store
+        invoice_path = invoice_sha256 = None
         if "invoice_file" in request.files:
             file = request.files["invoice_file"]
             if file and file.filename:
-                filename = secure_filename(file.filename)
-                invoice_path = os.path.join(INVOICE_FOLDER, filename).replace("\\", "/")
-                file.save(invoice_path)
+                invoice_path = secure_filename(file.filename) or "invoice"
+                invoice_sha256, _ = file_store.save(file.stream)
 
         data = {
             "expense_type_id": request.form["expense_type_id"],
@@ -2970,6 +3322,7 @@ def expense():
         }
 
         data["invoice_path"] = invoice_path
+        data["invoice_sha256"] = invoice_sha256
         db.add_expense(data)
         flash("Expense submitted", "success")
         return redirect(url_for("existing_expenses"))
@@ -2983,15 +3336,29 @@ def expense():
     return render_template("expense.html", types=types_, employees=employees)
 
 
-@app.route("/existing_expenses")
-def existing_expenses():
+@app.route("/expense/<int:exp_id>/invoice")
+def expense_invoice(exp_id):
     if "user_id" not in session:
         return redirect(url_for("login"))
 
-    page = int(request.args.get("page", 1))
-    per_page = 15
-    offset = (page - 1) * per_page
+    row = db.get_expense_invoice(exp_id)
+    if not row or not row[1]:
+        abort(404)
+    employee_id, name, sha256 = row
+    if session["emp_type"] != "admin" and employee_id != session["user_id"]:
+        abort(403)
+    if sha256:
+        return send_stored_file(sha256, name)
+    # Uploaded before the file store: a path under static/invoices
+    return send_from_directory(INVOICE_FOLDER, os.path.basename(name))
 
+
+def expense_filters():
+    """
+    WHERE clause and params for the expense listing filters in the query
+    string. Admins filter by employee, type, status and date range;
+    employees only ever see their own expenses.
+    """
     filters = []
     params = []
 
@@ -3001,8 +3368,6 @@ def existing_expenses():
     from_date = request.args.get("from_date", "").strip()
     to_date = request.args.get("to_date", "").strip()
 
-    ist = timezone("Asia/Kolkata")  # IST timezone
-
     if session["emp_type"] == "admin":
         if employee_id:
             filters.append("ex.employee_id = ?")
@@ -3010,77 +3375,48 @@ def existing_expenses():
         if expense_type:
             filters.append("et.expense_type = ?")
             params.append(expense_type)
-        if status:
-            filters.append("ex.status = ?")
-            params.append(status)
-        if from_date:
-            filters.append("DATE(ex.inserted_date) >= ?")
-            params.append(from_date)
-        if to_date:
-            filters.append("DATE(ex.inserted_date) <= ?")
-            params.append(to_date)
-
-        where_clause = "WHERE " + " AND ".join(filters) if filters else ""
-        total = db.count_expenses(where_clause, tuple(params))
-        expenses = db.get_expenses_paginated(
-            where_clause, tuple(params), per_page, offset
-        )
-
-        expense_types = db.get_expense_types()
-        employees = db.get_employees(status_filter="active")
     else:
-        base = "WHERE ex.employee_id = ?"
-        params = [session["user_id"]]
-
-        if status:
-            base += " AND ex.status = ?"
-            params.append(status)
-        if from_date:
-            base += " AND DATE(ex.inserted_date) >= ?"
-            params.append(from_date)
-        if to_date:
-            base += " AND DATE(ex.inserted_date) <= ?"
-            params.append(to_date)
-
-        total = db.count_expenses(base, tuple(params))
-        expenses = db.get_expenses_paginated(base, tuple(params), per_page, offset)
+        filters.append("ex.employee_id = ?")
+        params.append(session["user_id"])
+    if status:
+        filters.append("ex.status = ?")
+        params.append(status)
+    bounds, bound_params = epoch_range("ex.inserted_ts", from_date, to_date, display_tz)
+    filters += bounds
+    params += bound_params
 
-        expense_types = []
-        employees = []
+    where_clause = "WHERE " + " AND ".join(filters) if filters else ""
+    return where_clause, tuple(params)
 
-    # Indices from your table structure
-    IDX_INSERTED_DATE = 7
-    IDX_APPROVED_DATE = 10
 
-    # Convert tuple → list and adjust date/time
-    converted_expenses = []
-    for e in expenses:
-        e = list(e)  # Make it mutable
+@app.route("/existing_expenses")
+def existing_expenses():
+    if "user_id" not in session:
+        return redirect(url_for("login"))
 
-        try:
-            if e[IDX_INSERTED_DATE]:
-                utc_time = datetime.fromisoformat(e[IDX_INSERTED_DATE])
-                e[IDX_INSERTED_DATE] = utc_time.astimezone(ist).strftime(
-                    "%Y-%m-%d %H:%M:%S"
-                )
-        except Exception:
-            pass
+    # Cursor pagination; "page" only numbers the page for display
+    cursor = request.args.get("cursor")
+    page = int(request.args.get("page", 1)) if cursor else 1
+    per_page = 15
 
-        try:
-            if e[IDX_APPROVED_DATE]:
-                utc_time = datetime.fromisoformat(e[IDX_APPROVED_DATE])
-                e[IDX_APPROVED_DATE] = utc_time.astimezone(ist).strftime(
-                    "%Y-%m-%d %H:%M:%S"
-                )
-            else:
-                e[IDX_APPROVED_DATE] = "Not set"
-        except Exception:
-            e[IDX_APPROVED_DATE] = "Not set"
+    status = request.args.get("status", "").strip()
+
+    where_clause, params = expense_filters()
+    expenses, total, next_cursor, prev_cursor = db.get_expenses_keyset(
+        where_clause, params, per_page, cursor
+    )
+
+    if session["emp_type"] == "admin":
+        expense_types = db.get_expense_types()
+        employees = db.get_employees(status_filter="active")
+    else:
+        expense_types = []
+        employees = []
 
-        converted_expenses.append(e)
+    # inserted (7) and approved (10) are epoch seconds
+    converted_expenses = format_epochs(expenses, (7, 10), display_tz, missing="Not set")
 
     total_pages = math.ceil(total / per_page)
-    print(converted_expenses)
 
     return render_template(
         "existing_expenses.html",
@@ -3090,6 +3426,8 @@ def existing_expenses():
         page=page,
         status=status,
         total_pages=total_pages,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor,
     )
 
 
@@ -3098,51 +3436,62 @@ def export_expenses():
     if "user_id" not in session or session["emp_type"] != "admin":
         return redirect(url_for("login"))
 
-    expenses = db.get_expenses()  # Use all data, no filter
-
-    # Create CSV in memory
-    output = StringIO()
-    writer = csv.writer(output)
-
-    # Header row
-    writer.writerow(
-        [
-            "SlNo",
-            "ExpType",
-            "ExpnDate",
-            "Amt",
-            "Name",
-            "ReqDate",
-            "Status",
-            "ApprovedBy",
-            "Comments",
-        ]
-    )
+    # Same filters as the listing; rows are streamed a batch at a time
+    where_clause, params = expense_filters()
+
+    def generate():
+        output = StringIO()
+        writer = csv.writer(output)
 
-    for i, ex in enumerate(expenses, start=1):
+        # Header row
         writer.writerow(
             [
-                i,
-                ex[1],  # ExpType
-                ex[11] or "",  # ExpnDate
-                ex[8],  # Amount
-                ex[2],  # Name
-                ex[7],  # ReqDate
-                ex[4],  # Status
-                ex[12] if len(ex) > 12 else "",  # ApprovedBy (added to SELECT)
-                ex[5] or "",  # Comments
+                "SlNo",
+                "ExpType",
+                "ExpnDate",
+                "Amt",
+                "Name",
+                "ReqDate",
+                "Status",
+                "ApprovedBy",
+                "Comments",
             ]
         )
 
-    # Send response
+        i = 0
+        for rows in db.iter_expenses(where_clause, params):
+            # inserted (7) and approved (10) are epoch seconds
+            for ex in format_epochs(rows, (7, 10), display_tz):
+                i += 1
+                writer.writerow(
+                    [
+                        i,
+                        ex[1],  # ExpType
+                        ex[12] or "",  # ExpnDate
+                        ex[8],  # Amount
+                        ex[2],  # Name
+                        ex[7],  # ReqDate
+                        ex[4],  # Status
+                        ex[11] or "",  # ApprovedBy
+                        ex[5] or "",  # Comments
+                    ]
+                )
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate(0)
+        if output.tell():
+            yield output.getvalue()
+
     return Response(
-        output.getvalue(),
+        generate(),
         mimetype="text/csv",
         headers={"Content-Disposition": "attachment; filename=expenses_export.csv"},
     )
 
 
+
 @app.route("/api/expense/<int:exp_id>")
+@conditional("tbl_expenses", "tbl_expense_type", "tbl_employee")
 def get_expense_detail(exp_id):
     if "user_id" not in session:
         return jsonify({"error": "Unauthorized"}), 401
@@ -3151,33 +3500,8 @@ def get_expense_detail(exp_id):
     if not exp:
         return jsonify({"error": "Not found"}), 404
 
-    ist = timezone("Asia/Kolkata")
-
-    # Handle requested_date
-    try:
-        if exp[7]:
-            req_dt = (
-                datetime.fromisoformat(exp[7])
-                .astimezone(ist)
-                .strftime("%Y-%m-%d %H:%M:%S")
-            )
-        else:
-            req_dt = "Not set"
-    except Exception:
-        req_dt = exp[7]
-
-    # Handle approved_date
-    try:
-        if exp[10]:
-            app_dt = (
-                datetime.fromisoformat(exp[10])
-                .astimezone(ist)
-                .strftime("%Y-%m-%d %H:%M:%S")
-            )
-        else:
-            app_dt = "Not set"
-    except Exception:
-        app_dt = "Not set"
+    # Display the canonical epoch timestamps (12, 13)
+    req_dt, app_dt = format_epochs([exp], (12, 13), display_tz, missing="Not set")[0][12:14]
 
     return jsonify(
         {
@@ -3273,6 +3597,7 @@ def add_job():
         if file and file.filename != "":
             filename = secure_filename(file.filename)
             file.save(os.path.join(app.config["UPLOAD_FOLDER"], filename))
+            image_derivatives.submit(os.path.join(app.config["UPLOAD_FOLDER"], filename))
 
         conn = get_db_connection()
         conn.execute(
@@ -3308,6 +3633,7 @@ def delete_job(id):
         )
         if os.path.exists(img_path):
             os.remove(img_path)
+        images.remove(img_path)
 
     conn.execute("DELETE FROM TblCareers WHERE CareerId = ?", (id,))
     conn.commit()
@@ -3332,6 +3658,7 @@ def edit_job(id):
         if file and file.filename != "":
             filename = secure_filename(file.filename)
             file.save(os.path.join(app.config["UPLOAD_FOLDER"], filename))
+            image_derivatives.submit(os.path.join(app.config["UPLOAD_FOLDER"], filename))
 
         conn.execute(
             "UPDATE TblCareers SET JobTitle=?, Exp=?, Sal=?, Location=?, Description=?, BannerImg=? WHERE CareerId=?",
@@ -3426,9 +3753,15 @@ def delete_asset(asset_id):
         return redirect(url_for("login"))
 
     conn = get_db_connection()
-    conn.execute("DELETE FROM TblAssets WHERE AssetId = ?", (asset_id,))
-    conn.commit()
-    conn.close()
+    try:
+        conn.execute("DELETE FROM TblAssets WHERE AssetId = ?", (asset_id,))
+        conn.commit()
+    except sqlite3.IntegrityError:
+        conn.rollback()
+        flash("Cannot delete an asset that is allocated or has issues.", "error")
+        return redirect(url_for("view_assets"))
+    finally:
+        conn.close()
     flash("Asset deleted successfully!", "success")
     return redirect(url_for("view_assets"))
 
@@ -3655,6 +3988,7 @@ def resolve_issue(issue_id):
 
 
 @app.route("/api/task_detail/<int:detail_id>")
+@conditional("tbl_task_details", "tbl_task")
 def api_get_task_detail(detail_id):
     if "user_id" not in session or session["emp_type"] != "emp":
         return jsonify({"error": "Unauthorized"}), 401
@@ -3731,6 +4065,7 @@ def admin_wiki_categories():
         if img_file and img_file.filename:
             filename = secure_filename(img_file.filename)
             img_file.save(os.path.join(app.config["WIKI_CAT_FOLDER"], filename))
+            image_derivatives.submit(os.path.join(app.config["WIKI_CAT_FOLDER"], filename))
             img_filename = filename
 
         db.add_wiki_category(category, img_filename)
@@ -3754,6 +4089,7 @@ def edit_wiki_category(cat_id):
     if img_file and img_file.filename:
         filename = secure_filename(img_file.filename)
         img_file.save(os.path.join(app.config["WIKI_CAT_FOLDER"], filename))
+        image_derivatives.submit(os.path.join(app.config["WIKI_CAT_FOLDER"], filename))
         img_filename = filename
 
     db.update_wiki_category(cat_id, new_cat, img_filename)
@@ -3766,8 +4102,11 @@ def delete_wiki_category(cat_id):
     if "user_id" not in session or session["emp_type"] != "admin":
         return redirect(url_for("login"))
 
-    db.delete_wiki_category(cat_id)
-    flash("Wiki category deleted", "success")
+    try:
+        db.delete_wiki_category(cat_id)
+        flash("Wiki category deleted", "success")
+    except Exception as e:
+        flash(str(e), "error")
     return redirect(url_for("admin_wiki_categories"))
 
 
@@ -3790,6 +4129,7 @@ def add_wiki():
 
 
 @app.route("/admin/view_wikis")
+@conditional("TblWikiPage", "TblWikiCategory")
 def view_wikis():
     if "user_id" not in session or session["emp_type"] != "admin":
         return redirect(url_for("login"))
@@ -3865,10 +4205,15 @@ def admin_wiki_views():
     start = request.args.get("start_date", default=None)
     end = request.args.get("end_date", default=None)
     wiki = request.args.get("wiki_id", type=int)
+    cursor = request.args.get("cursor")
+    page = int(request.args.get("page", 1)) if cursor else 1
+    per_page = 50
 
     # fetch data
     counts = db.get_wiki_view_counts(start, end)
-    views = db.get_wiki_views_filtered(start, end, wiki)
+    views, total, next_cursor, prev_cursor = db.get_wiki_views_keyset(
+        start, end, wiki, limit=per_page, cursor=cursor
+    )
     pages = db.get_wiki_pages()  # for the filter dropdown
 
     return render_template(
@@ -3879,6 +4224,12 @@ def admin_wiki_views():
         filter_start=start,
         filter_end=end,
         filter_wiki=wiki,
+        page=page,
+        per_page=per_page,
+        total=total,
+        total_pages=max(1, (total + per_page - 1) // per_page),
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor,
     )
 
 
@@ -3909,18 +4260,15 @@ def add_policy():
             return redirect(request.url)
 
         try:
-            # Generate unique filename
             original_filename = secure_filename(file.filename)
-            unique_filename = generate_unique_filename(original_filename)
-            filepath = os.path.join(POLICIES_FOLDER, unique_filename)
 
-            # Save file
-            file.save(filepath)
-            file_size = os.path.getsize(filepath)
+            # Save file, once per distinct content
+            sha256, file_size = file_store.save(file.stream)
 
             # Save to database
             db.add_policy_to_db(
-                policy_name, filepath, unique_filename, original_filename, file_size
+                policy_name, file_store.path(sha256), sha256, original_filename,
+                file_size, sha256,
             )
 
             flash("Policy uploaded successfully!", "success")
@@ -3956,6 +4304,8 @@ def view_policy(policy_id):
     original_name = policy["OriginalFileName"]
 
     if os.path.exists(filepath):
+        if policy["Sha256"]:
+            return send_stored_file(policy["Sha256"], original_name, as_attachment=True)
         directory = os.path.dirname(filepath)
         filename = os.path.basename(filepath)
         return send_from_directory(
@@ -3974,12 +4324,14 @@ def delete_policy(policy_id):
     policy = db.get_policy_by_id(policy_id)
     if policy:
         try:
-            # Delete file from filesystem
-            if os.path.exists(policy["FilePath"]):
-                os.remove(policy["FilePath"])
-
-            # Delete from database
+            # Delete from database first so a failed delete keeps the file
             db.delete_policy(policy_id)
+
+            # Delete file from filesystem, unless other rows share its content
+            if policy["Sha256"]:
+                file_store.collect()
+            elif os.path.exists(policy["FilePath"]):
+                os.remove(policy["FilePath"])
             flash("Policy deleted successfully", "success")
         except Exception as e:
             flash(f"Error deleting policy: {str(e)}", "error")
@@ -4037,6 +4389,8 @@ def employee_view_policy(policy_id):
     original_name = policy["OriginalFileName"]
 
     if os.path.exists(filepath):
+        if policy["Sha256"]:
+            return send_stored_file(policy["Sha256"], original_name)
         directory = os.path.dirname(filepath)
         filename = os.path.basename(filepath)
         return send_from_directory(
@@ -4047,6 +4401,103 @@ def employee_view_policy(policy_id):
         return redirect(url_for("employee_policies"))
 
 
+@app.route("/admin/errors")
+def admin_errors():
+    if "user_id" not in session or session["emp_type"] != "admin":
+        return redirect(url_for("login"))
+
+    cursor = request.args.get("cursor")
+    entries, next_cursor = error_log.read_page(cursor, limit=50)
+    for entry in entries:
+        for key in ("ts", "first"):
+            if entry.get(key):
+                entry[key + "_time"] = datetime.fromtimestamp(entry[key], display_tz).strftime(
+                    "%Y-%m-%d %H:%M:%S"
+                )
+    # Counts of this worker only; other workers keep their own.
+    totals = sorted(error_log.totals.items(), key=lambda item: item[1]["count"], reverse=True)
+    return render_template(
+        "admin_errors.html",
+        entries=entries,
+        cursor=cursor,
+        next_cursor=next_cursor,
+        totals=totals[:10],
+    )
+
+
+def runtime_metrics():
+    """Counters kept by the pool, caches and background workers, for /admin/metrics."""
+    values = [
+        ("hrms_db_connections_opened_total", "counter", "SQLite connections opened.",
+         db.connections_opened),
+    ]
+    if db.pool is not None:
+        values += [
+            (f"hrms_db_pool_{name}_total", "counter", f"Pooled connection checkouts: {name}.", count)
+            for name, count in db.pool.stats.items()
+        ]
+    values += [
+        (f"hrms_reference_cache_{name}_total", "counter", f"Reference lookups: {name}.", count)
+        for name, count in db.reference_cache.stats.items()
+    ]
+    if db.view_recorder is not None:
+        values += [
+            (f"hrms_wiki_views_{name}_total", "counter", f"Write-behind wiki views: {name}.", count)
+            for name, count in db.view_recorder.stats.items()
+        ]
+        values.append(("hrms_wiki_views_pending", "gauge", "Wiki views waiting to be written.",
+                       db.view_recorder.pending()))
+    values += [
+        (f"hrms_image_derivatives_{name}_total", "counter", f"Image derivative jobs: {name}.", count)
+        for name, count in image_derivatives.stats.items()
+    ]
+    values.append(("hrms_image_derivatives_pending", "gauge", "Images waiting to be encoded.",
+                   image_derivatives.pending()))
+    values.append(("hrms_errors_total", "counter", "Errors logged by this worker.",
+                   sum(total["count"] for total in error_log.totals.values())))
+    return values
+
+
+@app.route("/admin/metrics")
+def admin_metrics():
+    token = app.config["METRICS_TOKEN"]
+    scraper = token and hmac.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    )
+    if not scraper and ("user_id" not in session or session["emp_type"] != "admin"):
+        return redirect(url_for("login"))
+
+    # Numbers of this worker process only; scrape every worker to see them all.
+    return Response(
+        metrics.render(runtime_metrics()),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+@app.route("/admin/slow_queries", methods=["GET", "POST"])
+def admin_slow_queries():
+    if "user_id" not in session or session["emp_type"] != "admin":
+        return redirect(url_for("login"))
+
+    log = instrumentation.slow_queries
+    if request.method == "POST":
+        if log is not None:
+            log.clear()
+        flash("Slow query log cleared", "success")
+        return redirect(url_for("admin_slow_queries"))
+
+    entries = log.entries() if log is not None else []
+    for entry in entries:
+        entry["last_seen_time"] = datetime.fromtimestamp(entry["last_seen"], display_tz).strftime(
+            "%Y-%m-%d %H:%M:%S"
+        )
+    return render_template(
+        "admin_slow_queries.html",
+        entries=entries,
+        threshold=app.config["SLOW_QUERY_MS"],
+    )
+
+
 @app.route("/notfound")
 def notfound():
     from flask import abort
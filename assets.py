@@ -0,0 +1,311 @@
+"""
+Self-hosted, fingerprinted static assets.
+
+    python assets.py vendor   # download the pinned third-party files into static/vendor/
+    python assets.py build    # vendor, compile Tailwind, fingerprint into static/dist/
+    python assets.py clean    # remove static/dist/
+
+``vendor`` fetches every file in ``VENDOR`` that is not in ``static/vendor/``
+yet, together with the fonts its stylesheet points at, so the app needs no
+CDN at runtime. ``build`` compiles ``static/src/tailwind.css`` against the
+classes used in ``templates/`` with the Tailwind CLI (``tailwindcss`` on the
+PATH, e.g. from ``pip install pytailwindcss``, or ``$TAILWINDCSS``), then
+copies every file under ``ASSET_DIRS`` to ``static/dist/`` with a content hash
+in its name and writes ``static/dist/manifest.json``. Stylesheets are
+rewritten to point at the fingerprinted copies of the fonts and images they
+reference, and text files get a gzipped ``.gz`` sibling.
+
+Templates link assets through ``static_url(name)`` (see ``AssetManifest``):
+the fingerprinted URL once built, which the app serves with a one-year
+``immutable`` Cache-Control; before the first build, the file itself, or
+for vendored files not downloaded yet, their upstream URL.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import re
+import shutil
+import subprocess
+import sys
+import urllib.parse
+import urllib.request
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(ROOT, "static")
+DIST = "dist"
+MANIFEST = "manifest.json"
+
+# Static paths of third-party files and where they are pinned upstream.
+VENDOR = {
+    "vendor/fontawesome/css/all.min.css":
+        "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.7.2/css/all.min.css",
+    "vendor/fonts/plus-jakarta-sans.css":
+        "https://fonts.googleapis.com/css2?family=Plus+Jakarta+Sans:wght@300;400;500;600;700&display=swap",
+    "vendor/quill/quill.snow.css": "https://cdn.quilljs.com/1.3.6/quill.snow.css",
+    "vendor/quill/quill.min.js": "https://cdn.quilljs.com/1.3.6/quill.min.js",
+    "vendor/highlight.js/default.min.css":
+        "https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.7.0/styles/default.min.css",
+    "vendor/highlight.js/highlight.min.js":
+        "https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.7.0/highlight.min.js",
+    "vendor/alpinejs/cdn.min.js": "https://cdn.jsdelivr.net/npm/alpinejs@3.14.9/dist/cdn.min.js",
+    "vendor/toastify/toastify.min.css":
+        "https://cdnjs.cloudflare.com/ajax/libs/toastify-js/1.12.0/toastify.min.css",
+    "vendor/toastify/toastify.min.js":
+        "https://cdnjs.cloudflare.com/ajax/libs/toastify-js/1.12.0/toastify.min.js",
+}
+
+TAILWIND_INPUT = "src/tailwind.css"
+TAILWIND_OUTPUT = "css/tailwind.css"
+
+# Fingerprinted directories under static/. Uploads (bngImg, invoices,
+# wikiCatImg) are written at runtime and keep their own names.
+ASSET_DIRS = ("css", "images", "vendor")
+
+# Built files worth gzipping; fonts in woff2 and images are compressed already.
+PRECOMPRESS = (".css", ".js", ".svg", ".ico", ".ttf")
+
+# Google Fonts picks the font format from the User-Agent; ask for woff2.
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 Chrome/120.0 Safari/537.36"
+
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+
+def _fetch(url):
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.read()
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _css_refs(css):
+    """Relative or absolute file references in a stylesheet, without data: URIs."""
+    for match in CSS_URL.finditer(css):
+        ref = match.group(2).strip()
+        if not ref.startswith(("data:", "#")):
+            yield ref
+
+
+def vendor(static_dir=STATIC_DIR, force=False):
+    """Download missing ``VENDOR`` files; returns the static paths written."""
+    written = []
+    for name, url in VENDOR.items():
+        path = os.path.join(static_dir, name)
+        if os.path.exists(path) and not force:
+            continue
+        try:
+            data = _fetch(url)
+            if name.endswith(".css"):
+                data = _vendor_css(path, url, data.decode("utf-8"), force, written, static_dir)
+        except OSError as exc:
+            print(f"could not fetch {url}: {exc}")
+            continue
+        _write(path, data)
+        written.append(name)
+    return written
+
+
+def _vendor_css(path, url, css, force, written, static_dir):
+    """Download the files a vendored stylesheet references; returns the stylesheet."""
+    replacements = {}
+    for ref in _css_refs(css):
+        target = urllib.parse.urljoin(url, ref)
+        if urllib.parse.urlsplit(ref).netloc:
+            # Absolute (Google Fonts): keep next to the stylesheet.
+            local = "files/" + posixpath.basename(urllib.parse.urlsplit(target).path)
+            replacements[ref] = local
+        else:
+            local = re.match(r"[^?#]*", ref).group(0)
+        ref_path = os.path.normpath(os.path.join(os.path.dirname(path), local))
+        if force or not os.path.exists(ref_path):
+            _write(ref_path, _fetch(target))
+            written.append(os.path.relpath(ref_path, static_dir))
+    for ref, local in replacements.items():
+        css = css.replace(ref, local)
+    return css.encode("utf-8")
+
+
+def tailwind_command():
+    return os.environ.get("TAILWINDCSS") or shutil.which("tailwindcss")
+
+
+def compile_tailwind(static_dir=STATIC_DIR, root=ROOT):
+    """Compile the Tailwind stylesheet; False when no Tailwind CLI is installed."""
+    command = tailwind_command()
+    if not command:
+        return False
+    os.makedirs(os.path.dirname(os.path.join(static_dir, TAILWIND_OUTPUT)), exist_ok=True)
+    subprocess.run(
+        [command, "-c", os.path.join(root, "tailwind.config.js"),
+         "-i", os.path.join(static_dir, TAILWIND_INPUT),
+         "-o", os.path.join(static_dir, TAILWIND_OUTPUT), "--minify"],
+        check=True, cwd=root,
+    )
+    return True
+
+
+def _fingerprinted(name, data):
+    stem, ext = posixpath.splitext(name)
+    return f"{DIST}/{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+
+
+def _rewrite_css(name, css, manifest):
+    """Point a stylesheet's relative references at their fingerprinted copies."""
+    base = posixpath.dirname(name)
+
+    def replace(match):
+        ref = match.group(2).strip()
+        if ref.startswith(("data:", "#")) or urllib.parse.urlsplit(ref).netloc:
+            return match.group(0)
+        path, query = re.match(r"([^?#]*)(.*)", ref).groups()
+        target = posixpath.normpath(posixpath.join(base, path))
+        if target not in manifest:
+            return match.group(0)
+        relative = posixpath.relpath(manifest[target], posixpath.join(DIST, base))
+        return f"url({relative}{query})"
+
+    return CSS_URL.sub(replace, css)
+
+
+def fingerprint(static_dir=STATIC_DIR):
+    """Copy ``ASSET_DIRS`` into ``dist/`` under hashed names; returns the manifest."""
+    names = []
+    for directory in ASSET_DIRS:
+        for root, _, files in os.walk(os.path.join(static_dir, directory)):
+            for file in files:
+                path = os.path.relpath(os.path.join(root, file), static_dir)
+                names.append(path.replace(os.sep, "/"))
+
+    # Stylesheets last, so the files they reference already have their names.
+    manifest = {}
+    for name in sorted(names, key=lambda n: (n.endswith(".css"), n)):
+        with open(os.path.join(static_dir, name), "rb") as f:
+            data = f.read()
+        if name.endswith(".css"):
+            data = _rewrite_css(name, data.decode("utf-8"), manifest).encode("utf-8")
+        manifest[name] = _fingerprinted(name, data)
+        target = os.path.join(static_dir, manifest[name])
+        if not os.path.exists(target):
+            _write(target, data)
+
+    # Copies from earlier builds stay until `clean`, for pages rendered by
+    # workers that still run the previous release.
+    _write(os.path.join(static_dir, DIST, MANIFEST),
+           json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"))
+    return manifest
+
+
+def precompress(manifest, static_dir=STATIC_DIR):
+    """
+    Write a maximally compressed ``.gz`` next to every built text file that
+    shrinks; the app sends it to clients that accept gzip. Returns the
+    (original, compressed) byte totals.
+    """
+    totals = [0, 0]
+    for path in manifest.values():
+        if not path.endswith(PRECOMPRESS):
+            continue
+        target = os.path.join(static_dir, path)
+        with open(target, "rb") as f:
+            data = f.read()
+        compressed = gzip.compress(data, 9, mtime=0)
+        if len(compressed) >= len(data):
+            continue
+        if not os.path.exists(target + ".gz"):
+            _write(target + ".gz", compressed)
+        totals[0] += len(data)
+        totals[1] += len(compressed)
+    return tuple(totals)
+
+
+def clean(static_dir=STATIC_DIR):
+    shutil.rmtree(os.path.join(static_dir, DIST), ignore_errors=True)
+
+
+class AssetManifest:
+    """
+    Maps static file names to their fingerprinted ``dist/`` copies. The
+    manifest is re-read whenever ``build`` rewrites it, so a running worker
+    picks up a new build without a restart.
+    """
+
+    def __init__(self, static_dir=STATIC_DIR):
+        self.static_dir = static_dir
+        self.path = os.path.join(static_dir, DIST, MANIFEST)
+        self._mtime = None
+        self._entries = {}
+
+    def entries(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            self._mtime, self._entries = None, {}
+            return self._entries
+        if mtime != self._mtime:
+            with open(self.path, encoding="utf-8") as f:
+                self._entries = json.load(f)
+            self._mtime = mtime
+        return self._entries
+
+    def resolve(self, name):
+        """
+        ``(static path, None)`` for a built or local file, ``(None, url)`` for
+        a vendored file that has not been downloaded, ``(None, None)`` if the
+        file does not exist at all.
+        """
+        built = self.entries().get(name)
+        if built:
+            return built, None
+        if os.path.exists(os.path.join(self.static_dir, name)):
+            return name, None
+        return None, VENDOR.get(name)
+
+
+def is_fingerprinted(filename):
+    """Whether a static path is a content-hashed build output."""
+    return filename.startswith(DIST + "/") and filename != f"{DIST}/{MANIFEST}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python assets.py")
+    parser.add_argument("command", choices=["vendor", "build", "clean"])
+    parser.add_argument("--force", action="store_true", help="re-download vendored files")
+    parser.add_argument("--offline", action="store_true",
+                        help="build from the files already in static/vendor/")
+    args = parser.parse_args(argv)
+
+    if args.command == "clean":
+        clean()
+        return 0
+
+    if not args.offline:
+        for name in vendor(force=args.force):
+            print(f"vendored {name}")
+    missing = [name for name in VENDOR if not os.path.exists(os.path.join(STATIC_DIR, name))]
+    for name in missing:
+        print(f"missing {name}: pages will load it from {VENDOR[name]}")
+    if args.command == "vendor":
+        return 1 if missing else 0
+
+    if compile_tailwind():
+        print(f"compiled {TAILWIND_OUTPUT}")
+    else:
+        print("no Tailwind CLI (pip install pytailwindcss, or set TAILWINDCSS); "
+              "pages keep compiling Tailwind in the browser")
+    manifest = fingerprint()
+    print(f"{len(manifest)} files fingerprinted into static/{DIST}/")
+    original, compressed = precompress(manifest)
+    print(f"precompressed {original // 1024} KB of text to {compressed // 1024} KB (.gz)")
+    return 1 if missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+Lifecycle of the per-process background threads (wiki view writes, image
+derivatives, the error log listener).
+
+``BackgroundWorker.ensure_started()`` starts the thread on first use and
+again in a forked worker, where the parent's thread does not exist; it also
+registers ``close()`` to run at interpreter exit. ``QueueWorker`` adds the
+queue those threads consume: producers append to ``_pending`` under
+``_lock`` and wake the thread, which calls ``drain()``.
+"""
+
+import abc
+import atexit
+import os
+import threading
+from collections import deque
+
+
+class BackgroundWorker(abc.ABC):
+    """Subclasses implement ``_launch``, ``_halt`` and ``close``."""
+
+    def __init__(self):
+        self._pid = None
+        self._registered = False
+        self._start_lock = threading.Lock()
+
+    def ensure_started(self):
+        if self._pid == os.getpid() and self._running():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and self._running():
+                return
+            if not self._registered:
+                atexit.register(self.close)
+                self._registered = True
+            self._launch()
+            self._pid = os.getpid()
+
+    def stop(self):
+        """Stop this process's thread; the next ``ensure_started()`` restarts it."""
+        with self._start_lock:
+            if self._pid == os.getpid():
+                self._halt()
+            self._pid = None
+
+    def _running(self):
+        return True
+
+    @abc.abstractmethod
+    def _launch(self):
+        pass
+
+    @abc.abstractmethod
+    def _halt(self):
+        pass
+
+    @abc.abstractmethod
+    def close(self):
+        pass
+
+
+class QueueWorker(BackgroundWorker):
+    """
+    A daemon thread that runs ``drain()`` when woken, or every ``interval``
+    seconds when that is set. ``close()`` stops it and drains what is left.
+    """
+
+    name = "background-worker"
+    interval = None
+
+    def __init__(self):
+        super().__init__()
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = None
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def _running(self):
+        return self._thread.is_alive()
+
+    def _launch(self):
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def _halt(self):
+        self._stopped = True
+        self._wake.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.drain()
+
+    @abc.abstractmethod
+    def drain(self):
+        pass
+
+    def close(self):
+        self.stop()
+        self.drain()
@@ -0,0 +1,58 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Every benchmark runs against a throw-away copy of ``project_tracking.db`` in a
+temporary working directory, so the checked-in database and upload folders are
+never touched.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def isolated_workdir(db_name="project_tracking.db", copy_db=True):
+    """chdir into a fresh temp directory holding a copy of the bundled DB."""
+    workdir = tempfile.mkdtemp(prefix="hrms-bench-")
+    if copy_db:
+        shutil.copy(os.path.join(ROOT, db_name), os.path.join(workdir, db_name))
+    os.chdir(workdir)
+    return workdir
+
+
+def import_app(**env):
+    """Import ``app`` with the given environment overrides applied first."""
+    os.environ.update({k: str(v) for k, v in env.items()})
+    import app as app_module
+
+    app_module.app.config["TESTING"] = True
+    return app_module
+
+
+def login(client, user_id, emp_type):
+    with client.session_transaction() as sess:
+        sess["user_id"] = user_id
+        sess["first_name"] = "Bench"
+        sess["last_name"] = "User"
+        sess["emp_type"] = emp_type
+
+
+def timed(fn, repeat):
+    """Run ``fn`` ``repeat`` times and return per-call durations in ms."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    k = max(0, min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[k]
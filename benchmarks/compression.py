@@ -0,0 +1,89 @@
+"""
+Gzip cost versus bytes saved, per response type and compression level.
+
+    python -m benchmarks.compression [--levels 1,3,6,9] [--repeat 20]
+
+Seeds a few thousand rows, then takes the uncompressed bodies of listing pages,
+a JSON endpoint, the streamed expense CSV and any built text assets under
+``static/dist/``, and times ``gzip.compress`` on each at every level (median ms
+of CPU per response, and the compressed size). The last columns replay each
+URL through the app with and without ``Accept-Encoding: gzip`` at the
+configured ``GZIP_LEVEL``.
+"""
+
+import argparse
+import gzip
+import os
+import statistics
+
+from benchmarks._support import ROOT, import_app, isolated_workdir, login, timed
+from benchmarks.seed import seed
+
+PAGES = [
+    "/admin/dashboard",
+    "/admin/view_tasks",
+    "/admin/leave_requests",
+    "/existing_expenses",
+]
+
+
+def static_assets(limit=3):
+    """The largest built text assets, as /static/ URLs."""
+    dist = os.path.join(ROOT, "static", "dist")
+    found = []
+    for root, _, files in os.walk(dist):
+        for name in files:
+            if name.endswith((".css", ".js")):
+                path = os.path.join(root, name)
+                found.append((os.path.getsize(path), path))
+    return ["/static/" + os.path.relpath(path, os.path.join(ROOT, "static")).replace(os.sep, "/")
+            for _, path in sorted(found, reverse=True)[:limit]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--levels", default="1,3,6,9")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    levels = [int(level) for level in args.levels.split(",")]
+
+    isolated_workdir()
+    app_module = import_app()
+    db = app_module.db
+    conn = db.get_connection()
+    seed(conn, employees=100, projects=20, tasks=2000, task_details=5000,
+         leave_requests=2000, expenses=3000, wiki_pages=20, wiki_views=0)
+    task_id = conn.execute(
+        "SELECT task_id FROM tbl_task_details GROUP BY task_id ORDER BY COUNT(*) DESC LIMIT 1"
+    ).fetchone()[0]
+
+    client = app_module.app.test_client()
+    login(client, 1, "admin")
+    urls = PAGES + [f"/api/task_details/{task_id}", "/export_expenses"] + static_assets()
+
+    header = f"{'response':<44}{'KB':>8}"
+    header += "".join(f"{f'L{level} KB':>9}{'ms':>7}" for level in levels)
+    header += f"{'identity ms':>13}{'gzip ms':>9}"
+    print(header)
+    for url in urls:
+        response = client.get(url)
+        body = response.get_data()
+        response.close()
+        line = f"{url[:43]:<44}{len(body) / 1024:>8.1f}"
+        for level in levels:
+            size = len(gzip.compress(body, level, mtime=0))
+            cost = statistics.median(timed(lambda: gzip.compress(body, level, mtime=0), args.repeat))
+            line += f"{size / 1024:>9.1f}{cost:>7.2f}"
+
+        def fetch(encoding):
+            response = client.get(url, headers={"Accept-Encoding": encoding})
+            response.get_data()
+            response.close()
+
+        identity = statistics.median(timed(lambda: fetch("identity"), args.repeat))
+        compressed = statistics.median(timed(lambda: fetch("gzip"), args.repeat))
+        print(f"{line}{identity:>13.2f}{compressed:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
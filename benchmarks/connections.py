@@ -0,0 +1,61 @@
+"""
+Connections opened per request, before and after pooling.
+
+    python -m benchmarks.connections [--requests 200]
+
+Replays a handful of admin pages through the Flask test client, first with
+``DB_POOL_SIZE=0`` (a new ``sqlite3.connect`` per ``db.*`` call) and then with
+the per-thread pool bound to the app context.
+"""
+
+import argparse
+import statistics
+
+from benchmarks._support import import_app, isolated_workdir, login, timed
+
+ROUTES = [
+    "/admin/dashboard",
+    "/admin/view_tasks",
+    "/admin/leave_requests",
+    "/existing_expenses",
+    "/admin/view_employees",
+]
+
+
+def run(app_module, requests):
+    client = app_module.app.test_client()
+    login(client, 1, "admin")
+    results = {}
+    for route in ROUTES:
+        before = app_module.db.connections_opened
+        samples = timed(lambda: client.get(route), requests)
+        opened = app_module.db.connections_opened - before
+        results[route] = (opened / requests, statistics.mean(samples))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    isolated_workdir()
+    app_module = import_app(DB_POOL_SIZE=8)
+    pooled_db = app_module.db
+
+    app_module.db = app_module.Database(pool_size=0)
+    unpooled = run(app_module, args.requests)
+
+    app_module.db = pooled_db
+    pooled = run(app_module, args.requests)
+
+    print(f"{'route':<26}{'conns/req':>12}{'pooled':>10}{'ms/req':>10}{'pooled':>10}")
+    for route in ROUTES:
+        c0, t0 = unpooled[route]
+        c1, t1 = pooled[route]
+        print(f"{route:<26}{c0:>12.2f}{c1:>10.2f}{t0:>10.2f}{t1:>10.2f}")
+    print(f"pool stats: {app_module.db.pool.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Stored file downloads per FILE_DELIVERY mode: header checks and worker time.
+
+    python -m benchmarks.file_delivery [--size-mb 8] [--repeat 10]
+
+Uploads a policy PDF and an invoice, then requests them in every mode and
+checks what the app sends: the full file (``direct``) or an empty body with an
+``X-Accel-Redirect`` / ``X-Sendfile`` header pointing at the stored file, the
+validators, 304 answers without an offload header, and that a denied or missing
+file never gets one. ``FrontServer`` stands in for nginx/Apache: it follows the
+offload header to the file and answers Range requests, so the bytes a browser
+would receive are checked too. Exits 1 if any check fails. "worker ms" is the
+median time a worker spends on one download, including sending the body.
+"""
+
+import argparse
+import io
+import os
+import statistics
+import sys
+
+import werkzeug.utils
+from werkzeug.test import run_wsgi_app
+
+from benchmarks._support import import_app, isolated_workdir, login, timed
+
+
+class FrontServer:
+    """
+    WSGI middleware that answers offload headers like a front server would.
+    Headers of the app's response are kept, except for the body ones.
+    """
+
+    def __init__(self, app, mode, prefix, root):
+        self.app = app
+        self.mode = mode
+        self.prefix = prefix
+        self.root = root
+
+    def _target(self, headers):
+        if self.mode == "x-accel" and "X-Accel-Redirect" in headers:
+            location = headers["X-Accel-Redirect"]
+            if not location.startswith(self.prefix):
+                return ""
+            return os.path.join(self.root, *location[len(self.prefix):].split("/"))
+        if self.mode == "x-sendfile" and "X-Sendfile" in headers:
+            return headers["X-Sendfile"]
+        return None
+
+    def __call__(self, environ, start_response):
+        body, status, headers = run_wsgi_app(self.app, environ, buffered=True)
+        target = self._target(headers)
+        if target is None:
+            start_response(status, list(headers.items()))
+            return body
+        if not os.path.isfile(target):
+            start_response("404 Not Found", [("Content-Length", "0")])
+            return [b""]
+        response = werkzeug.utils.send_file(
+            target, environ, mimetype=headers.get("Content-Type"), conditional=True, etag=False
+        )
+        for name in ("Content-Disposition", "Cache-Control", "Expires", "ETag", "Set-Cookie"):
+            if name in headers:
+                response.headers[name] = headers[name]
+        return response(environ, start_response)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size-mb", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    isolated_workdir()
+    app_module = import_app()
+    app = app_module.app
+    db = app_module.db
+    conn = db.get_connection()
+    payload = b"%PDF-1.4\n" + os.urandom(args.size_mb * 1024 * 1024)
+
+    client = app.test_client()
+    login(client, 1, "admin")
+    client.post("/admin/add_policy", content_type="multipart/form-data", data={
+        "policy_name": "Delivery benchmark",
+        "policy_file": (io.BytesIO(payload), "handbook.pdf"),
+    })
+    policy_id, sha256 = conn.execute(
+        "SELECT PolicyID, Sha256 FROM TblPolicies WHERE PolicyName = 'Delivery benchmark'"
+    ).fetchone()
+    owner, other = [row[0] for row in conn.execute(
+        "SELECT emp_id FROM tbl_employee WHERE emp_type = 'emp' ORDER BY emp_id LIMIT 2"
+    )]
+    expense_type = conn.execute("SELECT expense_type_id FROM tbl_expense_type").fetchone()[0]
+    login(client, owner, "emp")
+    client.post("/expense", content_type="multipart/form-data", data={
+        "expense_date": "2025-01-02", "expense_type_id": expense_type,
+        "exp_description": "Delivery benchmark", "amount": "1",
+        "invoice_file": (io.BytesIO(payload), "invoice.pdf"),
+    })
+    expense_id = conn.execute(
+        "SELECT MAX(expense_id) FROM tbl_expenses WHERE invoice_sha256 = ?", (sha256,)
+    ).fetchone()[0]
+    path = app_module.file_store.path(sha256)
+    policy_url = f"/admin/policy/{policy_id}"
+    invoice_url = f"/expense/{expense_id}/invoice"
+
+    failures = []
+
+    def check(mode, what, ok):
+        print(f"  {'ok  ' if ok else 'FAIL'} {what}")
+        if not ok:
+            failures.append(f"{mode}: {what}")
+
+    timings = []
+    wsgi_app = app.wsgi_app
+    for mode in app_module.FILE_DELIVERY_MODES:
+        app.config["FILE_DELIVERY"] = mode
+        offload = {"x-accel": "X-Accel-Redirect", "x-sendfile": "X-Sendfile"}.get(mode)
+        print(mode)
+
+        client = app.test_client()
+        login(client, 1, "admin")
+        response = client.get(policy_url)
+        body = response.get_data()
+        check(mode, "policy 200 as attachment",
+              response.status_code == 200
+              and response.headers.get("Content-Disposition", "").startswith("attachment"))
+        check(mode, "strong ETag is the hash", response.headers.get("ETag") == f'"{sha256}"')
+        check(mode, "private Cache-Control", response.cache_control.private is not None
+              and not response.cache_control.public)
+        if offload:
+            target = response.headers.get(offload)
+            expected = (app.config["FILE_ACCEL_PREFIX"] + app_module.FileStore.relative(sha256)
+                        if mode == "x-accel" else path)
+            check(mode, f"{offload} points at the stored file", target == expected)
+            check(mode, "empty body, Content-Length 0",
+                  body == b"" and response.headers.get("Content-Length") == "0")
+        else:
+            check(mode, "full body from the worker", body == payload)
+            ranged = client.get(policy_url, headers={"Range": "bytes=100-199"})
+            check(mode, "Range answered with 206",
+                  ranged.status_code == 206 and ranged.get_data() == payload[100:200])
+        cached = client.get(policy_url, headers={"If-None-Match": f'"{sha256}"'})
+        check(mode, "If-None-Match answered with 304, no offload header",
+              cached.status_code == 304 and "X-Accel-Redirect" not in cached.headers
+              and "X-Sendfile" not in cached.headers)
+
+        login(client, other, "emp")
+        denied = client.get(invoice_url)
+        check(mode, "other employee's invoice is 403 without offload header",
+              denied.status_code == 403 and "X-Accel-Redirect" not in denied.headers
+              and "X-Sendfile" not in denied.headers)
+        login(client, owner, "emp")
+        inline = client.get(invoice_url)
+        inline.get_data()
+        check(mode, "owner's invoice is 200 inline", inline.status_code == 200
+              and inline.headers.get("Content-Disposition", "").startswith("inline"))
+        anonymous = app.test_client().get(invoice_url)
+        check(mode, "anonymous request redirected to login", anonymous.status_code == 302
+              and "X-Accel-Redirect" not in anonymous.headers)
+
+        if offload:
+            app.wsgi_app = FrontServer(wsgi_app, mode, app.config["FILE_ACCEL_PREFIX"],
+                                       app_module.file_store.root)
+            try:
+                front = app.test_client()
+                login(front, 1, "admin")
+                full = front.get(policy_url)
+                check(mode, "front server sends the whole file",
+                      full.status_code == 200 and full.get_data() == payload
+                      and full.headers.get("Content-Disposition", "").startswith("attachment"))
+                ranged = front.get(policy_url, headers={"Range": "bytes=100-199"})
+                check(mode, "front server answers Range with 206",
+                      ranged.status_code == 206 and ranged.get_data() == payload[100:200])
+            finally:
+                app.wsgi_app = wsgi_app
+
+        login(client, 1, "admin")
+        samples = timed(lambda: client.get(policy_url).get_data(), args.repeat)
+        timings.append((mode, statistics.median(samples)))
+
+    os.rename(path, path + ".moved")
+    try:
+        for mode in app_module.FILE_DELIVERY_MODES:
+            app.config["FILE_DELIVERY"] = mode
+            client = app.test_client()
+            login(client, owner, "emp")
+            missing = client.get(invoice_url)
+            check(mode, "missing file is 404", missing.status_code == 404
+                  and "X-Accel-Redirect" not in missing.headers
+                  and "X-Sendfile" not in missing.headers)
+    finally:
+        os.rename(path + ".moved", path)
+
+    print(f"\n{'mode':<12}{'worker ms':>10}   ({args.size_mb} MB policy)")
+    for mode, median in timings:
+        print(f"{mode:<12}{median:>10.2f}")
+    if failures:
+        print(f"\n{len(failures)} checks failed")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
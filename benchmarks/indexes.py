@@ -0,0 +1,103 @@
+"""
+Hot lookups with and without the secondary indexes from migration 0002.
+
+    python -m benchmarks.indexes [--scale 1.0] [--repeat 20]
+
+Seeds a copy of the bundled database (200k tasks, 200k task details, 100k leave requests,
+100k expenses and 300k wiki views at ``--scale 1``), drops the 0002 indexes,
+times each ``Database`` call, rebuilds the indexes the way the migration does
+on a live database and times the calls again.
+"""
+
+import argparse
+import importlib
+import os
+import statistics
+import time
+
+from benchmarks._support import isolated_workdir, timed
+from benchmarks.seed import seed
+from database import Database
+
+hot_indexes = importlib.import_module("migrations.0002_hot_lookup_indexes")
+
+
+def workload(db):
+    emp_id, project_id, task_id = 25, 7, 1234
+    return [
+        ("get_tasks_by_employee", lambda: db.get_tasks_by_employee(emp_id)),
+        ("get_tasks_by_project", lambda: db.get_tasks_by_project(project_id)),
+        ("get_task_details", lambda: db.get_task_details(task_id)),
+        ("has_task_detail_today", lambda: db.has_task_detail_today(task_id, emp_id)),
+        (
+            "tasks_paginated(status)",
+            lambda: db.get_all_tasks_with_details_paginated(1, 10, status_filter="pending"),
+        ),
+        (
+            "get_leave_requests(emp)",
+            lambda: db.get_leave_requests("WHERE lr.employee_id=?", (emp_id,)),
+        ),
+        (
+            "leave_advanced(status)",
+            lambda: db.get_leave_requests_with_advanced_filters(status="pending"),
+        ),
+        ("get_leave_summary", lambda: db.get_leave_summary()),
+        (
+            "expenses_paginated(emp)",
+            lambda: db.get_expenses_paginated("WHERE ex.employee_id = ?", (emp_id,)),
+        ),
+        ("count_expenses(status)", lambda: db.count_expenses("WHERE ex.status = ?", ("pending",))),
+        (
+            "get_wiki_views_keyset(wiki)",
+            lambda: db.get_wiki_views_keyset(wiki_id=3),
+        ),
+    ]
+
+
+def measure(db, repeat):
+    return {name: statistics.median(timed(fn, repeat)) for name, fn in workload(db)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    isolated_workdir()
+    db = Database("project_tracking.db", pool_size=1, profile="bulk-load")
+    conn = db.get_connection()
+    n = lambda base: int(base * args.scale)
+    seed(
+        conn,
+        employees=n(2000),
+        projects=n(200),
+        tasks=n(200000),
+        task_details=n(200000),
+        leave_requests=n(100000),
+        expenses=n(100000),
+        wiki_views=n(300000),
+        log=print,
+    )
+
+    for name, _, _ in hot_indexes.INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    conn.commit()
+    conn.execute("ANALYZE")
+    before = measure(db, args.repeat)
+
+    start = time.perf_counter()
+    hot_indexes.upgrade(conn)
+    build_s = time.perf_counter() - start
+    conn.execute("ANALYZE")
+    after = measure(db, args.repeat)
+
+    print(f"\nindex build: {build_s:.2f}s, db size {os.path.getsize('project_tracking.db') / 1e6:.1f} MB")
+    print(f"{'call':<32}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+    for name in before:
+        b, a = before[name], after[name]
+        print(f"{name:<32}{b:>12.2f}{a:>12.2f}{b / a if a else 0:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+"""
+End-to-end load: a realistic route mix for admin and employee sessions.
+
+    python -m benchmarks.load [--db SEEDED.db | --scale small] [--requests 2000]
+                              [--threads 4] [--admin-share 0.3]
+                              [--out results.json] [--compare baseline.json]
+
+Runs against a copy of ``--db`` (build one with ``python -m benchmarks.seed``)
+or, without it, of the bundled database seeded at ``--scale``. Each thread
+holds one admin and a few employee sessions on the Flask test client and
+picks routes by weight from ``ADMIN_MIX``/``EMPLOYEE_MIX``, with ids drawn
+from the seeded rows; the first ``--warmup`` requests are not recorded.
+Reports p50/p95/p99 per endpoint and writes them with the run's settings and
+row counts to ``--out`` (``benchmarks/results/load-<time>.json`` by default),
+which ``--compare`` reads back to print the change against an earlier run.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks._support import ROOT, import_app, isolated_workdir, login, percentile
+from benchmarks.seed import SCALES, row_counts, seed
+from database import Database
+
+# (endpoint, weight, url(ids, rnd, emp_id)); weights are relative within a mix.
+ADMIN_MIX = [
+    ("/admin/dashboard", 10, lambda ids, rnd, _: "/admin/dashboard"),
+    ("/admin/view_tasks", 12, lambda ids, rnd, _: "/admin/view_tasks"),
+    (
+        "/admin/view_tasks?status_filter",
+        5,
+        lambda ids, rnd, _: "/admin/view_tasks?status_filter="
+        + rnd.choice(["pending", "in_progress", "completed"]),
+    ),
+    (
+        "/admin/view_tasks?employee_filter",
+        4,
+        lambda ids, rnd, _: f"/admin/view_tasks?employee_filter={rnd.choice(ids['employees'])}",
+    ),
+    (
+        "/admin/show_task_details/<id>",
+        6,
+        lambda ids, rnd, _: f"/admin/show_task_details/{rnd.choice(ids['tasks'])}",
+    ),
+    ("/admin/view_employees", 5, lambda ids, rnd, _: "/admin/view_employees"),
+    ("/admin/view_projects", 4, lambda ids, rnd, _: "/admin/view_projects"),
+    (
+        "/admin/view_project/<id>",
+        4,
+        lambda ids, rnd, _: f"/admin/view_project/{rnd.choice(ids['projects'])}",
+    ),
+    ("/admin/leave_requests", 8, lambda ids, rnd, _: "/admin/leave_requests"),
+    (
+        "/admin/leave_requests?status",
+        4,
+        lambda ids, rnd, _: "/admin/leave_requests?status="
+        + rnd.choice(["pending", "approved", "rejected"]),
+    ),
+    ("/admin/leave_summary", 3, lambda ids, rnd, _: "/admin/leave_summary"),
+    ("/existing_expenses", 8, lambda ids, rnd, _: "/existing_expenses"),
+    (
+        "/existing_expenses?status",
+        3,
+        lambda ids, rnd, _: "/existing_expenses?status="
+        + rnd.choice(["pending", "approved", "rejected"]),
+    ),
+    ("/admin/employee_celebrations", 3, lambda ids, rnd, _: "/admin/employee_celebrations"),
+    ("/admin/view_wikis", 2, lambda ids, rnd, _: "/admin/view_wikis"),
+    ("/admin/wiki_views", 3, lambda ids, rnd, _: "/admin/wiki_views"),
+    (
+        "/admin/wiki_views?wiki_id",
+        2,
+        lambda ids, rnd, _: f"/admin/wiki_views?wiki_id={rnd.choice(ids['wikis'])}",
+    ),
+    (
+        "/export_expenses?status",
+        1,
+        lambda ids, rnd, _: "/export_expenses?status=pending",
+    ),
+]
+
+EMPLOYEE_MIX = [
+    ("/employee/dashboard", 20, lambda ids, rnd, emp: "/employee/dashboard"),
+    (
+        "/employee/view_task_details/<id>",
+        12,
+        lambda ids, rnd, emp: "/employee/view_task_details/"
+        + str(rnd.choice(ids["tasks_by_emp"].get(emp) or ids["tasks"])),
+    ),
+    ("/employee/my_leave_requests", 8, lambda ids, rnd, emp: "/employee/my_leave_requests"),
+    ("/existing_expenses", 8, lambda ids, rnd, emp: "/existing_expenses"),
+    ("/employee/leave", 4, lambda ids, rnd, emp: "/employee/leave"),
+    ("/expense", 3, lambda ids, rnd, emp: "/expense"),
+    ("/employee/my_profile", 3, lambda ids, rnd, emp: "/employee/my_profile"),
+    ("/employee/celebrations", 4, lambda ids, rnd, emp: "/employee/celebrations"),
+    ("/employee/wiki", 6, lambda ids, rnd, emp: "/employee/wiki"),
+    (
+        "/employee/wiki/<id>",
+        8,
+        lambda ids, rnd, emp: f"/employee/wiki/{rnd.choice(ids['wikis'])}",
+    ),
+    ("/employee/policies", 2, lambda ids, rnd, emp: "/employee/policies"),
+    ("/employee/careers", 2, lambda ids, rnd, emp: "/employee/careers"),
+    ("/employee/assets", 2, lambda ids, rnd, emp: "/employee/assets"),
+]
+
+
+def load_ids(path, sample=2000, seed_value=0):
+    """Ids the route mix draws from: a sample of each table's rows."""
+    rnd = random.Random(seed_value)
+    conn = sqlite3.connect(path)
+    try:
+        def ids(sql):
+            rows = [r[0] for r in conn.execute(sql)]
+            return rnd.sample(rows, min(sample, len(rows))) or [1]
+
+        employees = ids("SELECT emp_id FROM tbl_employee WHERE emp_type = 'emp' AND status = 'active'")
+        tasks_by_emp = {}
+        marks = ",".join("?" * len(employees))
+        for task_id, emp_id in conn.execute(
+            f"SELECT task_id, emp_id FROM tbl_task WHERE emp_id IN ({marks})", employees
+        ):
+            tasks_by_emp.setdefault(emp_id, []).append(task_id)
+        return {
+            "employees": employees,
+            "tasks": ids("SELECT task_id FROM tbl_task"),
+            "projects": ids("SELECT project_id FROM tbl_project"),
+            "wikis": ids("SELECT WikiId FROM TblWikiPage WHERE RowStatus = 0"),
+            "tasks_by_emp": tasks_by_emp,
+        }
+    finally:
+        conn.close()
+
+
+def worker(app_module, ids, args, index, samples, errors, counter, lock):
+    rnd = random.Random(args.seed * 1000 + index)
+    admin = app_module.app.test_client()
+    login(admin, 1, "admin")
+    employees = []
+    for emp_id in rnd.sample(ids["employees"], min(args.sessions, len(ids["employees"]))):
+        client = app_module.app.test_client()
+        login(client, emp_id, "emp")
+        employees.append((client, emp_id))
+    admin_weights = [weight for _, weight, _ in ADMIN_MIX]
+    employee_weights = [weight for _, weight, _ in EMPLOYEE_MIX]
+
+    while True:
+        with lock:
+            n = counter[0]
+            if n >= args.warmup + args.requests:
+                return
+            counter[0] += 1
+        if rnd.random() < args.admin_share:
+            client, emp_id, mix, weights = admin, None, ADMIN_MIX, admin_weights
+            role = "admin"
+        else:
+            (client, emp_id), mix, weights = rnd.choice(employees), EMPLOYEE_MIX, employee_weights
+            role = "emp"
+        endpoint, _, url = rnd.choices(mix, weights)[0]
+        url = url(ids, rnd, emp_id)
+
+        start = time.perf_counter()
+        try:
+            response = client.get(url)
+            response.get_data()
+            response.close()
+            status = response.status_code
+        except Exception as e:  # TESTING re-raises what would be a 500
+            print(f"{url}: {type(e).__name__}: {e}", file=sys.stderr)
+            status = 500
+        elapsed = (time.perf_counter() - start) * 1000
+
+        if n < args.warmup:
+            continue
+        key = f"{role} {endpoint}"
+        with lock:
+            samples.setdefault(key, []).append(elapsed)
+            # Redirects mean a session or an id the route rejected.
+            if status >= 300:
+                errors[key] = errors.get(key, 0) + 1
+
+
+def summarize(samples, errors):
+    def stats(values, errs):
+        return {
+            "count": len(values),
+            "errors": errs,
+            "mean": round(statistics.mean(values), 3),
+            "p50": round(percentile(values, 50), 3),
+            "p95": round(percentile(values, 95), 3),
+            "p99": round(percentile(values, 99), 3),
+            "max": round(max(values), 3),
+        }
+
+    endpoints = {key: stats(values, errors.get(key, 0)) for key, values in sorted(samples.items())}
+    every = [value for values in samples.values() for value in values]
+    return endpoints, stats(every, sum(errors.values())) if every else None
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_report(result):
+    print(f"{'endpoint':<46}{'n':>6}{'err':>5}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  (ms)")
+    for key, s in result["endpoints"].items():
+        print(f"{key:<46}{s['count']:>6}{s['errors']:>5}{s['p50']:>9.2f}"
+              f"{s['p95']:>9.2f}{s['p99']:>9.2f}{s['max']:>9.2f}")
+    total = result["total"]
+    print(f"{'all':<46}{total['count']:>6}{total['errors']:>5}{total['p50']:>9.2f}"
+          f"{total['p95']:>9.2f}{total['p99']:>9.2f}{total['max']:>9.2f}")
+    print(f"\n{result['throughput']:.1f} requests/s over {result['elapsed']:.1f}s "
+          f"with {result['settings']['threads']} thread(s)")
+
+
+def print_comparison(result, baseline):
+    print(f"\ncompared with {baseline.get('commit') or '?'} at {baseline.get('started')}:")
+    print(f"{'endpoint':<46}{'p50':>9}{'then':>9}{'p95':>9}{'then':>9}{'p95 x':>8}")
+    for key, s in result["endpoints"].items():
+        old = baseline["endpoints"].get(key)
+        if old is None:
+            continue
+        ratio = s["p95"] / old["p95"] if old["p95"] else 0
+        print(f"{key:<46}{s['p50']:>9.2f}{old['p50']:>9.2f}{s['p95']:>9.2f}"
+              f"{old['p95']:>9.2f}{ratio:>7.2f}x")
+    for key in ("rows", "settings"):
+        if baseline.get(key) != result[key]:
+            print(f"note: the runs used different {key}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", help="seeded database to copy (see benchmarks.seed)")
+    parser.add_argument("--scale", choices=SCALES, default="small",
+                        help="volumes to seed when --db is not given")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--sessions", type=int, default=20,
+                        help="employee sessions per thread")
+    parser.add_argument("--admin-share", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="JSON results file")
+    parser.add_argument("--compare", help="earlier JSON results to compare with")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    out = args.out or os.path.join(
+        ROOT, "benchmarks", "results", time.strftime("load-%Y%m%d-%H%M%S.json")
+    )
+    out = os.path.abspath(out)
+
+    if args.db:
+        source = os.path.abspath(args.db)
+        isolated_workdir(copy_db=False)
+        shutil.copy(source, "project_tracking.db")
+    else:
+        isolated_workdir()
+        conn = Database("project_tracking.db", profile="bulk-load").connect()
+        print(f"seeding ({args.scale}) ...", flush=True)
+        seed(conn, rebuild_rollup=True, **SCALES[args.scale])
+        conn.execute("ANALYZE")
+        conn.close()
+    conn = sqlite3.connect("project_tracking.db")
+    rows = row_counts(conn)
+    conn.close()
+    ids = load_ids("project_tracking.db", seed_value=args.seed)
+
+    app_module = import_app(DB_POOL_SIZE=max(8, args.threads), ERROR_LOG="errors.jsonl")
+    samples, errors, counter, lock = {}, {}, [0], threading.Lock()
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=(app_module, ids, args, index, samples, errors, counter, lock),
+        )
+        for index in range(args.threads)
+    ]
+    started = time.time()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    endpoints, total = summarize(samples, errors)
+    result = {
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started)),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "settings": {
+            key: getattr(args, key)
+            for key in ("db", "scale", "requests", "warmup", "threads", "sessions",
+                        "admin_share", "seed")
+        },
+        "rows": rows,
+        "elapsed": round(elapsed, 3),
+        "throughput": round(args.requests / elapsed, 2),
+        "total": total,
+        "endpoints": endpoints,
+    }
+    print_report(result)
+    if baseline is not None:
+        print_comparison(result, baseline)
+
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nresults written to {out}")
+    if total is None or total["errors"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,525 @@
+"""
+Micro-benchmarks for every public ``Database`` method, with budgets.
+
+    python -m benchmarks.methods [--sizes 250,1000,4000] [--storage file,memory]
+                                 [--repeat 20] [--only METHOD,...]
+                                 [--save-baseline] [--baseline PATH] [--tolerance 0.5]
+
+For each storage (a database file, or ``Database(":memory:")``) and size, a
+fresh database is migrated and seeded with ``size`` employees and rows in
+proportion (``volumes``); each method in ``cases`` is then timed, median of
+up to ``--repeat`` calls and at most about a second per method. Writes run
+after the reads, on rows of their own where they delete, and the
+``delete_all_*`` methods run once, last. The report gives the median per size
+and the scaling exponent, the slope of log(time) over log(size): about 0 for
+a method whose cost does not depend on the data, about 1 for one that grows
+linearly with it.
+
+Exits 1 when
+* a public method has no case and is not in ``SKIPPED``;
+* a median is over the method's ``BUDGETS_MS`` at any size;
+* with a baseline (written by ``--save-baseline``), a median is more than
+  ``--tolerance`` slower than the stored one, plus ``SLACK_MS`` for timer noise.
+"""
+
+import argparse
+import hashlib
+import inspect
+import json
+import math
+import os
+import statistics
+import sys
+import time
+
+from benchmarks._support import ROOT, isolated_workdir
+from benchmarks.seed import seed
+from database import Database
+
+# Plumbing, not queries; the connection setup is measured by
+# benchmarks.connections.
+SKIPPED = {"connect", "get_connection", "init_app", "init_database"}
+
+# Run once each after every other case, on the full tables.
+FINAL = ["delete_all_tasks", "delete_all_leave_types", "delete_all_expense_types",
+         "delete_all_employees"]
+
+# Upper bounds (median ms, at any size up to the default 4000 employees) for
+# the methods pages call on every request. Lookups by key should stay flat;
+# the listings count their filtered total, which grows with the data.
+BUDGETS_MS = {
+    "get_employee": 1,
+    "get_task": 1,
+    "get_project": 1,
+    "get_employee_profile": 1,
+    "get_expense_by_id": 1,
+    "get_leave_status": 1,
+    "get_wiki_page": 1,
+    "get_leave_types": 1,
+    "get_expense_types": 1,
+    "table_versions": 1,
+    "verify_user": 5,
+    "has_task_detail_today": 2,
+    "get_task_details_by_employee": 2,
+    "get_all_tasks_with_details_keyset": 50,
+    "get_leave_requests_keyset": 50,
+    "get_expenses_keyset": 50,
+    "get_wiki_views_keyset": 50,
+    "get_wiki_view_counts": 25,
+    "get_employee_anniversaries": 10,
+    "get_today_celebrations": 10,
+}
+
+SLACK_MS = 0.2
+CASE_SECONDS = 1.0
+BASELINE = os.path.join(ROOT, "benchmarks", "results", "methods-baseline.json")
+
+
+def volumes(size):
+    return {
+        "employees": size,
+        "projects": max(1, size // 10),
+        "tasks": 20 * size,
+        "task_details": 50 * size,
+        "leave_requests": 20 * size,
+        "expenses": 20 * size,
+        "wiki_pages": max(10, size // 5),
+        "wiki_views": 100 * size,
+    }
+
+
+def open_database(storage, size):
+    """A migrated, seeded Database of ``storage`` ("file" or "memory")."""
+    if storage == "memory":
+        db = Database(":memory:", pool_size=1)
+    else:
+        path = f"methods-{size}.db"
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        db = Database(path, pool_size=1)
+    conn = db.connect()
+    seed(conn, rebuild_rollup=True, **volumes(size))
+    conn.execute("ANALYZE")
+    conn.close()
+    return db
+
+
+def _one(db, sql, params=()):
+    with db.get_connection() as c:
+        row = c.execute(sql, params).fetchone()
+    return row[0] if row else None
+
+
+def _created(db, table, column, add, n):
+    """Ids of ``n`` rows ``add(i)`` inserts into ``table``."""
+    before = _one(db, f"SELECT COALESCE(MAX({column}), 0) FROM {table}")
+    for i in range(n):
+        add(i)
+    with db.get_connection() as c:
+        return [r[0] for r in c.execute(
+            f"SELECT {column} FROM {table} WHERE {column} > ? ORDER BY {column}", (before,)
+        )]
+
+
+def _employee(tag, i):
+    return {
+        "first_name": "Bench", "last_name": f"{tag}{i}", "gender": "Male",
+        "dob": "1990-01-01", "address": "Bengaluru", "phone_no": f"8{i:09d}",
+        "email": f"{tag}.{i}.{time.time_ns()}@example.com", "password": "password",
+        "status": "active", "emp_type": "emp",
+    }
+
+
+def _profile(emp_id):
+    return {
+        "EmployeeId": emp_id, "Designation": "Engineer", "DOJ": "2023-01-01",
+        "EmgContact": "9000000000", "ReportingMng": 1, "PrgLng": "Python",
+        "FrmWrk": "Flask", "AadharNo": "", "PANNO": "", "UANNo": "", "BankName": "",
+        "BranchName": "", "ACNo": "", "IFSCode": "",
+    }
+
+
+def cases(db):
+    """
+    ``{method: (call, prepare)}``. ``prepare(n)`` (untimed) returns the
+    argument of each of ``n`` calls; without it ``call()`` takes none.
+    """
+    with db.get_connection() as c:
+        emp_id, task_id, project_id = c.execute(
+            "SELECT emp_id, task_id, project_id FROM tbl_task ORDER BY task_id LIMIT 1"
+        ).fetchone()
+    detail_id = _one(db, "SELECT MIN(detail_id) FROM tbl_task_details")
+    leave_id = _one(db, "SELECT MIN(request_id) FROM tbl_leave_request")
+    expense_id = _one(db, "SELECT MIN(expense_id) FROM tbl_expenses")
+    leave_type_id = _one(db, "SELECT MIN(leave_type_id) FROM tbl_leave_type")
+    expense_type_id = _one(db, "SELECT MIN(expense_type_id) FROM tbl_expense_type")
+    wiki_id = _one(db, "SELECT MIN(WikiId) FROM TblWikiPage")
+    category_id = _one(db, "SELECT MIN(CategoryId) FROM TblWikiCategory")
+    email = _one(db, "SELECT email FROM tbl_employee WHERE emp_id = ?", (emp_id,))
+    sha = hashlib.sha256(b"benchmark").hexdigest()
+    db.add_policy_to_db("Bench policy", "files/x", sha, "bench.pdf", 1024, sha)
+    policy_id = _one(db, "SELECT MAX(PolicyID) FROM TblPolicies")
+
+    task = {"project_id": project_id, "emp_id": emp_id, "task_desc": "Bench task",
+            "priority": "low", "status": "pending", "start_date": "2024-01-01",
+            "end_date": None}
+    project = {"project_name": "Bench project", "priority": "low",
+               "project_desc": "Bench", "project_status": "active",
+               "start_date": "2024-01-01", "end_date": None}
+    leave = {"leave_type_id": leave_type_id, "employee_id": emp_id,
+             "start_date": "2024-03-04", "end_date": "2024-03-06",
+             "leave_desc": "Bench", "manager_id": 1}
+    expense = {"expense_type_id": expense_type_id, "employee_id": emp_id,
+               "exp_description": "Bench", "manager_id": 1, "approver_comments": "",
+               "given_by_id": None, "final_comments": "", "amount": 100.0,
+               "expense_date": "2024-03-04"}
+    window = ("2024-01-01", "2024-03-31")
+
+    def created(table, column, add):
+        return lambda n: _created(db, table, column, add, n)
+
+    def new_employees(n):
+        return _created(db, "tbl_employee", "emp_id",
+                        lambda i: db.add_employee(_employee("prep", i)), n)
+
+    def drain(iterator):
+        for _ in iterator:
+            pass
+
+    def attempt(delete_all):
+        # These refuse while other rows still reference the table; the
+        # refused attempt (foreign key checks and rollback) is what is timed.
+        def call():
+            try:
+                delete_all()
+            except Exception:
+                pass
+        return call
+
+    return {
+        # Employees
+        "hash_password": (lambda: db.hash_password("password"), None),
+        "verify_user": (lambda: db.verify_user(email, "password"), None),
+        "get_employee": (lambda: db.get_employee(emp_id), None),
+        "get_employees": (lambda: db.get_employees(), None),
+        "get_employee_profile": (lambda: db.get_employee_profile(emp_id), None),
+        "get_employee_anniversaries": (lambda: db.get_employee_anniversaries(), None),
+        "get_today_celebrations": (lambda: db.get_today_celebrations(), None),
+        "table_versions": (lambda: db.table_versions(("tbl_employee", "tbl_project")), None),
+        "add_employee": (db.add_employee, lambda n: [_employee("add", i) for i in range(n)]),
+        "update_employee": (
+            lambda e: db.update_employee(e, _employee("upd", e)), new_employees,
+        ),
+        "add_employee_profile": (
+            lambda e: db.add_employee_profile(_profile(e)), new_employees,
+        ),
+        "update_employee_profile": (
+            lambda: db.update_employee_profile(emp_id, _profile(emp_id)), None,
+        ),
+        "update_employee_password_and_emgcontact": (
+            lambda: db.update_employee_password_and_emgcontact(emp_id, "password", "9000000000"),
+            None,
+        ),
+        "update_employee_emg_contact_once": (
+            lambda e: db.update_employee_emg_contact_once(e, "9000000001"), new_employees,
+        ),
+        "delete_employee": (db.delete_employee, new_employees),
+        # Projects and tasks
+        "get_project": (lambda: db.get_project(project_id), None),
+        "get_projects": (lambda: db.get_projects(), None),
+        "get_tasks_by_project": (lambda: db.get_tasks_by_project(project_id), None),
+        "get_task": (lambda: db.get_task(task_id), None),
+        "get_tasks_by_employee": (lambda: db.get_tasks_by_employee(emp_id), None),
+        "get_all_tasks_with_details_paginated": (
+            lambda: db.get_all_tasks_with_details_paginated(1, 10), None,
+        ),
+        "get_all_tasks_with_details_keyset": (
+            lambda: db.get_all_tasks_with_details_keyset(10, status_filter="pending"), None,
+        ),
+        "add_project": (lambda: db.add_project(project), None),
+        "update_project": (lambda: db.update_project(project_id, project), None),
+        "delete_project": (
+            db.delete_project,
+            created("tbl_project", "project_id", lambda i: db.add_project(project)),
+        ),
+        "add_task": (lambda: db.add_task(task), None),
+        "update_task": (lambda: db.update_task(task_id, task), None),
+        "delete_task": (
+            db.delete_task, created("tbl_task", "task_id", lambda i: db.add_task(task)),
+        ),
+        # Task details
+        "has_task_detail_today": (lambda: db.has_task_detail_today(task_id, emp_id), None),
+        "get_task_details_by_employee": (
+            lambda: db.get_task_details_by_employee(task_id, emp_id), None,
+        ),
+        "get_task_detail": (lambda: db.get_task_detail(detail_id), None),
+        "get_task_details": (lambda: db.get_task_details(task_id), None),
+        "verify_task_detail_owner": (
+            lambda: db.verify_task_detail_owner(detail_id, emp_id), None,
+        ),
+        "add_task_detail": (
+            lambda: db.add_task_detail(task_id, "Bench update", "incomplete", emp_id), None,
+        ),
+        "update_task_detail": (
+            lambda: db.update_task_detail(detail_id, "Bench update", "incomplete"), None,
+        ),
+        # Leave
+        "get_leave_types": (lambda: db.get_leave_types(), None),
+        "add_leave_type": (
+            db.add_leave_type, lambda n: [f"Bench leave {time.time_ns()} {i}" for i in range(n)],
+        ),
+        "update_leave_type": (
+            lambda: db.update_leave_type(leave_type_id, "Casual Leave"), None,
+        ),
+        "delete_leave_type": (
+            db.delete_leave_type,
+            created("tbl_leave_type", "leave_type_id",
+                    lambda i: db.add_leave_type(f"Bench leave {time.time_ns()} {i}")),
+        ),
+        "add_leave_request": (lambda: db.add_leave_request(leave), None),
+        "get_leave_requests": (
+            lambda: db.get_leave_requests("WHERE lr.employee_id = ?", (emp_id,)), None,
+        ),
+        "update_leave_status": (
+            lambda status: db.update_leave_status(leave_id, status, 1),
+            lambda n: [("approved", "rejected")[i % 2] for i in range(n)],
+        ),
+        "get_leave_status": (lambda: db.get_leave_status(leave_id), None),
+        "count_leave_requests": (
+            lambda: db.count_leave_requests("WHERE lr.status = ?", ("pending",)), None,
+        ),
+        "get_leave_requests_paginated": (lambda: db.get_leave_requests_paginated(), None),
+        "get_leave_requests_with_advanced_filters": (
+            lambda: db.get_leave_requests_with_advanced_filters(status="pending"), None,
+        ),
+        "get_leave_requests_keyset": (
+            lambda: db.get_leave_requests_keyset(status="pending"), None,
+        ),
+        "delete_leave_request": (
+            db.delete_leave_request,
+            created("tbl_leave_request", "request_id", lambda i: db.add_leave_request(leave)),
+        ),
+        "get_leave_summary": (lambda: db.get_leave_summary(*window), None),
+        "check_leave_ledger": (lambda: db.check_leave_ledger(), None),
+        "rebuild_leave_ledger": (lambda: db.rebuild_leave_ledger(), None),
+        # Expenses
+        "get_expense_types": (lambda: db.get_expense_types(), None),
+        "add_expense_type": (
+            db.add_expense_type, lambda n: [f"Bench type {time.time_ns()} {i}" for i in range(n)],
+        ),
+        "update_expense_type": (lambda: db.update_expense_type(expense_type_id, "Travel"), None),
+        "expense_type_exists": (lambda: db.expense_type_exists("Travel"), None),
+        "delete_expense_type": (
+            db.delete_expense_type,
+            created("tbl_expense_type", "expense_type_id",
+                    lambda i: db.add_expense_type(f"Bench type {time.time_ns()} {i}")),
+        ),
+        "add_expense": (lambda: db.add_expense(expense), None),
+        "get_expenses": (lambda: db.get_expenses("WHERE ex.employee_id = ?", (emp_id,)), None),
+        "iter_expenses": (lambda: drain(db.iter_expenses()), None),
+        "get_expenses_paginated": (lambda: db.get_expenses_paginated(), None),
+        "get_expenses_keyset": (
+            lambda: db.get_expenses_keyset("WHERE ex.status = ?", ("pending",)), None,
+        ),
+        "count_expenses": (lambda: db.count_expenses("WHERE ex.status = ?", ("pending",)), None),
+        "get_expense_by_id": (lambda: db.get_expense_by_id(expense_id), None),
+        "update_expense_status": (
+            lambda status: db.update_expense_status(expense_id, status, "", 1, 1),
+            lambda n: [("approved", "rejected")[i % 2] for i in range(n)],
+        ),
+        "delete_expense": (
+            db.delete_expense,
+            created("tbl_expenses", "expense_id", lambda i: db.add_expense(expense)),
+        ),
+        "get_expense_invoice": (lambda: db.get_expense_invoice(expense_id), None),
+        # Wiki
+        "add_wiki_category": (lambda: db.add_wiki_category("Bench", None), None),
+        "get_wiki_categories": (lambda: db.get_wiki_categories(), None),
+        "update_wiki_category": (lambda: db.update_wiki_category(category_id, "Handbook"), None),
+        "delete_wiki_category": (
+            db.delete_wiki_category,
+            created("TblWikiCategory", "CategoryId",
+                    lambda i: db.add_wiki_category("Bench", None)),
+        ),
+        "add_wiki_page": (lambda: db.add_wiki_page(category_id, "Bench", "Bench"), None),
+        "get_wiki_pages": (lambda: db.get_wiki_pages(), None),
+        "get_wiki_page": (lambda: db.get_wiki_page(wiki_id), None),
+        "update_wiki_page": (
+            lambda: db.update_wiki_page(wiki_id, category_id, "Wiki page 0", "Synthetic page"),
+            None,
+        ),
+        "soft_delete_wiki_page": (
+            db.soft_delete_wiki_page,
+            created("TblWikiPage", "WikiId",
+                    lambda i: db.add_wiki_page(category_id, "Bench", "Bench")),
+        ),
+        "add_wiki_view": (lambda: db.add_wiki_view(wiki_id, emp_id), None),
+        "get_wiki_views": (lambda: db.get_wiki_views(), None),
+        "get_wiki_views_keyset": (lambda: db.get_wiki_views_keyset(*window), None),
+        "get_wiki_view_counts": (lambda: db.get_wiki_view_counts(*window), None),
+        "check_wiki_view_rollup": (lambda: db.check_wiki_view_rollup(*window), None),
+        "rebuild_wiki_view_rollup": (lambda: db.rebuild_wiki_view_rollup(*window), None),
+        # Policies and stored files
+        "add_policy_to_db": (
+            lambda name: db.add_policy_to_db(name, "files/x", sha, "bench.pdf", 1024, sha),
+            lambda n: [f"Bench policy {time.time_ns()} {i}" for i in range(n)],
+        ),
+        "get_all_policies": (lambda: db.get_all_policies(), None),
+        "get_policy_by_id": (lambda: db.get_policy_by_id(policy_id), None),
+        "policy_exists": (lambda: db.policy_exists("Bench policy"), None),
+        "delete_policy": (
+            db.delete_policy,
+            created("TblPolicies", "PolicyID",
+                    lambda i: db.add_policy_to_db(f"Bench {time.time_ns()} {i}", "files/x",
+                                                  sha, "b.pdf", 1, sha)),
+        ),
+        "register_stored_file": (
+            lambda digest: db.register_stored_file(digest, 1024),
+            lambda n: [hashlib.sha256(f"{time.time_ns()} {i}".encode()).hexdigest()
+                       for i in range(n)],
+        ),
+        "get_stored_files": (lambda: db.get_stored_files(), None),
+        "check_stored_files": (lambda: db.check_stored_files(), None),
+        "rebuild_stored_file_refs": (lambda: db.rebuild_stored_file_refs(), None),
+        "get_legacy_uploads": (lambda: db.get_legacy_uploads(), None),
+        "attach_stored_file": (
+            lambda: db.attach_stored_file("invoice", expense_id, sha, "files/x", "x.pdf"), None,
+        ),
+        "purge_stored_files": (
+            lambda: db.purge_stored_files(time.time() + 60, lambda digest: None), None,
+        ),
+        # Once, last
+        "delete_all_tasks": (db.delete_all_tasks, None),
+        "delete_all_leave_types": (attempt(db.delete_all_leave_types), None),
+        "delete_all_expense_types": (attempt(db.delete_all_expense_types), None),
+        "delete_all_employees": (attempt(db.delete_all_employees), None),
+    }
+
+
+def public_methods():
+    return sorted(
+        name for name, fn in vars(Database).items()
+        if not name.startswith("_") and inspect.isfunction(fn)
+    )
+
+
+def _is_write(name):
+    return name.split("_")[0] in (
+        "add", "update", "delete", "register", "attach", "purge", "rebuild", "soft"
+    )
+
+
+def measure(db, only, repeat):
+    """Median ms per method on ``db``, and the names of all cases."""
+    table = cases(db)
+    names = [name for name in table if only is None or name in only]
+    order = (
+        [n for n in names if not _is_write(n) and n not in FINAL]
+        + [n for n in names if _is_write(n) and n not in FINAL]
+        + [n for n in FINAL if n in names]
+    )
+    medians = {}
+    for name in order:
+        call, prepare = table[name]
+        calls = 1 if name in FINAL else repeat
+        args = prepare(calls) if prepare else [None] * calls
+        samples = []
+        deadline = time.perf_counter() + CASE_SECONDS
+        for arg in args:
+            start = time.perf_counter()
+            call(arg) if prepare else call()
+            samples.append((time.perf_counter() - start) * 1000)
+            if len(samples) >= 3 and time.perf_counter() > deadline:
+                break
+        medians[name] = statistics.median(samples)
+    return medians, list(table)
+
+
+def exponent(sizes, times):
+    """Least-squares slope of log(time) over log(size)."""
+    points = [(math.log(s), math.log(max(t, 1e-3))) for s, t in zip(sizes, times)]
+    if len(points) < 2:
+        return None
+    mx = statistics.mean(x for x, _ in points)
+    my = statistics.mean(y for _, y in points)
+    sxx = sum((x - mx) ** 2 for x, _ in points)
+    return sum((x - mx) * (y - my) for x, y in points) / sxx if sxx else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="250,1000,4000",
+                        help="employees per dataset; other tables scale with it")
+    parser.add_argument("--storage", default="file,memory")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--only", help="comma-separated methods to run")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store this run's medians as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="allowed slowdown against the baseline (0.5 = 50%%)")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    storages = args.storage.split(",")
+    only = set(args.only.split(",")) if args.only else None
+    failures = []
+
+    isolated_workdir(copy_db=False)
+    results = {}
+    covered = set()
+    for storage in storages:
+        for size in sizes:
+            start = time.perf_counter()
+            db = open_database(storage, size)
+            print(f"{storage} {size}: seeded in {time.perf_counter() - start:.1f}s", flush=True)
+            medians, names = measure(db, only, args.repeat)
+            covered.update(names)
+            for name, ms in medians.items():
+                results[f"{storage}/{size}/{name}"] = ms
+    failures += [f"{name}: no benchmark case" for name in public_methods()
+                 if name not in SKIPPED and name not in covered]
+
+    baseline = {}
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["medians"]
+
+    for storage in storages:
+        print(f"\n{storage}: median ms by employees ({', '.join(map(str, sizes))}), "
+              f"then the scaling exponent")
+        names = sorted({key.split("/", 2)[2] for key in results if key.startswith(storage + "/")})
+        for name in names:
+            times = [results.get(f"{storage}/{size}/{name}") for size in sizes]
+            k = exponent(sizes, times) if None not in times else None
+            flags = []
+            budget = BUDGETS_MS.get(name)
+            for size, ms in zip(sizes, times):
+                key = f"{storage}/{size}/{name}"
+                if budget is not None and ms is not None and ms > budget:
+                    failures.append(f"{key}: {ms:.2f} ms over its {budget} ms budget")
+                    flags.append("over budget")
+                old = baseline.get(key)
+                if old is not None and ms is not None and ms > old * (1 + args.tolerance) + SLACK_MS:
+                    failures.append(f"{key}: {ms:.2f} ms, baseline {old:.2f} ms")
+                    flags.append("regressed")
+            cells = "".join(f"{ms:>10.2f}" if ms is not None else f"{'-':>10}" for ms in times)
+            slope = f"{k:>7.2f}" if k is not None else f"{'':>7}"
+            print(f"  {name:<42}{cells}{slope}  {' '.join(sorted(set(flags)))}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump({"sizes": sizes, "repeat": args.repeat, "medians": results}, f, indent=2)
+        print(f"\nbaseline written to {args.baseline}")
+
+    if failures:
+        print(f"\n{len(failures)} failure(s):")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Page weight and first render, with the static assets as checked out vs built.
+
+    python -m benchmarks.page_weight [--repeat 20]
+
+Renders a few pages through the Flask test client and follows every
+stylesheet, script and image they link: bytes and requests served by the app,
+requests left to third-party hosts, render-blocking resources in ``<head>``
+and, for a repeat visit, how many of the local files still have to be
+revalidated because they are not served as ``immutable``. "render" is the
+median time to produce the HTML. The "source" run uses ``static/`` as it is;
+the "built" run fingerprints a copy of it (``assets.py build --offline``), so
+only files already vendored are self-hosted.
+"""
+
+import argparse
+import os
+import re
+import shutil
+import statistics
+import tempfile
+
+import assets
+from benchmarks._support import ROOT, import_app, isolated_workdir, login, timed
+
+PAGES = [
+    ("/login", None),
+    ("/admin/dashboard", "admin"),
+    ("/admin/view_tasks", "admin"),
+    ("/admin/add_task", "admin"),
+    ("/admin/wiki_categories", "admin"),
+]
+
+HEAD = re.compile(r"<head>(.*?)</head>", re.S | re.I)
+TAG = re.compile(r"<(link|script|img)\b([^>]*)>", re.I)
+ATTR = re.compile(r"""(\w[\w-]*)\s*=\s*["']([^"']*)["']""")
+
+
+def resources(html):
+    """(url, blocking) for every linked stylesheet, script and image."""
+    head = HEAD.search(html)
+    head_end = head.end() if head else 0
+    found = []
+    for match in TAG.finditer(html):
+        tag, attrs = match.group(1).lower(), dict(ATTR.findall(match.group(2)))
+        if tag == "link" and "stylesheet" in attrs.get("rel", "") or (
+                tag == "link" and "icon" in attrs.get("rel", "")):
+            url = attrs.get("href")
+            blocking = "stylesheet" in attrs.get("rel", "") and match.start() < head_end
+        elif tag in ("script", "img"):
+            url = attrs.get("src")
+            blocking = (tag == "script" and match.start() < head_end
+                        and "defer" not in match.group(2) and "async" not in match.group(2))
+        else:
+            continue
+        if url:
+            found.append((url, blocking))
+    return found
+
+
+def weigh(client, path, repeat):
+    render = statistics.median(timed(lambda: client.get(path), repeat))
+    html = client.get(path).get_data(as_text=True)
+    row = {"render": render, "html": len(html.encode()), "local": 0, "bytes": 0,
+           "external": 0, "blocking": 0, "revalidate": 0}
+    for url, blocking in resources(html):
+        row["blocking"] += blocking
+        if url.startswith(("http:", "https:", "//")):
+            row["external"] += 1
+            continue
+        response = client.get(url)
+        row["local"] += 1
+        row["bytes"] += len(response.get_data())
+        if not response.cache_control.immutable:
+            row["revalidate"] += 1
+    return row
+
+
+def built_static_copy():
+    """Fingerprint a copy of static/ (without uploads) and return its path."""
+    copy = os.path.join(tempfile.mkdtemp(prefix="hrms-static-"), "static")
+    shutil.copytree(os.path.join(ROOT, "static"), copy,
+                    ignore=shutil.ignore_patterns("bngImg", "invoices", "wikiCatImg", "dist"))
+    assets.compile_tailwind(static_dir=copy)
+    assets.fingerprint(static_dir=copy)
+    return copy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    isolated_workdir()
+    app_module = import_app()
+    app = app_module.app
+
+    runs = [("source", app.static_folder, app_module.asset_manifest)]
+    built = built_static_copy()
+    runs.append(("built", built, assets.AssetManifest(built)))
+
+    print(f"{'page':<24}{'run':<8}{'render ms':>10}{'html KB':>9}{'local':>7}"
+          f"{'local KB':>10}{'external':>10}{'blocking':>10}{'revalidate':>12}")
+    for path, role in PAGES:
+        for label, static_folder, manifest in runs:
+            app.static_folder = static_folder
+            app_module.asset_manifest = manifest
+            client = app.test_client()
+            if role:
+                login(client, 1, role)
+            row = weigh(client, path, args.repeat)
+            print(f"{path:<24}{label:<8}{row['render']:>10.2f}{row['html'] / 1024:>9.1f}"
+                  f"{row['local']:>7}{row['bytes'] / 1024:>10.1f}{row['external']:>10}"
+                  f"{row['blocking']:>10}{row['revalidate']:>12}")
+    shutil.rmtree(os.path.dirname(built), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
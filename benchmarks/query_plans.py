@@ -0,0 +1,213 @@
+"""
+Check that every filter combination of the listing queries is index-driven.
+
+    python -m benchmarks.query_plans [--scale 0.1] [--verbose]
+
+Seeds a copy of the bundled database, runs each listing (tasks, leave
+requests, expenses, wiki views) with every combination of its filters, and
+captures the SQL actually executed. Each statement's EXPLAIN QUERY PLAN must
+not contain a full table scan of the listing's main table; an ordered
+``SCAN ... USING INDEX`` is fine. Also checks that the half-open date ranges
+(text and epoch) select exactly the rows the old ``DATE(column)`` comparisons
+did. Exits
+non-zero on any failure.
+"""
+
+import argparse
+import itertools
+import re
+import sys
+
+from benchmarks._support import import_app, isolated_workdir, login
+from benchmarks.seed import seed
+from database import day_range, epoch_range
+
+# Aliases of the tables each listing is driven from
+MAIN_TABLES = ("t", "lr", "ex", "wv", "td")
+FULL_SCAN = re.compile(r"^SCAN (%s)$" % "|".join(MAIN_TABLES))
+
+
+def combinations(options):
+    """Every subset of ``options`` ({name: value}) as a kwargs dict."""
+    names = list(options)
+    for size in range(len(names) + 1):
+        for chosen in itertools.combinations(names, size):
+            yield {name: options[name] for name in chosen}
+
+
+def listing_calls(db, client, sample):
+    task_filters = {
+        "project_filter": sample["project_name"],
+        "status_filter": "pending",
+        "employee_filter": sample["employee_name"],
+    }
+    for kwargs in combinations(task_filters):
+        yield f"tasks offset {sorted(kwargs)}", lambda kw=kwargs: (
+            db.get_all_tasks_with_details_paginated(3, 10, **kw)
+        )
+
+        def keyset(kw=kwargs):
+            first = db.get_all_tasks_with_details_keyset(10, **kw)
+            db.get_all_tasks_with_details_keyset(10, first[2], **kw)
+
+        yield f"tasks keyset {sorted(kwargs)}", keyset
+
+    leave_filters = {
+        "employee_id": sample["emp_id"],
+        "leave_type_id": sample["leave_type_id"],
+        "status": "pending",
+        "from_date": "2023-01-01",
+        "to_date": "2024-06-30",
+    }
+    for kwargs in combinations(leave_filters):
+
+        def leave_keyset(kw=kwargs):
+            first = db.get_leave_requests_keyset(**kw)
+            db.get_leave_requests_keyset(cursor=first[2], **kw)
+
+        yield f"leave keyset {sorted(kwargs)}", leave_keyset
+
+    expense_filters = {
+        "employee_id": sample["emp_id"],
+        "expense_type": sample["expense_type"],
+        "status": "pending",
+        "from_date": "2023-01-01",
+        "to_date": "2024-06-30",
+    }
+    for kwargs in combinations(expense_filters):
+        yield f"existing_expenses {sorted(kwargs)}", lambda kw=kwargs: (
+            client.get("/existing_expenses", query_string=kw)
+        )
+
+    for kwargs in combinations({"start_date": "2024-01-01", "end_date": "2024-03-31"}):
+        for wiki_id in (None, sample["wiki_id"]):
+
+            def wiki_keyset(kw=kwargs, wiki_id=wiki_id):
+                first = db.get_wiki_views_keyset(wiki_id=wiki_id, **kw)
+                db.get_wiki_views_keyset(wiki_id=wiki_id, cursor=first[2], **kw)
+
+            yield f"wiki views keyset wiki={wiki_id} {sorted(kwargs)}", wiki_keyset
+        yield f"wiki counts {sorted(kwargs)}", lambda kw=kwargs: db.get_wiki_view_counts(**kw)
+
+    yield "has_task_detail_today", lambda: db.has_task_detail_today(sample["task_id"], sample["emp_id"])
+
+
+def check_plans(conn, statements):
+    failures = []
+    for sql in statements:
+        if not sql.lstrip().upper().startswith("SELECT") or "sqlite_" in sql:
+            continue
+        plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+        scans = [line for line in plan if FULL_SCAN.match(line)]
+        if scans:
+            failures.append((sql, plan))
+    return failures
+
+
+def check_day_ranges(conn):
+    """The half-open ranges must match the old DATE() filters row for row."""
+    cases = [
+        ("tbl_expenses", "inserted_date", "expense_id"),
+        ("tbl_leave_request", "start_date", "request_id"),
+        ("tbl_leave_request", "end_date", "request_id"),
+        ("TblWikiViews", "ViewDateTime", "WikiViewId"),
+    ]
+    failures = []
+    for table, column, key in cases:
+        for start, end in [("2023-01-01", "2024-06-30"), ("2024-02-29", "2024-02-29"), ("2022-12-31", None)]:
+            old = f"SELECT {key} FROM {table} WHERE DATE({column}) >= ?"
+            old_params = [start]
+            if end:
+                old += f" AND DATE({column}) <= ?"
+                old_params.append(end)
+            conditions, params = day_range(column, start, end)
+            new = f"SELECT {key} FROM {table} WHERE " + " AND ".join(conditions)
+            if set(conn.execute(old, old_params)) != set(conn.execute(new, params)):
+                failures.append(f"{table}.{column} {start}..{end}")
+            # Epoch columns (UTC days here) select the same rows as DATE()
+            if table == "tbl_expenses":
+                conditions, params = epoch_range("inserted_ts", start, end)
+                new = f"SELECT {key} FROM {table} WHERE " + " AND ".join(conditions)
+                if set(conn.execute(old, old_params)) != set(conn.execute(new, params)):
+                    failures.append(f"{table}.inserted_ts {start}..{end}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", type=float, default=0.1)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    isolated_workdir()
+    app_module = import_app(DB_POOL_SIZE=1, DB_COUNT_CACHE_TTL=0)
+    db = app_module.db
+    client = app_module.app.test_client()
+    login(client, 1, "admin")
+
+    # The test client runs in this thread, so every call below shares the
+    # connection checked out here.
+    conn, pooled = db.pool.acquire()
+    n = lambda base: max(1, int(base * args.scale))
+    seed(
+        conn,
+        employees=n(2000),
+        projects=n(200),
+        tasks=n(200000),
+        task_details=n(200000),
+        leave_requests=n(100000),
+        expenses=n(100000),
+        wiki_views=n(300000),
+    )
+    conn.execute("ANALYZE")
+    sample = {
+        "emp_id": conn.execute("SELECT employee_id FROM tbl_expenses GROUP BY 1 ORDER BY COUNT(*) DESC").fetchone()[0],
+        "leave_type_id": conn.execute("SELECT leave_type_id FROM tbl_leave_type").fetchone()[0],
+        "expense_type": conn.execute("SELECT expense_type FROM tbl_expense_type").fetchone()[0],
+        "wiki_id": conn.execute("SELECT WikiId FROM TblWikiViews").fetchone()[0],
+        "task_id": conn.execute("SELECT task_id FROM tbl_task").fetchone()[0],
+    }
+    sample["project_name"], sample["employee_name"] = conn.execute(
+        """
+        SELECT p.project_name, e.first_name || ' ' || e.last_name
+        FROM tbl_task t
+        JOIN tbl_project p ON p.project_id = t.project_id
+        JOIN tbl_employee e ON e.emp_id = t.emp_id
+        """
+    ).fetchone()
+
+    statements = []
+    conn.set_trace_callback(statements.append)
+    failed = 0
+    checked = 0
+    for name, call in listing_calls(db, client, sample):
+        statements.clear()
+        call()
+        executed = list(statements)
+        conn.set_trace_callback(None)
+        failures = check_plans(conn, executed)
+        conn.set_trace_callback(statements.append)
+        checked += 1
+        if failures:
+            failed += 1
+            print(f"FAIL {name}")
+            for sql, plan in failures:
+                print("   ", " ".join(sql.split())[:200])
+                for line in plan:
+                    print("       ", line)
+        elif args.verbose:
+            print(f"ok   {name}")
+    conn.set_trace_callback(None)
+
+    range_failures = check_day_ranges(conn)
+    for case in range_failures:
+        print(f"FAIL day_range differs from DATE() for {case}")
+    db.pool.release(conn, pooled)
+
+    print(f"{checked - failed}/{checked} listing calls index-driven, "
+          f"{len(range_failures)} date-range mismatches")
+    sys.exit(1 if failed or range_failures else 0)
+
+
+if __name__ == "__main__":
+    main()
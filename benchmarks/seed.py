@@ -0,0 +1,368 @@
+"""
+Synthetic data for benchmarks.
+
+``seed(conn, **volumes)`` fills an already-migrated database with random but
+deterministic rows using ``executemany`` inside large transactions.
+
+It can also build a seeded database to keep and reuse, e.g. for
+``benchmarks.load``:
+
+    python -m benchmarks.seed OUT.db [--scale small|large] [--employees N ...]
+
+``OUT.db`` starts as a copy of the bundled ``project_tracking.db`` (so the
+default admin can log in) and is written with the ``bulk-load`` PRAGMA
+profile. The per-row triggers (leave ledger, expense timestamps, version
+stamps) run as the rows go in, so the result is consistent; the wiki view
+rollup is rebuilt from the log once the views are in.
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import shutil
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+FIRST_NAMES = [
+    "Aarav", "Vivaan", "Aditya", "Diya", "Ananya", "Ishaan", "Kavya", "Rohan",
+    "Priya", "Sneha", "Arjun", "Meera", "Kiran", "Neha", "Rahul", "Pooja",
+]
+LAST_NAMES = [
+    "Sharma", "Patel", "Reddy", "Nair", "Iyer", "Kumar", "Singh", "Rao",
+    "Gupta", "Joshi", "Menon", "Das", "Shetty", "Kulkarni", "Bhat", "Pillai",
+]
+TASK_STATUSES = ["pending", "in_progress", "completed"]
+REQUEST_STATUSES = ["pending", "approved", "rejected"]
+PRIORITIES = ["low", "medium", "high"]
+
+DEFAULT_VOLUMES = {
+    "employees": 1000,
+    "projects": 100,
+    "tasks": 20000,
+    "task_details": 50000,
+    "leave_requests": 20000,
+    "expenses": 20000,
+    "wiki_pages": 200,
+    "wiki_views": 100000,
+}
+
+SCALES = {
+    "small": DEFAULT_VOLUMES,
+    "large": {
+        "employees": 10000,
+        "projects": 1000,
+        "tasks": 200000,
+        "task_details": 2000000,
+        "leave_requests": 500000,
+        "expenses": 500000,
+        "wiki_pages": 500,
+        "wiki_views": 5000000,
+    },
+}
+
+BATCH = 50000
+EPOCH = datetime(2022, 1, 1)
+SPAN_DAYS = 3 * 365
+
+
+def _batched(rows, size=BATCH):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert(conn, sql, rows):
+    for batch in _batched(rows):
+        conn.executemany(sql, batch)
+    conn.commit()
+
+
+def _ids(conn, table, column):
+    return [r[0] for r in conn.execute(f"SELECT {column} FROM {table}")]
+
+
+def seed(conn, seed_value=42, log=None, rebuild_rollup=False, **volumes):
+    """
+    Insert synthetic rows; ``volumes`` overrides ``DEFAULT_VOLUMES``. With
+    ``rebuild_rollup`` the wiki views go in without the daily rollup trigger
+    and ``TblWikiViewDaily`` is recomputed from the log afterwards, which is
+    much faster for millions of views.
+    """
+    vol = dict(DEFAULT_VOLUMES, **volumes)
+    rnd = random.Random(seed_value)
+    password = hashlib.sha256(b"password").hexdigest()
+    dates = [(EPOCH + timedelta(days=d)).strftime("%Y-%m-%d") for d in range(SPAN_DAYS + 1)]
+
+    def stamp(days_from=0, days_to=SPAN_DAYS):
+        offset = rnd.uniform(days_from, days_to) * 86400
+        return EPOCH + timedelta(seconds=offset)
+
+    def sql_ts():
+        # Formatting the time by hand is twice as fast as datetime.strftime,
+        # which matters for millions of rows.
+        seconds = int(rnd.uniform(0, SPAN_DAYS) * 86400)
+        days, rest = divmod(seconds, 86400)
+        return f"{dates[days]} {rest // 3600:02d}:{rest // 60 % 60:02d}:{rest % 60:02d}"
+
+    def day(lo=0, hi=SPAN_DAYS):
+        return stamp(lo, hi).strftime("%Y-%m-%d")
+
+    def note(msg):
+        if log:
+            log(msg)
+
+    note(f"employees: {vol['employees']}")
+    _insert(
+        conn,
+        """INSERT INTO tbl_employee
+           (first_name, last_name, gender, dob, address, phone_no, email, password,
+            status, emp_type, inserted_date)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        (
+            (
+                rnd.choice(FIRST_NAMES),
+                f"{rnd.choice(LAST_NAMES)}{i}",
+                rnd.choice(["Male", "Female"]),
+                f"{rnd.randint(1965, 2002)}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+                "Bengaluru",
+                f"9{i:09d}",
+                f"seed{seed_value}.{i}@example.com",
+                password,
+                "active" if rnd.random() < 0.95 else "inactive",
+                "emp",
+                sql_ts(),
+            )
+            for i in range(vol["employees"])
+        ),
+    )
+    emp_ids = _ids(conn, "tbl_employee", "emp_id")
+
+    _insert(
+        conn,
+        """INSERT OR IGNORE INTO TblEmployeeProfile
+           (EmployeeId, Designation, DOJ, EmgContact, EmgUpdatedByEmp)
+           VALUES (?, ?, ?, ?, 1)""",
+        (
+            (emp_id, "Engineer", day(-3650, SPAN_DAYS), "9000000000")
+            for emp_id in emp_ids
+        ),
+    )
+
+    note(f"projects: {vol['projects']}")
+    _insert(
+        conn,
+        """INSERT INTO tbl_project
+           (project_name, priority, project_desc, project_status, start_date, inserted_date)
+           VALUES (?, ?, ?, 'active', ?, ?)""",
+        (
+            (f"Project {i}", rnd.choice(PRIORITIES), "Synthetic project", day(), sql_ts())
+            for i in range(vol["projects"])
+        ),
+    )
+    project_ids = _ids(conn, "tbl_project", "project_id")
+
+    note(f"tasks: {vol['tasks']}")
+    _insert(
+        conn,
+        """INSERT INTO tbl_task
+           (project_id, emp_id, task_desc, priority, status, start_date, end_date, inserted_date)
+           VALUES (?, ?, ?, ?, ?, ?, NULL, ?)""",
+        (
+            (
+                rnd.choice(project_ids),
+                rnd.choice(emp_ids),
+                f"Task {i}",
+                rnd.choice(PRIORITIES),
+                rnd.choice(TASK_STATUSES),
+                day(),
+                sql_ts(),
+            )
+            for i in range(vol["tasks"])
+        ),
+    )
+    task_ids = _ids(conn, "tbl_task", "task_id")
+
+    note(f"task details: {vol['task_details']}")
+    if task_ids:
+        _insert(
+            conn,
+            "INSERT INTO tbl_task_details (task_id, desc, status, inserted_date) VALUES (?, ?, ?, ?)",
+            (
+                (rnd.choice(task_ids), "Progress update", "incomplete", sql_ts())
+                for _ in range(vol["task_details"])
+            ),
+        )
+
+    for name in ("Casual Leave", "Sick Leave", "Earned Leave"):
+        conn.execute("INSERT OR IGNORE INTO tbl_leave_type (leave_type) VALUES (?)", (name,))
+    for name in ("Travel", "Lunch", "Hardware", "Others"):
+        conn.execute(
+            "INSERT OR IGNORE INTO tbl_expense_type (expense_type) VALUES (?)", (name,)
+        )
+    conn.commit()
+    leave_type_ids = _ids(conn, "tbl_leave_type", "leave_type_id")
+    expense_type_ids = _ids(conn, "tbl_expense_type", "expense_type_id")
+
+    def leave_row():
+        start = stamp()
+        end = start + timedelta(days=rnd.randint(0, 4))
+        return (
+            rnd.choice(leave_type_ids),
+            rnd.choice(emp_ids),
+            start.strftime("%Y-%m-%d"),
+            end.strftime("%Y-%m-%d"),
+            "Synthetic leave",
+            rnd.choice(REQUEST_STATUSES),
+            (start - timedelta(days=rnd.randint(1, 20))).strftime("%Y-%m-%d %H:%M:%S"),
+        )
+
+    note(f"leave requests: {vol['leave_requests']}")
+    _insert(
+        conn,
+        """INSERT INTO tbl_leave_request
+           (leave_type_id, employee_id, start_date, end_date, leave_desc, status, inserted_date)
+           VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        (leave_row() for _ in range(vol["leave_requests"])),
+    )
+
+    note(f"expenses: {vol['expenses']}")
+    _insert(
+        conn,
+        """INSERT INTO tbl_expenses
+           (expense_type_id, employee_id, exp_description, status, amount,
+            inserted_date, expense_date)
+           VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        (
+            (
+                rnd.choice(expense_type_ids),
+                rnd.choice(emp_ids),
+                "Synthetic expense",
+                rnd.choice(REQUEST_STATUSES),
+                round(rnd.uniform(50, 5000), 2),
+                stamp().replace(tzinfo=pytz.utc).isoformat(),
+                day(),
+            )
+            for _ in range(vol["expenses"])
+        ),
+    )
+
+    conn.execute(
+        "INSERT INTO TblWikiCategory (Category, CatImg) VALUES ('Handbook', NULL)"
+    )
+    category_id = conn.execute("SELECT MAX(CategoryId) FROM TblWikiCategory").fetchone()[0]
+    _insert(
+        conn,
+        "INSERT INTO TblWikiPage (CategoryId, Title, Descri) VALUES (?, ?, ?)",
+        ((category_id, f"Wiki page {i}", "Synthetic page") for i in range(vol["wiki_pages"])),
+    )
+    wiki_ids = _ids(conn, "TblWikiPage", "WikiId")
+
+    note(f"wiki views: {vol['wiki_views']}")
+    if wiki_ids:
+        trigger = None
+        if rebuild_rollup:
+            trigger = conn.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'trigger' "
+                "AND name = 'trg_tblwikiviews_daily_insert'"
+            ).fetchone()
+            if trigger:
+                conn.execute("DROP TRIGGER trg_tblwikiviews_daily_insert")
+        _insert(
+            conn,
+            "INSERT INTO TblWikiViews (WikiId, EmployeeId, ViewDateTime) VALUES (?, ?, ?)",
+            (
+                (rnd.choice(wiki_ids), rnd.choice(emp_ids), sql_ts())
+                for _ in range(vol["wiki_views"])
+            ),
+        )
+        if trigger:
+            note("wiki view rollup")
+            with conn:
+                conn.execute(trigger[0])
+                conn.execute("DELETE FROM TblWikiViewDaily")
+                conn.execute("""
+                    INSERT INTO TblWikiViewDaily (WikiId, Day, Views, UniqueViewers)
+                    SELECT WikiId, DATE(ViewDateTime), COUNT(*), COUNT(DISTINCT EmployeeId)
+                    FROM TblWikiViews
+                    WHERE ViewDateTime IS NOT NULL
+                    GROUP BY WikiId, DATE(ViewDateTime)
+                """)
+
+    conn.execute("PRAGMA optimize")
+    return vol
+
+
+def row_counts(conn):
+    tables = {
+        "employees": "tbl_employee",
+        "projects": "tbl_project",
+        "tasks": "tbl_task",
+        "task_details": "tbl_task_details",
+        "leave_requests": "tbl_leave_request",
+        "expenses": "tbl_expenses",
+        "wiki_pages": "TblWikiPage",
+        "wiki_views": "TblWikiViews",
+    }
+    return {
+        name: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        for name, table in tables.items()
+    }
+
+
+def main():
+    from benchmarks._support import ROOT
+    from database import Database
+
+    parser = argparse.ArgumentParser(description="Build a seeded copy of project_tracking.db.")
+    parser.add_argument("out", help="database file to create")
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--force", action="store_true", help="replace OUT if it exists")
+    for name in DEFAULT_VOLUMES:
+        parser.add_argument("--" + name.replace("_", "-"), type=int, dest=name)
+    args = parser.parse_args()
+
+    if os.path.exists(args.out) and not args.force:
+        sys.exit(f"{args.out} exists; pass --force to replace it.")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(args.out + suffix):
+            os.remove(args.out + suffix)
+    shutil.copy(os.path.join(ROOT, "project_tracking.db"), args.out)
+
+    volumes = dict(SCALES[args.scale])
+    volumes.update({name: getattr(args, name) for name in DEFAULT_VOLUMES
+                    if getattr(args, name) is not None})
+
+    db = Database(args.out, pool_size=0, profile="bulk-load")
+    conn = db.connect()
+    started = time.perf_counter()
+
+    def log(msg):
+        print(f"[{time.perf_counter() - started:7.1f}s] {msg}", flush=True)
+
+    seed(conn, seed_value=args.seed, log=log, rebuild_rollup=True, **volumes)
+    log("ANALYZE")
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    counts = row_counts(conn)
+    conn.close()
+
+    elapsed = time.perf_counter() - started
+    rows = sum(counts.values())
+    print(f"\n{args.out}: {os.path.getsize(args.out) / 1e6:.1f} MB, "
+          f"{rows} rows in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s)")
+    for name, count in counts.items():
+        print(f"  {name:<16}{count:>12,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Wiki view report cost as the raw view log grows: raw aggregate vs daily rollup.
+
+    python -m benchmarks.wiki_rollup [--steps 100000,300000,1000000] [--pages 40] [--repeat 10]
+
+Grows ``TblWikiViews`` step by step (the rollup trigger runs for every seeded
+view) and at each size times the report's summary counts computed from the
+raw log, as before migration 0007, against ``get_wiki_view_counts`` on
+``TblWikiViewDaily``; and the old unpaginated listing of the raw log against
+the first and a deep page of ``get_wiki_views_keyset``. Finishes with a rollup consistency
+check.
+"""
+
+import argparse
+import statistics
+import sys
+import time
+
+from benchmarks._support import isolated_workdir, timed
+from benchmarks.seed import seed
+from database import Database
+
+RAW_COUNTS = """
+    SELECT wp.WikiId, wp.Title, COUNT(*) AS view_count
+    FROM TblWikiViews wv
+    JOIN TblWikiPage wp ON wv.WikiId = wp.WikiId
+    WHERE wv.ViewDateTime >= ? AND wv.ViewDateTime < ?
+    GROUP BY wp.WikiId, wp.Title ORDER BY view_count DESC
+"""
+
+RAW_LIST = """
+    SELECT wv.WikiViewId, wp.Title, e.first_name || ' ' || e.last_name, wv.ViewDateTime
+    FROM TblWikiViews wv
+    JOIN TblWikiPage wp ON wv.WikiId = wp.WikiId
+    JOIN tbl_employee e ON wv.EmployeeId = e.emp_id
+    WHERE wv.ViewDateTime >= ? AND wv.ViewDateTime < ?
+    ORDER BY wv.ViewDateTime DESC
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--steps", default="100000,300000,1000000")
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    isolated_workdir()
+    db = Database("project_tracking.db", pool_size=1)
+    conn = db.get_connection()
+    seed(conn, employees=500, projects=1, tasks=0, task_details=0,
+         leave_requests=0, expenses=0, wiki_pages=args.pages, wiki_views=0)
+    start_day, end_day = "2024-01-01", "2024-03-31"
+
+    def deep_page():
+        cursor = None
+        for _ in range(20):
+            cursor = db.get_wiki_views_keyset(start_day, end_day, cursor=cursor)[2]
+
+    print(f"{'views':>9}{'seed s':>8}{'raw counts':>12}{'rollup':>9}"
+          f"{'full list':>11}{'page 1':>9}{'page 20':>9}  (median ms)")
+    stored = conn.execute("SELECT COUNT(*) FROM TblWikiViews").fetchone()[0]
+    for target in (int(step) for step in args.steps.split(",")):
+        start = time.perf_counter()
+        seed(conn, employees=0, projects=0, tasks=0, task_details=0, leave_requests=0,
+             expenses=0, wiki_pages=0, wiki_views=max(0, target - stored), seed_value=target)
+        seed_s = time.perf_counter() - start
+        stored = conn.execute("SELECT COUNT(*) FROM TblWikiViews").fetchone()[0]
+        conn.execute("ANALYZE")
+        med = lambda fn: statistics.median(timed(fn, args.repeat))
+        print(
+            f"{stored:>9}{seed_s:>8.1f}"
+            f"{med(lambda: conn.execute(RAW_COUNTS, (start_day, '2024-04-01')).fetchall()):>12.2f}"
+            f"{med(lambda: db.get_wiki_view_counts(start_day, end_day)):>9.2f}"
+            f"{med(lambda: conn.execute(RAW_LIST, (start_day, '2024-04-01')).fetchall()):>11.2f}"
+            f"{med(lambda: db.get_wiki_views_keyset(start_day, end_day)):>9.2f}"
+            f"{med(deep_page) / 20:>9.2f}"
+        )
+
+    mismatches = db.check_wiki_view_rollup()
+    print(f"rollup check: {len(mismatches)} page-days differ from the raw log")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Wiki page view tracking: synchronous inserts vs the write-behind recorder.
+
+    python -m benchmarks.wiki_views [--requests 2000] [--threads 8]
+
+Opens ``/employee/wiki/<id>`` from several threads through the Flask test
+client, once with ``WIKI_VIEW_FLUSH_MS=0`` (one committed INSERT per view)
+and once with the buffered recorder, then checks that every view reached
+``TblWikiViews`` after the final flush.
+"""
+
+import argparse
+import statistics
+import threading
+import time
+
+from benchmarks._support import import_app, isolated_workdir, login, percentile, timed
+
+
+def hammer(app_module, wiki_id, emp_id, requests, threads):
+    samples = []
+    lock = threading.Lock()
+
+    def worker(count):
+        client = app_module.app.test_client()
+        login(client, emp_id, "emp")
+        local = []
+        for _ in range(count):
+            start = time.perf_counter()
+            assert client.get(f"/employee/wiki/{wiki_id}").status_code == 200
+            local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            samples.extend(local)
+
+    per_thread = requests // threads
+    workers = [threading.Thread(target=worker, args=(per_thread,)) for _ in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return samples, time.perf_counter() - start, per_thread * threads
+
+
+def view_count(db, wiki_id):
+    conn = db.connect()
+    count = conn.execute("SELECT COUNT(*) FROM TblWikiViews WHERE WikiId = ?", (wiki_id,)).fetchone()[0]
+    conn.close()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    isolated_workdir()
+    app_module = import_app(DB_POOL_SIZE=args.threads)
+    buffered_db = app_module.db
+    conn = buffered_db.connect()
+    wiki_id = conn.execute(
+        """
+        SELECT wp.WikiId FROM TblWikiPage wp
+        JOIN TblWikiCategory wc ON wc.CategoryId = wp.CategoryId
+        WHERE wp.RowStatus = 0 ORDER BY wp.WikiId
+        """
+    ).fetchone()[0]
+    emp_id = conn.execute("SELECT emp_id FROM tbl_employee WHERE emp_type = 'emp'").fetchone()[0]
+    conn.close()
+
+    results = {}
+    for label, db in (
+        ("synchronous", app_module.Database(pool_size=args.threads, view_flush_ms=0)),
+        ("write-behind", buffered_db),
+    ):
+        app_module.db = db
+        before = view_count(db, wiki_id)
+        samples, elapsed, sent = hammer(app_module, wiki_id, emp_id, args.requests, args.threads)
+        # Cost of the call on the request path alone
+        call_us = statistics.mean(timed(lambda: db.add_wiki_view(wiki_id, emp_id), 500)) * 1000
+        if db.view_recorder is not None:
+            db.view_recorder.close()
+            commits = db.view_recorder.stats["batches"]
+        else:
+            commits = sent + 500
+        stored = view_count(db, wiki_id) - before
+        results[label] = (samples, elapsed, sent + 500, stored, commits, call_us)
+
+    print(
+        f"{'mode':<14}{'req/s':>8}{'p50 ms':>8}{'p95 ms':>8}{'p99 ms':>8}"
+        f"{'call us':>9}{'views':>7}{'stored':>8}{'commits':>9}"
+    )
+    for label, (samples, elapsed, sent, stored, commits, call_us) in results.items():
+        print(
+            f"{label:<14}{len(samples) / elapsed:>8.0f}{percentile(samples, 50):>8.2f}"
+            f"{percentile(samples, 95):>8.2f}{percentile(samples, 99):>8.2f}"
+            f"{call_us:>9.1f}{sent:>7}{stored:>8}{commits:>9}"
+        )
+    print(f"recorder stats: {buffered_db.view_recorder.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,228 +1,727 @@
 import sqlite3
 import hashlib
-from datetime import datetime
+import threading
+import time
+import base64
+import json
+import re
+from datetime import datetime, date, timedelta
 import pytz
 from contextlib import closing
 
+import migrations
+import instrumentation
+from background import QueueWorker
+
+
+# Connection setup profiles, selected with Database(profile=...) / DB_PROFILE.
+# Every connection runs these PRAGMAs in order when it is opened.
+PRAGMA_PROFILES = {
+    "dev": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "cache_size": -8000,  # KiB
+        "mmap_size": 0,
+        "temp_store": "MEMORY",
+        "foreign_keys": "ON",
+    },
+    "prod": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 15000,
+        "cache_size": -32000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+        "foreign_keys": "ON",
+    },
+    # Seeding / imports: trades durability for speed, skips FK checks.
+    "bulk-load": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "busy_timeout": 60000,
+        "cache_size": -256000,
+        "mmap_size": 1073741824,
+        "temp_store": "MEMORY",
+        "foreign_keys": "OFF",
+    },
+}
+
+
+def apply_pragmas(conn, profile):
+    for name, value in PRAGMA_PROFILES[profile].items():
+        conn.execute(f"PRAGMA {name} = {value}")
+
+
+def encode_cursor(direction, key):
+    """Opaque page token. ``direction`` is "n" (older rows) or "p" (newer rows)."""
+    raw = json.dumps([direction, *key], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Inverse of encode_cursor; returns None for a missing or mangled token."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        direction, *key = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    if direction not in ("n", "p") or len(key) != 2:
+        return None
+    return direction, key
+
+
+def day_range(column, start=None, end=None):
+    """
+    Inclusive ``start``/``end`` days ("YYYY-MM-DD") as a half-open range on
+    the raw column -- ``column >= start AND column < end + 1 day`` -- so an
+    index on it stays usable, unlike ``DATE(column)``. Plain dates and both
+    stored timestamp formats begin with the day, so the text comparison is
+    exact. Unparseable bounds are ignored. Returns ``(conditions, params)``.
+    """
+    conditions, params = [], []
+    for bound, op, shift in ((start, ">=", 0), (end, "<", 1)):
+        if not bound:
+            continue
+        try:
+            day = date.fromisoformat(str(bound)[:10])
+        except ValueError:
+            continue
+        conditions.append(f"{column} {op} ?")
+        params.append((day + timedelta(days=shift)).isoformat())
+    return conditions, params
+
+
+def epoch_range(column, start=None, end=None, tz=pytz.utc):
+    """
+    day_range for epoch-second columns: inclusive ``start``/``end`` days are
+    whole days in ``tz``, turned into an integer range
+    ``column >= midnight(start) AND column < midnight(end + 1 day)``.
+    Unparseable bounds are ignored. Returns ``(conditions, params)``.
+    """
+    conditions, params = [], []
+    for bound, op, shift in ((start, ">=", 0), (end, "<", 1)):
+        if not bound:
+            continue
+        try:
+            day = datetime.strptime(str(bound)[:10], "%Y-%m-%d")
+        except ValueError:
+            continue
+        conditions.append(f"{column} {op} ?")
+        params.append(int(tz.localize(day + timedelta(days=shift)).timestamp()))
+    return conditions, params
+
+
+def format_epochs(rows, columns, tz=pytz.utc, fmt="%Y-%m-%d %H:%M:%S", missing=None):
+    """
+    Copy ``rows`` as lists with the epoch-second values at the ``columns``
+    indexes formatted as ``fmt`` in ``tz`` (None becomes ``missing``). The
+    UTC offset is resolved once per distinct quarter hour on the page (zone
+    transitions fall on quarter hours) instead of localising every value.
+    """
+    offsets = {}
+    formatted = []
+    for row in rows:
+        row = list(row)
+        for i in columns:
+            ts = row[i]
+            if ts is None:
+                row[i] = missing
+                continue
+            bucket = ts // 900
+            offset = offsets.get(bucket)
+            if offset is None:
+                offset = offsets[bucket] = int(
+                    datetime.fromtimestamp(bucket * 900, tz).utcoffset().total_seconds()
+                )
+            row[i] = time.strftime(fmt, time.gmtime(ts + offset))
+        formatted.append(row)
+    return formatted
+
+
+def _is_leap(year):
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+
+def month_day_windows(today, days):
+    """
+    MMDD ordinals (see migration 0006) falling in ``today .. today + days``,
+    as inclusive ``(low, high)`` ranges: one range, or two when the window
+    wraps past December 31. Feb 29 counts as Mar 1 in non-leap years.
+    """
+    if days >= 365:
+        return [(101, 1231)]
+    end = today + timedelta(days=days)
+    start_md = today.month * 100 + today.day
+    end_md = end.month * 100 + end.day
+    if end.year == today.year:
+        windows = [(today.year, start_md, end_md)]
+    else:
+        windows = [(today.year, start_md, 1231), (end.year, 101, end_md)]
+    return [
+        (229 if low == 301 and not _is_leap(year) else low, high)
+        for year, low, high in windows
+    ]
+
+
+def next_occurrence(month_day, today):
+    """Date of the next ``month_day`` (MMDD ordinal) on or after ``today``."""
+    month, day = divmod(month_day, 100)
+    for year in (today.year, today.year + 1):
+        if (month, day) == (2, 29) and not _is_leap(year):
+            occurrence = date(year, 3, 1)
+        else:
+            occurrence = date(year, month, day)
+        if occurrence >= today:
+            return occurrence
+
+
+def leave_month_days(start, end):
+    """
+    Split the inclusive leave ``start``..``end`` into ``[("YYYY-MM", days)]``
+    per calendar month. Unparseable or reversed ranges give ``[]``.
+    """
+    try:
+        day = date.fromisoformat(str(start)[:10])
+        last = date.fromisoformat(str(end)[:10])
+    except ValueError:
+        return []
+    months = []
+    while day <= last:
+        next_month = (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+        month_end = min(last, next_month - timedelta(days=1))
+        months.append((day.strftime("%Y-%m"), (month_end - day).days + 1))
+        day = next_month
+    return months
+
+
+def month_bound(value):
+    """``"YYYY-MM"`` from a ``YYYY-MM`` or ``YYYY-MM-DD`` filter value, else None."""
+    try:
+        return datetime.strptime(str(value)[:7], "%Y-%m").strftime("%Y-%m")
+    except ValueError:
+        return None
 
-class Database:
-    def __init__(self, db_name="project_tracking.db"):
-        self.db_name = db_name
-        self.init_database()
 
-    def get_connection(self):
-        return sqlite3.connect(self.db_name)
+class ConnectionPool:
+    """
+    Keeps one long-lived SQLite connection per worker thread.
 
-    def init_database(self):
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    At most ``size`` threads hold a pooled connection at once; extra threads
+    get a transient connection that is closed again on release. Connections
+    owned by threads that have exited are reaped when a slot is needed.
+    """
 
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS tbl_employee (
-                emp_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                first_name TEXT NOT NULL,
-                last_name TEXT NOT NULL,
-                gender TEXT NOT NULL,
-                dob DATE NOT NULL,
-                address TEXT NOT NULL,
-                phone_no TEXT NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                status TEXT DEFAULT 'active',
-                emp_type TEXT DEFAULT 'emp',
-                inserted_date DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+    def __init__(self, connect, size=8):
+        self._connect = connect
+        self.size = size
+        self._lock = threading.Lock()
+        self._conns = {}  # thread ident -> (thread, connection)
+        self.stats = {"opened": 0, "reused": 0, "overflow": 0, "discarded": 0}
 
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS tbl_project (
-                project_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                project_name TEXT NOT NULL,
-                priority TEXT NOT NULL,
-                project_desc TEXT,
-                project_status TEXT DEFAULT 'active',
-                start_date DATE NOT NULL,
-                end_date DATE,
-                inserted_date DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+    def _open(self):
+        self.stats["opened"] += 1
+        return self._connect()
 
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS tbl_task (
-                task_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                project_id INTEGER NOT NULL,
-                emp_id INTEGER NOT NULL,
-                task_desc TEXT NOT NULL,
-                priority TEXT NOT NULL,
-                status TEXT DEFAULT 'pending',
-                start_date DATE NOT NULL,
-                end_date DATE,
-                inserted_date DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (project_id) REFERENCES tbl_project (project_id),
-                FOREIGN KEY (emp_id) REFERENCES tbl_employee (emp_id)
-            )
-        """)
+    def _healthy(self, conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _reap(self):
+        for ident, (thread, conn) in list(self._conns.items()):
+            if not thread.is_alive():
+                del self._conns[ident]
+                conn.close()
+
+    def acquire(self):
+        """Return ``(connection, pooled)`` for the calling thread."""
+        ident = threading.get_ident()
+        with self._lock:
+            entry = self._conns.get(ident)
+            if entry is not None:
+                conn = entry[1]
+                if self._healthy(conn):
+                    self.stats["reused"] += 1
+                    return conn, True
+                del self._conns[ident]
+                self.stats["discarded"] += 1
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+
+            if len(self._conns) >= self.size:
+                self._reap()
+            if len(self._conns) >= self.size:
+                self.stats["overflow"] += 1
+                return self._open(), False
+
+            conn = self._open()
+            self._conns[ident] = (threading.current_thread(), conn)
+            return conn, True
+
+    def release(self, conn, pooled):
+        """Hand a connection back; discards any uncommitted work."""
+        if not pooled:
+            conn.close()
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        conn.row_factory = None
+
+    def close_all(self):
+        with self._lock:
+            for _, conn in self._conns.values():
+                conn.close()
+            self._conns.clear()
+
+
+class PooledConnection:
+    """
+    Thin proxy over a pooled ``sqlite3.Connection``.
+
+    ``close()`` hands the connection back to the pool instead of closing it,
+    so the existing ``conn = self.get_connection() ... conn.close()`` and
+    ``with self.get_connection() as c:`` call sites work unchanged.
+    """
+
+    __slots__ = ("_conn", "_release")
+
+    def __init__(self, conn, release):
+        object.__setattr__(self, "_conn", conn)
+        object.__setattr__(self, "_release", release)
+        conn.row_factory = None
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._conn.__exit__(exc_type, exc, tb)
+
+    def close(self):
+        if self._release is not None:
+            self._release()
+            object.__setattr__(self, "_release", None)
+
+
+class WikiViewRecorder(QueueWorker):
+    """
+    Write-behind buffer for wiki page views.
+
+    ``record()`` only appends to an in-memory queue; a background thread
+    inserts the queued rows with one ``executemany`` every ``flush_ms``
+    milliseconds, or as soon as ``batch_size`` views are waiting. At most
+    ``max_pending`` views are held -- further views are dropped and counted
+    -- and whatever is queued is written at interpreter exit. View times are
+    taken when the view is recorded, not when it is flushed.
+    """
+
+    name = "wiki-view-recorder"
+
+    def __init__(self, connect, flush_ms=500, batch_size=200, max_pending=10000):
+        super().__init__()
+        self._connect = connect
+        self.flush_ms = flush_ms
+        self.interval = flush_ms / 1000
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._flush_lock = threading.Lock()
+        self._conn = None
+        self.stats = {"recorded": 0, "flushed": 0, "dropped": 0, "batches": 0, "errors": 0}
+
+    def record(self, wiki_id, emp_id):
+        viewed_at = datetime.now(pytz.utc).strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self.stats["dropped"] += 1
+                return False
+            self._pending.append((wiki_id, emp_id, viewed_at))
+            self.stats["recorded"] += 1
+            full = len(self._pending) >= self.batch_size
+        self.ensure_started()
+        if full:
+            self._wake.set()
+        return True
+
+    def flush(self):
+        """Write everything queued so far; returns the number of rows inserted."""
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._pending)
+                self._pending.clear()
+            if not batch:
+                return 0
+            if self._conn is None:
+                self._conn = self._connect()
+            sql = "INSERT INTO TblWikiViews (WikiId, EmployeeId, ViewDateTime) VALUES (?, ?, ?)"
+            try:
+                with self._conn:
+                    self._conn.executemany(sql, batch)
+                written = len(batch)
+            except sqlite3.IntegrityError:
+                # A page or employee vanished meanwhile: keep the rest.
+                written = 0
+                for row in batch:
+                    try:
+                        with self._conn:
+                            self._conn.execute(sql, row)
+                        written += 1
+                    except sqlite3.IntegrityError:
+                        self.stats["dropped"] += 1
+            except sqlite3.Error:
+                # Locked or otherwise failed: requeue for the next round.
+                self.stats["errors"] += 1
+                with self._lock:
+                    room = self.max_pending - len(self._pending)
+                    self._pending.extendleft(reversed(batch[:room]))
+                    self.stats["dropped"] += len(batch) - max(room, 0)
+                return 0
+            self.stats["flushed"] += written
+            self.stats["batches"] += 1
+            return written
+
+    drain = flush
+
+    def close(self):
+        """Stop the writer thread and flush what is left."""
+        super().close()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class ReferenceCache:
+    """
+    Read-through cache for small lookup tables (employees, projects, leave
+    and expense types, wiki categories).
+
+    Each entry remembers the ``TblCacheVersion`` counter of its table when it
+    was loaded; triggers bump that counter on every write to the table, from
+    any connection or process. A lookup reads the counter (one primary-key
+    row) and only re-runs the query when it has moved, so there is no TTL to
+    tune and workers never serve data older than their last lookup.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, c, table, key, load):
+        """Rows for ``key``, from the cache or from ``load(c)``."""
+        if not self.enabled:
+            return load(c)
+        row = c.execute(
+            "SELECT Version FROM TblCacheVersion WHERE TableName = ?", (table,)
+        ).fetchone()
+        version = row[0] if row else None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and version is not None and entry[0] == version:
+                self.stats["hits"] += 1
+                return list(entry[1])
+            self.stats["misses"] += 1
+        # The version was read first, so a write racing with the load can
+        # only make the entry look older than it is, never newer.
+        rows = load(c)
+        with self._lock:
+            self._entries[key] = (version, rows)
+        return list(rows)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
 
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS tbl_task_details (
-                detail_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                task_id INTEGER NOT NULL,
-                desc TEXT NOT NULL,
-                inserted_date DATETIME DEFAULT CURRENT_TIMESTAMP,
-                status TEXT DEFAULT 'incomplete',
-                FOREIGN KEY (task_id) REFERENCES tbl_task (task_id)
-            )
-        """)
 
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS tbl_leave_type (
-                leave_type_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                leave_type     TEXT NOT NULL UNIQUE CHECK (LENGTH(leave_type)<=50),
-                inserted_date  DATETIME DEFAULT CURRENT_TIMESTAMP
+class Database:
+    def __init__(
+        self,
+        db_name="project_tracking.db",
+        pool_size=0,
+        profile="prod",
+        auto_migrate=True,
+        count_cache_ttl=0,
+        view_flush_ms=0,
+        view_batch_size=200,
+        view_max_pending=10000,
+        reference_cache=True,
+    ):
+        if profile not in PRAGMA_PROFILES:
+            raise ValueError(
+                f"Unknown DB profile {profile!r}; expected one of "
+                + ", ".join(PRAGMA_PROFILES)
             )
-        """)
-
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS tbl_leave_request (
-                request_id      INTEGER PRIMARY KEY AUTOINCREMENT,
-                leave_type_id   INTEGER NOT NULL,
-                employee_id     INTEGER NOT NULL,
-                start_date      DATE    NOT NULL,
-                end_date        DATE    NOT NULL,
-                leave_desc      TEXT    CHECK (LENGTH(leave_desc)<=500),
-                manager_id      INTEGER,
-                comments        TEXT    CHECK (LENGTH(comments)<=200),
-                status          TEXT    DEFAULT 'pending',   -- pending/approved/rejected
-                inserted_date   DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (leave_type_id) REFERENCES tbl_leave_type(leave_type_id),
-                FOREIGN KEY (employee_id)  REFERENCES tbl_employee(emp_id),
-                FOREIGN KEY (manager_id)   REFERENCES tbl_employee(emp_id)
+        self.db_name = db_name
+        # ":memory:" is one in-memory database shared by all connections of
+        # this instance (SQLite's memdb VFS); the anchor keeps it alive
+        # between them.
+        self._memory_anchor = None
+        if db_name == ":memory:":
+            self.db_name = f"file:/hrms-{id(self)}?vfs=memdb"
+            self._memory_anchor = sqlite3.connect(
+                self.db_name, uri=True, check_same_thread=False
             )
-        """)
-
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS tbl_expense_type (
-                expense_type_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                expense_type    TEXT NOT NULL UNIQUE,            -- duplication guard
-                inserted_date   DATETIME DEFAULT CURRENT_TIMESTAMP
+        self.profile = profile
+        self.auto_migrate = auto_migrate
+        self.connections_opened = 0
+        self.pool = ConnectionPool(self.connect, pool_size) if pool_size else None
+        self._app_scoped = False
+        # Listing totals per filter signature; see _listing.
+        self.count_cache_ttl = count_cache_ttl
+        self._totals = {}
+        self._totals_lock = threading.Lock()
+        # Wiki page views are written behind when view_flush_ms is set.
+        self.view_recorder = (
+            WikiViewRecorder(
+                self.connect, view_flush_ms, view_batch_size, view_max_pending
             )
-        """)
+            if view_flush_ms
+            else None
+        )
+        # Employee/project/type/category lookups; see ReferenceCache.
+        self.reference_cache = ReferenceCache(reference_cache)
+        self.init_database()
 
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS tbl_expenses (
-                expense_id        INTEGER PRIMARY KEY AUTOINCREMENT,
-                expense_type_id   INTEGER NOT NULL,
-                employee_id       INTEGER NOT NULL,
-                exp_description   TEXT CHECK (LENGTH(exp_description)<=500),
-                manager_id        INTEGER,                      -- who will approve
-                approver_comments TEXT CHECK (LENGTH(approver_comments)<=200),
-                given_by_id       INTEGER,                      -- who reimbursed / paid
-                final_comments    TEXT CHECK (LENGTH(final_comments)<=200),
-                status            TEXT  DEFAULT 'pending',      -- pending/approved/rejected
-                inserted_date     DATETIME DEFAULT CURRENT_TIMESTAMP,
-                amount            REAL,
-
-                FOREIGN KEY (expense_type_id) REFERENCES tbl_expense_type(expense_type_id),
-                FOREIGN KEY (employee_id)     REFERENCES tbl_employee(emp_id),
-                FOREIGN KEY (manager_id)      REFERENCES tbl_employee(emp_id),
-                FOREIGN KEY (given_by_id)     REFERENCES tbl_employee(emp_id)
-            )
-        """)
+    def connect(self):
+        """Open a new, unpooled connection with the PRAGMA profile applied."""
+        self.connections_opened += 1
+        conn = sqlite3.connect(
+            self.db_name,
+            check_same_thread=False,
+            factory=instrumentation.TimedConnection,
+            uri=self._memory_anchor is not None,
+        )
+        conn.set_trace_callback(instrumentation.trace)
+        apply_pragmas(conn, self.profile)
+        return conn
 
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS TblWikiCategory (
-                CategoryId INTEGER PRIMARY KEY AUTOINCREMENT,
-                Category   TEXT    NOT NULL,
-                CatImg     TEXT,
-                inserted_date DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+    def init_app(self, app):
+        """
+        Bind pooled connections to Flask's app context: the first ``db.*``
+        call in a request checks a connection out (with a health check) and
+        every later call reuses it until the context is torn down.
+        """
+        if self.pool is None:
+            return
+        self._app_scoped = True
+        app.teardown_appcontext(self._teardown_appcontext)
 
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS TblPolicies (
-                PolicyID          INTEGER PRIMARY KEY AUTOINCREMENT,
-                PolicyName        TEXT    NOT NULL UNIQUE,
-                FilePath          TEXT    NOT NULL,
-                FileName          TEXT    NOT NULL,      -- timestamp-prefixed name on disk
-                OriginalFileName  TEXT    NOT NULL,      -- name user uploaded
-                FileSize          INTEGER NOT NULL,      -- bytes
-                UploadedAt        TEXT    NOT NULL       -- ISO-8601 timestamp
-            )
-        """)
+    def _teardown_appcontext(self, exc=None):
+        from flask import g
 
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS TblWikiPage (
-                WikiId       INTEGER PRIMARY KEY AUTOINCREMENT,
-                CategoryId   INTEGER NOT NULL,
-                Title        TEXT    NOT NULL,
-                Descri       TEXT,
-                InsertedDate DATETIME DEFAULT CURRENT_TIMESTAMP,
-                RowStatus    INTEGER DEFAULT 0,
-                FOREIGN KEY (CategoryId) REFERENCES TblWikiCategory(CategoryId)
-            )
-        """)
+        checkout = g.pop("_db_checkout", None)
+        if checkout is not None:
+            self.pool.release(*checkout)
 
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS TblWikiViews (
-                WikiViewId   INTEGER PRIMARY KEY AUTOINCREMENT,
-                WikiId       INTEGER NOT NULL,
-                EmployeeId   INTEGER NOT NULL,
-                ViewDateTime DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (WikiId)     REFERENCES TblWikiPage(WikiId),
-                FOREIGN KEY (EmployeeId) REFERENCES tbl_employee(emp_id)
+    def get_connection(self):
+        if self.pool is None:
+            return self.connect()
+
+        if self._app_scoped:
+            from flask import g, has_app_context
+
+            if has_app_context():
+                checkout = g.get("_db_checkout")
+                if checkout is None:
+                    checkout = g._db_checkout = self.pool.acquire()
+                # The handle stays checked out for the rest of the request;
+                # closing it only rolls back what the caller left uncommitted.
+                return PooledConnection(
+                    checkout[0], lambda: self._rollback_pending(checkout[0])
+                )
+
+        conn, pooled = self.pool.acquire()
+        return PooledConnection(conn, lambda: self.pool.release(conn, pooled))
+
+    @staticmethod
+    def _rollback_pending(conn):
+        if conn.in_transaction:
+            conn.rollback()
+
+    def _total_key(self, c, total_sql, total_params):
+        # Writes bump the TblCacheVersion counters of the tables they touch,
+        # so keying on them drops a cached total on the next write instead of
+        # serving it (under a fresh ETag) until the TTL runs out.
+        if not self.count_cache_ttl:
+            return None
+        stamps = tuple(
+            (name, version)
+            for name, version in c.execute(
+                "SELECT TableName, Version FROM TblCacheVersion"
             )
-        """)
+            if re.search(rf"\b{name}\b", total_sql, re.IGNORECASE)
+        )
+        return total_sql, tuple(total_params), stamps
+
+    def _cached_total(self, key):
+        if key is None:
+            return None
+        with self._totals_lock:
+            entry = self._totals.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        return None
 
-        conn.commit()
+    def _store_total(self, key, total):
+        if key is None:
+            return
+        with self._totals_lock:
+            if len(self._totals) >= 1024:
+                self._totals.clear()
+            self._totals[key] = (time.monotonic() + self.count_cache_ttl, total)
+
+    def _count(self, c, from_sql, where, params):
+        sql = f"SELECT COUNT(*) FROM {from_sql} {where}"
+        key = self._total_key(c, sql, params)
+        total = self._cached_total(key)
+        if total is None:
+            total = c.execute(sql, params).fetchone()[0]
+            self._store_total(key, total)
+        return total
+
+    def _listing(
+        self, c, columns, from_sql, where, params, order_by, limit, offset=0,
+        seek="", seek_params=(), total_sql=None, total_params=(),
+    ):
+        """
+        One page of ``SELECT columns FROM from_sql where`` plus the total row
+        count of the filtered listing, in a single statement. The total is an
+        uncorrelated scalar subquery, so SQLite evaluates it once and the page
+        itself still streams off the ORDER BY index (``COUNT(*) OVER ()``
+        would materialise and sort every matching row first). Totals are
+        cached per filter signature and table version for ``count_cache_ttl``
+        seconds; on a hit only the page is read. ``seek`` narrows the page without affecting
+        the total. ``total_sql`` (with ``total_params``) replaces the COUNT
+        with a cheaper scalar query that yields the same number, e.g. from a
+        rollup table. Returns ``(rows, total)``.
+        """
+        if total_sql is None:
+            total_sql, total_params = f"SELECT COUNT(*) FROM {from_sql} {where}", params
+        key = self._total_key(c, total_sql, total_params)
+        total = self._cached_total(key)
+
+        page_where = where
+        if seek:
+            page_where += (" AND " if where.strip() else " WHERE ") + seek
+        count_column = ""
+        args = [*params, *seek_params, limit, offset]
+        if total is None:
+            count_column = f", ({total_sql})"
+            args = [*total_params, *args]
+
+        rows = c.execute(
+            f"""
+            SELECT {columns}{count_column}
+            FROM {from_sql}
+            {page_where}
+            ORDER BY {order_by}
+            LIMIT ? OFFSET ?
+            """,
+            args,
+        ).fetchall()
 
-        cursor.execute('SELECT COUNT(*) FROM tbl_employee WHERE emp_type = "admin"')
-        admin_count = cursor.fetchone()[0]
+        if total is None:
+            if rows:
+                total = rows[0][-1]
+                rows = [row[:-1] for row in rows]
+            else:
+                total = c.execute(total_sql, total_params).fetchone()[0]
+            self._store_total(key, total)
+        return rows, total
 
-        if admin_count == 0:
-            hashed_password = hashlib.sha256("admin123".encode()).hexdigest()
-            cursor.execute(
-                """
-                INSERT INTO tbl_employee 
-                (first_name, last_name, gender, dob, address, phone_no, email, password, emp_type)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-                (
-                    "Admin",
-                    "User",
-                    "Male",
-                    "1990-01-01",
-                    "Admin Address",
-                    "1234567890",
-                    "admin@company.com",
-                    hashed_password,
-                    "admin",
-                ),
+    def _keyset_page(
+        self, c, columns, from_sql, where, params, key, cursor, limit,
+        total_sql=None, total_params=(),
+    ):
+        """
+        One page of ``SELECT columns FROM from_sql where``, newest first by
+        ``key`` (a ``(date_column, id_column)`` pair). Seeks past the cursor
+        row instead of skipping with OFFSET, so deep pages cost the same as
+        the first one. Returns ``(rows, total, next_cursor, prev_cursor)``; a
+        cursor is None when there is nothing further in that direction.
+        """
+        date_col, id_col = key
+        decoded = decode_cursor(cursor)
+        direction = decoded[0] if decoded else "n"
+        seek, seek_params = "", ()
+        if decoded:
+            op = "<" if direction == "n" else ">"
+            seek, seek_params = f"({date_col}, {id_col}) {op} (?, ?)", decoded[1]
+        order = "DESC" if direction == "n" else "ASC"
+        rows, total = self._listing(
+            c,
+            f"{columns}, {date_col}, {id_col}",
+            from_sql,
+            where,
+            params,
+            f"{date_col} {order}, {id_col} {order}",
+            limit + 1,
+            seek=seek,
+            seek_params=seek_params,
+            total_sql=total_sql,
+            total_params=total_params,
+        )
+        more = len(rows) > limit
+        rows = rows[:limit]
+        if direction == "p":
+            rows.reverse()
+        has_next = more if direction == "n" else True
+        has_prev = decoded is not None if direction == "n" else more
+        next_cursor = encode_cursor("n", rows[-1][-2:]) if rows and has_next else None
+        prev_cursor = encode_cursor("p", rows[0][-2:]) if rows and has_prev else None
+        return [row[:-2] for row in rows], total, next_cursor, prev_cursor
+
+    def table_versions(self, tables):
+        """
+        ``(versions, modified)`` from TblCacheVersion: the change counters of
+        ``tables`` in order, and the epoch second of the latest write to any
+        of them. Cheap enough to run before deciding whether to build a page.
+        """
+        placeholders = ", ".join("?" * len(tables))
+        with self.get_connection() as c:
+            rows = dict(
+                (name, (version, modified))
+                for name, version, modified in c.execute(
+                    f"SELECT TableName, Version, Modified FROM TblCacheVersion "
+                    f"WHERE TableName IN ({placeholders})",
+                    tuple(tables),
+                )
             )
-            conn.commit()
+        versions = tuple(rows.get(table, (None, 0))[0] for table in tables)
+        return versions, max((m for _, m in rows.values()), default=0)
 
-        cursor.execute("""
-                CREATE TABLE IF NOT EXISTS TblEmployeeProfile (
-                    ProfileId INTEGER PRIMARY KEY AUTOINCREMENT,
-                    EmployeeId INTEGER NOT NULL UNIQUE,
-                    EmgUpdatedByEmp INTEGER DEFAULT 0,
-                    UANNo TEXT,
-                    PANNO TEXT,
-                    AadharNo TEXT,
-                    BankName TEXT,
-                    BranchName TEXT,
-                    ACNo TEXT,
-                    IFSCode TEXT,
-                    Designation TEXT,
-                    EmgContact TEXT,
-                    ReportingMng TEXT,
-                    DOJ DATE,
-                    PrgLng TEXT,
-                    FrmWrk TEXT,
-                    FOREIGN KEY(EmployeeId) REFERENCES tbl_employee(emp_id)
+    def init_database(self):
+        """
+        Bring the schema up to date. On an already-migrated database this is
+        a single ``PRAGMA user_version`` read; pending migrations are applied
+        when ``auto_migrate`` is set, otherwise boot fails with instructions.
+        """
+        conn = self.connect()
+        try:
+            if migrations.is_current(conn):
+                return
+            if not self.auto_migrate:
+                raise RuntimeError(
+                    f"Database schema is at version {migrations.stored_version(conn)}, "
+                    f"code expects {migrations.latest_version()}. "
+                    "Run `python -m migrations upgrade`."
                 )
-            """)
-
-        conn.close()
+            migrations.upgrade(conn)
+        finally:
+            conn.close()
 
     def hash_password(self, password):
         return hashlib.sha256(password.encode()).hexdigest()
@@ -278,17 +777,17 @@ class Database:
     def delete_leave_request(self, request_id):
         conn = self.get_connection()
         cursor = conn.cursor()
-        print(request_id)
-        cursor.execute(
-            "DELETE FROM tbl_leave_request WHERE request_id = ?", (request_id,)
-        )
-        conn.commit()
+        with conn:
+            self._begin_write(conn)
+            self._post_leave(conn, request_id, -1)
+            cursor.execute(
+                "DELETE FROM tbl_leave_request WHERE request_id = ?", (request_id,)
+            )
         conn.close()
 
     def delete_expense(self, expense_id):
         conn = self.get_connection()
         cursor = conn.cursor()
-        print(expense_id)
         cursor.execute("DELETE FROM tbl_expenses WHERE expense_id = ?", (expense_id,))
         conn.commit()
         conn.close()
@@ -342,9 +841,19 @@ class Database:
             conn.close()
             raise Exception("Cannot delete employee with assigned tasks.")
 
-        cursor.execute("DELETE FROM tbl_employee WHERE emp_id = ?", (emp_id,))
-        conn.commit()
-        conn.close()
+        try:
+            cursor.execute(
+                "DELETE FROM TblEmployeeProfile WHERE EmployeeId = ?", (emp_id,)
+            )
+            cursor.execute("DELETE FROM tbl_employee WHERE emp_id = ?", (emp_id,))
+            conn.commit()
+        except sqlite3.IntegrityError:
+            raise Exception(
+                "Cannot delete employee with leave, expense, asset, wiki view "
+                "or policy acknowledgment records."
+            )
+        finally:
+            conn.close()
 
     def get_employee(self, emp_id):
         conn = self.get_connection()
@@ -364,9 +873,6 @@ class Database:
         return employee
 
     def get_employees(self, status_filter="all"):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
         query = """
             SELECT emp_id, first_name, last_name, gender, dob, address, phone_no, email, status, emp_type, inserted_date
             FROM tbl_employee
@@ -379,8 +885,13 @@ class Database:
 
         query += " ORDER BY inserted_date DESC"
 
-        cursor.execute(query, params)
-        employees = cursor.fetchall()
+        conn = self.get_connection()
+        employees = self.reference_cache.get(
+            conn,
+            "tbl_employee",
+            ("employees", status_filter),
+            lambda c: c.execute(query, params).fetchall(),
+        )
         conn.close()
         return employees
 
@@ -469,15 +980,16 @@ class Database:
 
     def get_projects(self):
         conn = self.get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            SELECT project_id, project_name, priority, project_desc, project_status, start_date, end_date, inserted_date
-            FROM tbl_project
-            ORDER BY inserted_date DESC
-        """)
-
-        projects = cursor.fetchall()
+        projects = self.reference_cache.get(
+            conn,
+            "tbl_project",
+            ("projects",),
+            lambda c: c.execute("""
+                SELECT project_id, project_name, priority, project_desc, project_status, start_date, end_date, inserted_date
+                FROM tbl_project
+                ORDER BY inserted_date DESC
+            """).fetchall(),
+        )
         conn.close()
         return projects
 
@@ -603,30 +1115,31 @@ class Database:
         conn.close()
         return tasks
 
-    def get_all_tasks_with_details_paginated(
-        self, page, page_size, project_filter="", status_filter="", employee_filter=""
-    ):
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    _TASK_LIST_COLUMNS = """
+        t.task_id, t.task_desc, t.priority, t.status, t.start_date, t.end_date,
+        p.project_name, e.first_name, e.last_name
+    """
+    _TASK_LIST_FROM = """
+        tbl_task t
+        JOIN tbl_project p ON t.project_id = p.project_id
+        JOIN tbl_employee e ON t.emp_id = e.emp_id
+    """
+
+    @staticmethod
+    def _employee_ids(c, full_name):
+        """emp_ids named "first last", so filters can seek on emp_id instead."""
+        return [
+            row[0]
+            for row in c.execute(
+                "SELECT emp_id FROM tbl_employee WHERE first_name || ' ' || last_name = ?",
+                (full_name,),
+            )
+        ]
 
-        # Build the base query
-        query = """
-            SELECT t.task_id, t.task_desc, t.priority, t.status, t.start_date, t.end_date,
-                   p.project_name, e.first_name, e.last_name
-            FROM tbl_task t
-            JOIN tbl_project p ON t.project_id = p.project_id
-            JOIN tbl_employee e ON t.emp_id = e.emp_id
-        """
-        count_query = """
-            SELECT COUNT(*)
-            FROM tbl_task t
-            JOIN tbl_project p ON t.project_id = p.project_id
-            JOIN tbl_employee e ON t.emp_id = e.emp_id
-        """
+    def _task_filters(self, c, project_filter="", status_filter="", employee_filter=""):
         params = []
         conditions = []
 
-        # Apply filters
         if project_filter:
             conditions.append("p.project_name = ?")
             params.append(project_filter)
@@ -634,29 +1147,62 @@ class Database:
             conditions.append("t.status = ?")
             params.append(status_filter)
         if employee_filter:
-            conditions.append("e.first_name || ' ' || e.last_name = ?")
-            params.append(employee_filter)
-
-        if conditions:
-            condition_str = " WHERE " + " AND ".join(conditions)
-            query += condition_str
-            count_query += condition_str
+            emp_ids = self._employee_ids(c, employee_filter)
+            conditions.append(f"t.emp_id IN ({', '.join('?' * len(emp_ids))})")
+            params.extend(emp_ids)
 
-        # Add sorting and pagination
-        query += " ORDER BY t.inserted_date DESC LIMIT ? OFFSET ?"
-        params.extend([page_size, (page - 1) * page_size])
-
-        # Execute count query
-        cursor.execute(count_query, params[:-2] if params[:-2] else [])
-        total_tasks = cursor.fetchone()[0]
-
-        # Execute paginated query
-        cursor.execute(query, params)
-        tasks = cursor.fetchall()
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        return where, params
 
+    def get_all_tasks_with_details_paginated(
+        self, page, page_size, project_filter="", status_filter="", employee_filter=""
+    ):
+        conn = self.get_connection()
+        where, params = self._task_filters(
+            conn, project_filter, status_filter, employee_filter
+        )
+        tasks, total_tasks = self._listing(
+            conn,
+            self._TASK_LIST_COLUMNS,
+            self._TASK_LIST_FROM,
+            where,
+            params,
+            "t.inserted_date DESC",
+            page_size,
+            (page - 1) * page_size,
+        )
         conn.close()
         return tasks, total_tasks
 
+    def get_all_tasks_with_details_keyset(
+        self,
+        page_size,
+        cursor=None,
+        project_filter="",
+        status_filter="",
+        employee_filter="",
+    ):
+        """
+        Cursor-paginated variant of get_all_tasks_with_details_paginated.
+        Returns ``(tasks, total_tasks, next_cursor, prev_cursor)``.
+        """
+        conn = self.get_connection()
+        where, params = self._task_filters(
+            conn, project_filter, status_filter, employee_filter
+        )
+        page = self._keyset_page(
+            conn,
+            self._TASK_LIST_COLUMNS,
+            self._TASK_LIST_FROM,
+            where,
+            params,
+            ("t.inserted_date", "t.task_id"),
+            cursor,
+            page_size,
+        )
+        conn.close()
+        return page
+
     def has_task_detail_today(self, task_id, emp_id):
         conn = self.get_connection()
         cursor = conn.cursor()
@@ -667,7 +1213,8 @@ class Database:
             FROM tbl_task_details td
             JOIN tbl_task t ON td.task_id = t.task_id
             WHERE td.task_id = ? AND t.emp_id = ? 
-            AND DATE(td.inserted_date) = DATE('now')
+            AND td.inserted_date >= DATE('now')
+            AND td.inserted_date < DATE('now', '+1 day')
         """,
             (task_id, emp_id),
         )
@@ -818,14 +1365,19 @@ class Database:
 
     def get_leave_types(self):
         with self.get_connection() as c:
-            return c.execute(
-                "SELECT leave_type_id, leave_type FROM tbl_leave_type ORDER BY leave_type"
-            ).fetchall()
+            return self.reference_cache.get(
+                c,
+                "tbl_leave_type",
+                ("leave_types",),
+                lambda c: c.execute(
+                    "SELECT leave_type_id, leave_type FROM tbl_leave_type ORDER BY leave_type"
+                ).fetchall(),
+            )
 
     def update_leave_type(self, lt_id, leave_type):
         with self.get_connection() as c:
             try:
-                c.execute(
+                cur = c.execute(
                     """
                     UPDATE tbl_leave_type
                     SET leave_type = ?
@@ -833,17 +1385,60 @@ class Database:
                 """,
                     (leave_type, lt_id),
                 )
-                return c.total_changes > 0
+                return cur.rowcount > 0
             except sqlite3.IntegrityError:
                 return False
 
     def delete_leave_type(self, lt_id):
-        with self.get_connection() as c:
-            c.execute("DELETE FROM tbl_leave_type WHERE leave_type_id=?", (lt_id,))
+        try:
+            with self.get_connection() as c:
+                c.execute("DELETE FROM tbl_leave_type WHERE leave_type_id=?", (lt_id,))
+        except sqlite3.IntegrityError:
+            raise Exception("Cannot delete a leave type used by leave requests.")
+
+    # ---------- LEAVE LEDGER ----------------------------------------------------
+
+    @staticmethod
+    def _begin_write(c):
+        # Take the write lock before reading the row whose ledger entries
+        # are about to change, so a concurrent update can't slip in between.
+        if not c.in_transaction:
+            c.execute("BEGIN IMMEDIATE")
+
+    @staticmethod
+    def _post_leave(c, request_id, sign):
+        """Add (sign=1) or remove (sign=-1) a request's days in TblLeaveLedger."""
+        row = c.execute(
+            """
+            SELECT employee_id, leave_type_id, COALESCE(status, 'pending'), start_date, end_date
+            FROM tbl_leave_request WHERE request_id = ?
+            """,
+            (request_id,),
+        ).fetchone()
+        if row is None:
+            return
+        emp_id, leave_type_id, status, start, end = row
+        c.executemany(
+            """
+            INSERT INTO TblLeaveLedger (EmployeeId, LeaveTypeId, Month, Status, Days)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (EmployeeId, Month, LeaveTypeId, Status)
+            DO UPDATE SET Days = Days + excluded.Days
+            """,
+            [
+                (emp_id, leave_type_id, month, status, sign * days)
+                for month, days in leave_month_days(start, end)
+            ],
+        )
+        if sign < 0:
+            c.execute(
+                "DELETE FROM TblLeaveLedger WHERE EmployeeId = ? AND LeaveTypeId = ? AND Days = 0",
+                (emp_id, leave_type_id),
+            )
 
     def add_leave_request(self, data):
         with self.get_connection() as c:
-            c.execute(
+            cur = c.execute(
                 """
                 INSERT INTO tbl_leave_request
                 (leave_type_id, employee_id, start_date, end_date,
@@ -859,6 +1454,7 @@ class Database:
                     data["manager_id"],
                 ),
             )
+            self._post_leave(c, cur.lastrowid, 1)
 
     def get_leave_requests(self, where="", params=()):
         with self.get_connection() as c:
@@ -880,6 +1476,8 @@ class Database:
 
     def update_leave_status(self, req_id, new_status, manager_id, comments=""):
         with self.get_connection() as c:
+            self._begin_write(c)
+            self._post_leave(c, req_id, -1)
             c.execute(
                 """
                 UPDATE tbl_leave_request
@@ -888,6 +1486,7 @@ class Database:
             """,
                 (new_status, manager_id, comments, req_id),
             )
+            self._post_leave(c, req_id, 1)
 
     def get_leave_status(self, req_id):
         with self.get_connection() as c:
@@ -898,14 +1497,7 @@ class Database:
 
     def count_leave_requests(self, where="", params=()):
         with self.get_connection() as c:
-            q = f"""
-                SELECT COUNT(*)
-                FROM tbl_leave_request lr
-                JOIN tbl_leave_type lt ON lt.leave_type_id = lr.leave_type_id
-                JOIN tbl_employee e ON e.emp_id = lr.employee_id
-                {where}
-            """
-            return c.execute(q, params).fetchone()[0]
+            return self._count(c, self._LEAVE_LIST_FROM, where, params)
 
     def get_leave_requests_paginated(self, where="", params=(), limit=10, offset=0):
         with self.get_connection() as c:
@@ -933,6 +1525,47 @@ class Database:
                 (etype,),
             )
 
+    _LEAVE_LIST_COLUMNS = """
+        lr.request_id, lt.leave_type, e.first_name || ' ' || e.last_name as emp_name,
+        lr.start_date, lr.end_date, lr.leave_desc,
+        lr.status, lr.comments, lr.inserted_date, e.emp_id
+    """
+    _LEAVE_LIST_FROM = """
+        tbl_leave_request lr
+        JOIN tbl_leave_type lt ON lt.leave_type_id = lr.leave_type_id
+        JOIN tbl_employee e ON e.emp_id = lr.employee_id
+    """
+
+    @staticmethod
+    def _leave_filters(employee_id, leave_type_id, status, from_date, to_date):
+        conditions = []
+        params = []
+
+        if employee_id:
+            conditions.append("e.emp_id = ?")
+            params.append(employee_id)
+
+        if leave_type_id:
+            conditions.append("lt.leave_type_id = ?")
+            params.append(leave_type_id)
+
+        if status:
+            conditions.append("lr.status = ?")
+            params.append(status)
+
+        for column, start, end in (
+            ("lr.start_date", from_date, None),
+            ("lr.end_date", None, to_date),
+        ):
+            bounds, bound_params = day_range(column, start, end)
+            conditions += bounds
+            params += bound_params
+
+        where_clause = ""
+        if conditions:
+            where_clause = " WHERE " + " AND ".join(conditions)
+        return where_clause, params
+
     def get_leave_requests_with_advanced_filters(
         self,
         employee_id=None,
@@ -949,52 +1582,9 @@ class Database:
         Get leave requests with advanced filtering and sorting
         """
         with self.get_connection() as c:
-            base_query = """
-            SELECT lr.request_id, lt.leave_type, e.first_name || ' ' || e.last_name as emp_name,
-                lr.start_date, lr.end_date, lr.leave_desc,
-                lr.status, lr.comments, lr.inserted_date, e.emp_id
-            FROM tbl_leave_request lr
-            JOIN tbl_leave_type lt ON lt.leave_type_id = lr.leave_type_id
-            JOIN tbl_employee e ON e.emp_id = lr.employee_id
-            """
-
-            count_query = """
-            SELECT COUNT(*)
-            FROM tbl_leave_request lr
-            JOIN tbl_leave_type lt ON lt.leave_type_id = lr.leave_type_id
-            JOIN tbl_employee e ON e.emp_id = lr.employee_id
-            """
-
-            conditions = []
-            params = []
-
-            if employee_id:
-                conditions.append("e.emp_id = ?")
-                params.append(employee_id)
-
-            if leave_type_id:
-                conditions.append("lt.leave_type_id = ?")
-                params.append(leave_type_id)
-
-            if status:
-                conditions.append("lr.status = ?")
-                params.append(status)
-
-            if from_date:
-                conditions.append("DATE(lr.start_date) >= ?")
-                params.append(from_date)
-
-            if to_date:
-                conditions.append("DATE(lr.end_date) <= ?")
-                params.append(to_date)
-
-            where_clause = ""
-            if conditions:
-                where_clause = " WHERE " + " AND ".join(conditions)
-
-            # Count total records
-            count_result = c.execute(count_query + where_clause, params).fetchone()
-            total_count = count_result[0]
+            where_clause, params = self._leave_filters(
+                employee_id, leave_type_id, status, from_date, to_date
+            )
 
             # Valid sort columns
             valid_sorts = {
@@ -1009,22 +1599,66 @@ class Database:
             sort_column = valid_sorts.get(sort_by, "lr.inserted_date")
             sort_direction = "ASC" if sort_order.upper() == "ASC" else "DESC"
 
-            final_query = f"{base_query}{where_clause} ORDER BY {sort_column} {sort_direction} LIMIT ? OFFSET ?"
-            params.extend([limit, offset])
-
-            results = c.execute(final_query, params).fetchall()
+            # Page and total count in one statement
+            return self._listing(
+                c,
+                self._LEAVE_LIST_COLUMNS,
+                self._LEAVE_LIST_FROM,
+                where_clause,
+                params,
+                f"{sort_column} {sort_direction}",
+                limit,
+                offset,
+            )
 
-            return results, total_count
+    def get_leave_requests_keyset(
+        self,
+        employee_id=None,
+        leave_type_id=None,
+        status=None,
+        from_date=None,
+        to_date=None,
+        limit=10,
+        cursor=None,
+    ):
+        """
+        Newest-first leave requests, paginated by cursor. Returns
+        ``(results, total_count, next_cursor, prev_cursor)``.
+        """
+        with self.get_connection() as c:
+            where_clause, params = self._leave_filters(
+                employee_id, leave_type_id, status, from_date, to_date
+            )
+            return self._keyset_page(
+                c,
+                self._LEAVE_LIST_COLUMNS,
+                self._LEAVE_LIST_FROM,
+                where_clause,
+                params,
+                ("lr.inserted_date", "lr.request_id"),
+                cursor,
+                limit,
+            )
 
     def get_expense_types(self):
         with self.get_connection() as c:
-            return c.execute(
-                "SELECT expense_type_id, expense_type FROM tbl_expense_type ORDER BY expense_type"
-            ).fetchall()
+            return self.reference_cache.get(
+                c,
+                "tbl_expense_type",
+                ("expense_types",),
+                lambda c: c.execute(
+                    "SELECT expense_type_id, expense_type FROM tbl_expense_type ORDER BY expense_type"
+                ).fetchall(),
+            )
 
     def delete_expense_type(self, et_id):
-        with self.get_connection() as c:
-            c.execute("DELETE FROM tbl_expense_type WHERE expense_type_id=?", (et_id,))
+        try:
+            with self.get_connection() as c:
+                c.execute(
+                    "DELETE FROM tbl_expense_type WHERE expense_type_id=?", (et_id,)
+                )
+        except sqlite3.IntegrityError:
+            raise Exception("Cannot delete an expense type used by expenses.")
 
     def update_expense_type(self, et_id, new_type):
         with self.get_connection() as c:
@@ -1052,8 +1686,9 @@ class Database:
                 """
                 INSERT INTO tbl_expenses
                 (expense_type_id, employee_id, exp_description, manager_id, approver_comments,
-                given_by_id, final_comments, amount, inserted_date, expense_date, invoice_path)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                given_by_id, final_comments, amount, inserted_date, expense_date, invoice_path,
+                invoice_sha256)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
                 (
                     data["expense_type_id"],
@@ -1067,9 +1702,28 @@ class Database:
                     datetime.now(pytz.utc).isoformat(),
                     data["expense_date"],
                     data.get("invoice_path"),
+                    data.get("invoice_sha256"),
                 ),
             )
 
+    # inserted/approved are epoch seconds here; see format_epochs
+    _EXPENSE_LIST_COLUMNS = """
+        ex.expense_id, et.expense_type,
+        e.first_name||' '||e.last_name AS emp_name,
+        ex.exp_description, ex.status,
+        ex.approver_comments, ex.final_comments,
+        ex.inserted_ts, ex.amount,
+        ex.employee_id,
+        ex.approved_ts,
+        ex.expense_date,
+        ex.invoice_path
+    """
+    _EXPENSE_LIST_FROM = """
+        tbl_expenses ex
+        JOIN tbl_expense_type et ON et.expense_type_id = ex.expense_type_id
+        JOIN tbl_employee      e ON e.emp_id           = ex.employee_id
+    """
+
     def get_expenses(self, where="", params=()):
         with self.get_connection() as c:
             q = f"""
@@ -1087,41 +1741,74 @@ class Database:
                 JOIN   tbl_expense_type et ON et.expense_type_id = ex.expense_type_id
                 JOIN   tbl_employee      e ON e.emp_id           = ex.employee_id
                 {where}
-                ORDER BY ex.inserted_date DESC
+                ORDER BY ex.inserted_ts DESC
             """
             return c.execute(q, params).fetchall()
 
-    def get_expenses_paginated(self, where="", params=(), limit=15, offset=0):
-        with self.get_connection() as c:
-            q = f"""
+    def iter_expenses(self, where="", params=(), batch_size=500):
+        """
+        Yield get_expenses() rows in lists of up to ``batch_size``, read with
+        fetchmany on a dedicated connection, so an export never holds the
+        whole table in memory and outlives the request's pooled connection.
+        The request (7) and approval (10) times are epoch seconds.
+        """
+        with closing(self.connect()) as c:
+            cur = c.execute(
+                f"""
                 SELECT ex.expense_id, et.expense_type,
                     e.first_name||' '||e.last_name AS emp_name,
                     ex.exp_description, ex.status,
                     ex.approver_comments, ex.final_comments,
-                    ex.inserted_date, ex.amount,
+                    ex.inserted_ts, ex.amount,
                     ex.employee_id,
-                    ex.approved_date,
+                    ex.approved_ts,
+                    ex.approved_by,
                     ex.expense_date,
                     ex.invoice_path
-                FROM   tbl_expenses ex
-                JOIN   tbl_expense_type et ON et.expense_type_id = ex.expense_type_id
-                JOIN   tbl_employee      e ON e.emp_id           = ex.employee_id
+                FROM {self._EXPENSE_LIST_FROM}
+                {where}
+                ORDER BY ex.inserted_ts DESC
+                """,
+                params,
+            )
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield rows
+
+    def get_expenses_paginated(self, where="", params=(), limit=15, offset=0):
+        with self.get_connection() as c:
+            q = f"""
+                SELECT {self._EXPENSE_LIST_COLUMNS}
+                FROM {self._EXPENSE_LIST_FROM}
                 {where}
-                ORDER BY ex.inserted_date DESC
+                ORDER BY ex.inserted_ts DESC
                 LIMIT ? OFFSET ?
             """
             return c.execute(q, (*params, limit, offset)).fetchall()
 
+    def get_expenses_keyset(self, where="", params=(), limit=15, cursor=None):
+        """
+        Newest-first expenses after/before ``cursor``; same row shape as
+        get_expenses_paginated. Returns
+        ``(rows, total, next_cursor, prev_cursor)``.
+        """
+        with self.get_connection() as c:
+            return self._keyset_page(
+                c,
+                self._EXPENSE_LIST_COLUMNS,
+                self._EXPENSE_LIST_FROM,
+                where,
+                params,
+                ("ex.inserted_ts", "ex.expense_id"),
+                cursor,
+                limit,
+            )
+
     def count_expenses(self, where="", params=()):
         with self.get_connection() as c:
-            q = f"""
-                SELECT COUNT(*)
-                FROM tbl_expenses ex
-                JOIN tbl_expense_type et ON et.expense_type_id = ex.expense_type_id
-                JOIN tbl_employee e ON e.emp_id = ex.employee_id
-                {where}
-            """
-            return c.execute(q, params).fetchone()[0]
+            return self._count(c, self._EXPENSE_LIST_FROM, where, params)
 
     def get_expense_by_id(self, exp_id):
         with self.get_connection() as c:
@@ -1133,7 +1820,9 @@ class Database:
                     ex.inserted_date, ex.amount,
                     ex.employee_id,
                     ex.approved_date,
-                    ex.approved_by
+                    ex.approved_by,
+                    ex.inserted_ts,
+                    ex.approved_ts
                 FROM   tbl_expenses ex
                 JOIN   tbl_expense_type et ON et.expense_type_id = ex.expense_type_id
                 JOIN   tbl_employee      e ON e.emp_id           = ex.employee_id
@@ -1177,45 +1866,87 @@ class Database:
     def get_leave_summary(self, date_from=None, date_to=None, leave_type_id=None):
         """
         Returns (emp_id, emp_name, total_days) for ALL employees,
-        even if total_days == 0 (LEFT JOIN).
+        even if total_days == 0 (LEFT JOIN). Days are read from
+        TblLeaveLedger and counted in the month they fall in; the date
+        filters select whole months (``YYYY-MM`` or any date in the month).
         """
         where = []
         params = []
 
-        if date_from:
-            where.append("lr.start_date >= ?")
-            params.append(date_from)
-        if date_to:
-            where.append("lr.end_date   <= ?")
-            params.append(date_to)
+        month_from, month_to = month_bound(date_from), month_bound(date_to)
+        if month_from:
+            where.append("l.Month >= ?")
+            params.append(month_from)
+        if month_to:
+            where.append("l.Month <= ?")
+            params.append(month_to)
         if leave_type_id:
-            where.append("lr.leave_type_id = ?")
+            where.append("l.LeaveTypeId = ?")
             params.append(leave_type_id)
 
-        where_sql = " AND ".join(where)
-        if where_sql:
-            where_sql = "WHERE " + where_sql
-
         q = f"""
             SELECT  e.emp_id,
                     e.first_name || ' ' || e.last_name AS emp_name,
-                    COALESCE(
-                        SUM(
-                            CASE
-                                WHEN lr.start_date IS NULL THEN 0
-                                ELSE (JULIANDAY(lr.end_date) - JULIANDAY(lr.start_date) + 1)
-                            END
-                        ), 0
-                    ) AS total_days
+                    COALESCE(SUM(l.Days), 0) AS total_days
             FROM tbl_employee e
-            LEFT JOIN tbl_leave_request lr ON lr.employee_id = e.emp_id
-                                            {"AND " + where_sql[6:] if where_sql else ""}
+            LEFT JOIN TblLeaveLedger l ON l.EmployeeId = e.emp_id
+                                       {"".join(" AND " + w for w in where)}
             GROUP BY e.emp_id
             ORDER BY e.first_name, e.last_name
         """
         with self.get_connection() as c:
             return c.execute(q, params).fetchall()
 
+    # Ledger rows recomputed from tbl_leave_request (same as migration 0008)
+    _LEAVE_LEDGER_ROWS = """
+        WITH RECURSIVE span (employee_id, leave_type_id, status, s, e) AS (
+            SELECT employee_id, leave_type_id, COALESCE(status, 'pending'),
+                   DATE(start_date), DATE(end_date)
+            FROM tbl_leave_request
+            WHERE DATE(end_date) >= DATE(start_date)
+            UNION ALL
+            SELECT employee_id, leave_type_id, status,
+                   DATE(s, 'start of month', '+1 month'), e
+            FROM span
+            WHERE DATE(s, 'start of month', '+1 month') <= e
+        )
+        SELECT employee_id, leave_type_id, strftime('%Y-%m', s), status,
+               CAST(SUM(JULIANDAY(MIN(e, DATE(s, 'start of month', '+1 month', '-1 day')))
+                        - JULIANDAY(s) + 1) AS INTEGER)
+        FROM span
+        GROUP BY 1, 2, 3, 4
+    """
+
+    def check_leave_ledger(self):
+        """
+        Compare TblLeaveLedger with the leave requests. Returns
+        ``[(emp_id, leave_type_id, month, status, expected_days, stored_days)]``
+        for every entry that differs; a missing side is 0.
+        """
+        with self.get_connection() as c:
+            expected = {row[:4]: row[4] for row in c.execute(self._LEAVE_LEDGER_ROWS)}
+            stored = {
+                row[:4]: row[4]
+                for row in c.execute(
+                    "SELECT EmployeeId, LeaveTypeId, Month, Status, Days FROM TblLeaveLedger"
+                )
+            }
+        return sorted(
+            (*key, expected.get(key, 0), stored.get(key, 0))
+            for key in expected.keys() | stored.keys()
+            if expected.get(key, 0) != stored.get(key, 0)
+        )
+
+    def rebuild_leave_ledger(self):
+        """Recompute TblLeaveLedger from scratch in one transaction; returns rows written."""
+        with self.get_connection() as c:
+            self._begin_write(c)
+            c.execute("DELETE FROM TblLeaveLedger")
+            return c.execute(
+                "INSERT INTO TblLeaveLedger (EmployeeId, LeaveTypeId, Month, Status, Days) "
+                + self._LEAVE_LEDGER_ROWS
+            ).rowcount
+
     def get_employee_profile(self, emp_id):
         with self.get_connection() as conn:
             conn.row_factory = sqlite3.Row  # Add this
@@ -1331,8 +2062,18 @@ class Database:
             return cursor.rowcount > 0
 
     def delete_all_employees(self):
-        with self.get_connection() as conn:
-            conn.execute('DELETE FROM tbl_employee WHERE emp_type != "admin"')
+        try:
+            with self.get_connection() as conn:
+                conn.execute("""
+                    DELETE FROM TblEmployeeProfile WHERE EmployeeId IN
+                        (SELECT emp_id FROM tbl_employee WHERE emp_type != 'admin')
+                """)
+                conn.execute('DELETE FROM tbl_employee WHERE emp_type != "admin"')
+        except sqlite3.IntegrityError:
+            raise Exception(
+                "Cannot delete employees that still have tasks, leave, expense, asset, "
+                "wiki view or policy acknowledgment records."
+            )
 
     def delete_all_tasks(self):
         with self.get_connection() as conn:
@@ -1340,12 +2081,18 @@ class Database:
             conn.execute("DELETE FROM tbl_task")
 
     def delete_all_leave_types(self):
-        with self.get_connection() as conn:
-            conn.execute("DELETE FROM tbl_leave_type")
+        try:
+            with self.get_connection() as conn:
+                conn.execute("DELETE FROM tbl_leave_type")
+        except sqlite3.IntegrityError:
+            raise Exception("Cannot delete leave types used by leave requests.")
 
     def delete_all_expense_types(self):
-        with self.get_connection() as conn:
-            conn.execute("DELETE FROM tbl_expense_type")
+        try:
+            with self.get_connection() as conn:
+                conn.execute("DELETE FROM tbl_expense_type")
+        except sqlite3.IntegrityError:
+            raise Exception("Cannot delete expense types used by expenses.")
 
     # ---------- Wiki Category CRUD ----------
 
@@ -1358,11 +2105,14 @@ class Database:
 
     def get_wiki_categories(self):
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT CategoryId, Category, CatImg FROM TblWikiCategory ORDER BY inserted_date DESC"
+        cats = self.reference_cache.get(
+            conn,
+            "TblWikiCategory",
+            ("wiki_categories",),
+            lambda c: c.execute(
+                "SELECT CategoryId, Category, CatImg FROM TblWikiCategory ORDER BY inserted_date DESC"
+            ).fetchall(),
         )
-        cats = cursor.fetchall()
         conn.close()
         return cats
 
@@ -1383,8 +2133,13 @@ class Database:
         conn.close()
 
     def delete_wiki_category(self, cat_id):
-        with self.get_connection() as conn:
-            conn.execute("DELETE FROM TblWikiCategory WHERE CategoryId=?", (cat_id,))
+        try:
+            with self.get_connection() as conn:
+                conn.execute(
+                    "DELETE FROM TblWikiCategory WHERE CategoryId=?", (cat_id,)
+                )
+        except sqlite3.IntegrityError:
+            raise Exception("Cannot delete a category that still has wiki pages.")
 
     def add_wiki_page(self, category_id, title, descr):
         with self.get_connection() as conn:
@@ -1442,7 +2197,16 @@ class Database:
             )
         # ---------- Wiki Views CRUD ----------
 
+    def _flush_views(self):
+        # Readers in this worker see its buffered views at once; other
+        # workers' views land within their flush interval.
+        if self.view_recorder is not None:
+            self.view_recorder.flush()
+
     def add_wiki_view(self, wiki_id, emp_id):
+        if self.view_recorder is not None:
+            self.view_recorder.record(wiki_id, emp_id)
+            return
         with self.get_connection() as conn:
             conn.execute(
                 "INSERT INTO TblWikiViews (WikiId, EmployeeId) VALUES (?, ?)",
@@ -1450,6 +2214,7 @@ class Database:
             )
 
     def get_wiki_views(self):
+        self._flush_views()
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute("""
@@ -1466,64 +2231,70 @@ class Database:
         conn.close()
         return rows
 
-    def get_wiki_views_filtered(self, start_date=None, end_date=None, wiki_id=None):
-        """
-        Fetch individual view records, optionally filtering by date range and/or wiki page.
+    _WIKI_VIEW_COLUMNS = """
+        wv.WikiViewId,
+        wp.Title,
+        e.first_name || ' ' || e.last_name AS employee_name,
+        wv.ViewDateTime
+    """
+    _WIKI_VIEW_FROM = """
+        TblWikiViews wv
+        JOIN TblWikiPage wp ON wv.WikiId = wp.WikiId
+        JOIN tbl_employee e ON wv.EmployeeId = e.emp_id
+    """
+
+    def get_wiki_views_keyset(
+        self, start_date=None, end_date=None, wiki_id=None, limit=50, cursor=None
+    ):
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
-        query = """
-            SELECT wv.WikiViewId,
-                   wp.Title,
-                   e.first_name || ' ' || e.last_name AS employee_name,
-                   wv.ViewDateTime
-            FROM TblWikiViews wv
-            JOIN TblWikiPage wp ON wv.WikiId = wp.WikiId
-            JOIN tbl_employee e ON wv.EmployeeId = e.emp_id
+        Newest-first page of individual view records, optionally filtered by
+        date range and/or wiki page. The total comes from the daily rollup, so
+        neither the page nor its count grows with the size of the raw log.
+        Returns ``(rows, total, next_cursor, prev_cursor)``.
         """
-        conditions = []
-        params = []
-        if start_date:
-            conditions.append("date(wv.ViewDateTime) >= date(?)")
-            params.append(start_date)
-        if end_date:
-            conditions.append("date(wv.ViewDateTime) <= date(?)")
-            params.append(end_date)
+        self._flush_views()
+        conditions, params = day_range("wv.ViewDateTime", start_date, end_date)
+        day_conditions, day_params = day_range("d.Day", start_date, end_date)
         if wiki_id:
             conditions.append("wv.WikiId = ?")
             params.append(wiki_id)
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
+            day_conditions.append("d.WikiId = ?")
+            day_params.append(wiki_id)
+        where = "WHERE " + " AND ".join(conditions) if conditions else ""
+        day_where = "WHERE " + " AND ".join(day_conditions) if day_conditions else ""
 
-        query += " ORDER BY wv.ViewDateTime DESC"
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        conn.close()
-        return rows
+        with self.get_connection() as c:
+            return self._keyset_page(
+                c,
+                self._WIKI_VIEW_COLUMNS,
+                self._WIKI_VIEW_FROM,
+                where,
+                params,
+                ("wv.ViewDateTime", "wv.WikiViewId"),
+                cursor,
+                limit,
+                total_sql=f"SELECT COALESCE(SUM(d.Views), 0) FROM TblWikiViewDaily d {day_where}",
+                total_params=day_params,
+            )
 
     def get_wiki_view_counts(self, start_date=None, end_date=None):
         """
-        Return total view count per wiki page, optionally within a date range.
+        Return views and summed daily unique viewers per wiki page, optionally
+        within a date range, from the TblWikiViewDaily rollup.
         """
+        self._flush_views()
         conn = self.get_connection()
         cursor = conn.cursor()
 
         query = """
             SELECT wp.WikiId,
                    wp.Title,
-                   COUNT(*) AS view_count
-            FROM TblWikiViews wv
-            JOIN TblWikiPage wp ON wv.WikiId = wp.WikiId
+                   SUM(d.Views) AS view_count,
+                   SUM(d.UniqueViewers) AS viewer_days
+            FROM TblWikiViewDaily d
+            JOIN TblWikiPage wp ON d.WikiId = wp.WikiId
         """
-        conditions = []
-        params = []
-        if start_date:
-            conditions.append("date(wv.ViewDateTime) >= date(?)")
-            params.append(start_date)
-        if end_date:
-            conditions.append("date(wv.ViewDateTime) <= date(?)")
-            params.append(end_date)
+        conditions, params = day_range("d.Day", start_date, end_date)
         if conditions:
             query += " WHERE " + " AND ".join(conditions)
 
@@ -1533,8 +2304,77 @@ class Database:
         conn.close()
         return rows
 
+    _WIKI_VIEW_DAILY_SQL = """
+        SELECT WikiId, DATE(ViewDateTime) AS Day,
+               COUNT(*), COUNT(DISTINCT EmployeeId)
+        FROM TblWikiViews
+        WHERE ViewDateTime IS NOT NULL {and_where}
+        GROUP BY WikiId, DATE(ViewDateTime)
+    """
+
+    def check_wiki_view_rollup(self, start_date=None, end_date=None):
+        """
+        Compare TblWikiViewDaily with the raw view log. Returns
+        ``[(wiki_id, day, (views, unique) expected, (views, unique) stored)]``
+        for every day that differs; a missing side is None.
+        """
+        self._flush_views()
+        raw_conditions, raw_params = day_range("ViewDateTime", start_date, end_date)
+        day_conditions, day_params = day_range("Day", start_date, end_date)
+        conn = self.get_connection()
+        try:
+            expected = {
+                (row[0], row[1]): tuple(row[2:])
+                for row in conn.execute(
+                    self._WIKI_VIEW_DAILY_SQL.format(
+                        and_where="".join(" AND " + c for c in raw_conditions)
+                    ),
+                    raw_params,
+                )
+            }
+            day_where = "WHERE " + " AND ".join(day_conditions) if day_conditions else ""
+            stored = {
+                (row[0], row[1]): tuple(row[2:])
+                for row in conn.execute(
+                    f"SELECT WikiId, Day, Views, UniqueViewers FROM TblWikiViewDaily {day_where}",
+                    day_params,
+                )
+            }
+        finally:
+            conn.close()
+        return sorted(
+            (key[0], key[1], expected.get(key), stored.get(key))
+            for key in expected.keys() | stored.keys()
+            if expected.get(key) != stored.get(key)
+        )
+
+    def rebuild_wiki_view_rollup(self, start_date=None, end_date=None):
+        """
+        Recompute TblWikiViewDaily from the raw view log for the given days
+        (all of them by default) in one transaction. Returns the number of
+        rollup rows written.
+        """
+        self._flush_views()
+        raw_conditions, raw_params = day_range("ViewDateTime", start_date, end_date)
+        day_conditions, day_params = day_range("Day", start_date, end_date)
+        day_where = "WHERE " + " AND ".join(day_conditions) if day_conditions else ""
+        conn = self.get_connection()
+        try:
+            with conn:
+                conn.execute(f"DELETE FROM TblWikiViewDaily {day_where}", day_params)
+                cur = conn.execute(
+                    "INSERT INTO TblWikiViewDaily (WikiId, Day, Views, UniqueViewers) "
+                    + self._WIKI_VIEW_DAILY_SQL.format(
+                        and_where="".join(" AND " + c for c in raw_conditions)
+                    ),
+                    raw_params,
+                )
+                return cur.rowcount
+        finally:
+            conn.close()
+
     def add_policy_to_db(
-        self, policy_name, filepath, filename, original_filename, file_size
+        self, policy_name, filepath, filename, original_filename, file_size, sha256=None
     ):
         """Add new policy to database."""
         conn = self.get_connection()
@@ -1543,8 +2383,8 @@ class Database:
         cursor.execute(
             """
         INSERT INTO TblPolicies
-        (PolicyName, FilePath, FileName, OriginalFileName, FileSize, UploadedAt)
-        VALUES (?, ?, ?, ?, ?, ?)
+        (PolicyName, FilePath, FileName, OriginalFileName, FileSize, UploadedAt, Sha256)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
         """,
             (
                 policy_name,
@@ -1553,6 +2393,7 @@ class Database:
                 original_filename,
                 file_size,
                 datetime.now().isoformat(),
+                sha256,
             ),
         )
 
@@ -1587,14 +2428,19 @@ class Database:
                 "OriginalFileName": row[4],
                 "FileSize": row[5],
                 "UploadedAt": row[6],
+                "Sha256": row[7],
             }
         return None
 
     def delete_policy(self, policy_id):
-        """Delete policy from database"""
+        """Delete policy and its acknowledgments from database"""
         conn = self.get_connection()
         cursor = conn.cursor()
 
+        # Delete associated acknowledgments
+        cursor.execute(
+            "DELETE FROM TblPolicyAcknowledgments WHERE PolicyID = ?", (policy_id,)
+        )
         cursor.execute("DELETE FROM TblPolicies WHERE PolicyID = ?", (policy_id,))
         conn.commit()
         conn.close()
@@ -1609,10 +2455,128 @@ class Database:
         conn.close()
         return exists
 
+    def get_expense_invoice(self, exp_id):
+        """(employee_id, invoice_path, invoice_sha256) of an expense, or None."""
+        with self.get_connection() as c:
+            return c.execute(
+                "SELECT employee_id, invoice_path, invoice_sha256 FROM tbl_expenses "
+                "WHERE expense_id = ?",
+                (exp_id,),
+            ).fetchone()
+
+    # -- Stored files (filestore.FileStore, migration 0012) --
+
+    def register_stored_file(self, sha256, size):
+        """Record uploaded content, or mark existing content as just uploaded."""
+        with self.get_connection() as c:
+            c.execute(
+                """
+                INSERT INTO TblStoredFile (Sha256, Size, RefCount, Touched)
+                VALUES (?, ?, 0, CAST(strftime('%s', 'now') AS INTEGER))
+                ON CONFLICT(Sha256) DO UPDATE SET Touched = excluded.Touched
+                """,
+                (sha256, size),
+            )
+
+    def purge_stored_files(self, before, unlink):
+        """
+        Drop the rows of unreferenced content last uploaded before epoch
+        ``before``, calling ``unlink(sha256)`` for each while the write lock
+        is held, so a concurrent upload of the same content re-creates the
+        file only after it is gone. Returns the purged hashes.
+        """
+        conn = self.get_connection()
+        with conn:
+            self._begin_write(conn)
+            purged = [
+                row[0]
+                for row in conn.execute(
+                    "DELETE FROM TblStoredFile WHERE RefCount <= 0 AND Touched < ? "
+                    "RETURNING Sha256",
+                    (before,),
+                ).fetchall()
+            ]
+            for sha256 in purged:
+                unlink(sha256)
+        conn.close()
+        return purged
+
+    def get_stored_files(self):
+        with self.get_connection() as c:
+            return c.execute("SELECT Sha256, Size FROM TblStoredFile").fetchall()
+
+    _STORED_FILE_REFS = """
+        SELECT sha, COUNT(*) AS n FROM (
+            SELECT invoice_sha256 AS sha FROM tbl_expenses WHERE invoice_sha256 IS NOT NULL
+            UNION ALL
+            SELECT Sha256 FROM TblPolicies WHERE Sha256 IS NOT NULL
+        )
+        GROUP BY sha
+    """
+
+    def check_stored_files(self):
+        """(sha256, references, RefCount) for every hash whose count is off."""
+        with self.get_connection() as c:
+            return c.execute(
+                f"""
+                WITH refs (sha, n) AS ({self._STORED_FILE_REFS})
+                SELECT f.Sha256, COALESCE(r.n, 0), f.RefCount
+                FROM TblStoredFile f LEFT JOIN refs r ON r.sha = f.Sha256
+                WHERE f.RefCount != COALESCE(r.n, 0)
+                UNION ALL
+                SELECT r.sha, r.n, NULL
+                FROM refs r
+                WHERE NOT EXISTS (SELECT 1 FROM TblStoredFile f WHERE f.Sha256 = r.sha)
+                """
+            ).fetchall()
+
+    def rebuild_stored_file_refs(self):
+        """Recount the references of every stored file; returns the rows changed."""
+        with self.get_connection() as c:
+            # No leading WITH: sqlite3 reports no rowcount for those.
+            refs = f"COALESCE((SELECT n FROM ({self._STORED_FILE_REFS}) WHERE sha = Sha256), 0)"
+            cur = c.execute(
+                f"UPDATE TblStoredFile SET RefCount = {refs} WHERE RefCount != {refs}"
+            )
+            return cur.rowcount
+
+    def get_legacy_uploads(self):
+        """
+        Invoices and policies stored by path before the file store:
+        (kind, row id, path, name) with kind 'invoice' or 'policy'.
+        """
+        with self.get_connection() as c:
+            return c.execute(
+                """
+                SELECT 'invoice', expense_id, invoice_path, invoice_path
+                FROM tbl_expenses
+                WHERE invoice_path IS NOT NULL AND invoice_sha256 IS NULL
+                UNION ALL
+                SELECT 'policy', PolicyID, FilePath, OriginalFileName
+                FROM TblPolicies WHERE Sha256 IS NULL
+                """
+            ).fetchall()
+
+    def attach_stored_file(self, kind, row_id, sha256, path, name):
+        """Point a legacy invoice or policy row at stored content."""
+        with self.get_connection() as c:
+            if kind == "invoice":
+                c.execute(
+                    "UPDATE tbl_expenses SET invoice_sha256 = ?, invoice_path = ? "
+                    "WHERE expense_id = ?",
+                    (sha256, name, row_id),
+                )
+            else:
+                c.execute(
+                    "UPDATE TblPolicies SET Sha256 = ?, FilePath = ?, FileName = ? "
+                    "WHERE PolicyID = ?",
+                    (sha256, path, sha256, row_id),
+                )
+
     def get_employee_anniversaries(self, filter_type="anniversary", days_limit=7):
         """Get employees with upcoming anniversaries or birthdays within specified days"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        today = datetime.now(pytz.utc).date()
+        windows = month_day_windows(today, days_limit)
 
         if filter_type == "anniversary":
             # Get employees with join date anniversaries
@@ -1622,42 +2586,14 @@ class Database:
                 e.first_name || ' ' || e.last_name AS emp_name,
                 e.email,
                 ep.DOJ as join_date,
-                CASE 
-                    WHEN ep.DOJ IS NULL THEN NULL
-                    ELSE (
-                        CASE 
-                            WHEN strftime('%m-%d', ep.DOJ) = strftime('%m-%d', 'now') THEN 0
-                            WHEN strftime('%m-%d', ep.DOJ) > strftime('%m-%d', 'now') THEN
-                                CAST((julianday(strftime('%Y', 'now') || '-' || strftime('%m-%d', ep.DOJ)) - julianday('now')) AS INTEGER)
-                            ELSE
-                                CAST((julianday(strftime('%Y', 'now', '+1 year') || '-' || strftime('%m-%d', ep.DOJ)) - julianday('now')) AS INTEGER)
-                        END
-                    )
-                END as days_until,
-                CASE 
-                    WHEN ep.DOJ IS NULL THEN 0
-                    ELSE (strftime('%Y', 'now') - strftime('%Y', ep.DOJ))
-                END as years_completed
-            FROM tbl_employee e
-            LEFT JOIN TblEmployeeProfile ep ON e.emp_id = ep.EmployeeId
-            WHERE e.status = 'active' 
-                AND ep.DOJ IS NOT NULL
-                AND (
-                    CASE 
-                        WHEN ep.DOJ IS NULL THEN NULL
-                        ELSE (
-                            CASE 
-                                WHEN strftime('%m-%d', ep.DOJ) = strftime('%m-%d', 'now') THEN 0
-                                WHEN strftime('%m-%d', ep.DOJ) > strftime('%m-%d', 'now') THEN
-                                    CAST((julianday(strftime('%Y', 'now') || '-' || strftime('%m-%d', ep.DOJ)) - julianday('now')) AS INTEGER)
-                                ELSE
-                                    CAST((julianday(strftime('%Y', 'now', '+1 year') || '-' || strftime('%m-%d', ep.DOJ)) - julianday('now')) AS INTEGER)
-                            END
-                        )
-                    END
-                ) <= ?
-            ORDER BY days_until ASC, emp_name
-            """
+                ep.doj_md
+            FROM TblEmployeeProfile ep
+            JOIN tbl_employee e ON e.emp_id = ep.EmployeeId
+            WHERE e.status = 'active'
+                AND ({ranges})
+            """.format(
+                ranges=" OR ".join("ep.doj_md BETWEEN ? AND ?" for _ in windows)
+            )
         else:  # birthday
             query = """
             SELECT 
@@ -1665,38 +2601,39 @@ class Database:
                 e.first_name || ' ' || e.last_name AS emp_name,
                 e.email,
                 e.dob as join_date,
-                CASE 
-                    WHEN e.dob IS NULL THEN NULL
-                    WHEN strftime('%m-%d', e.dob) = strftime('%m-%d', 'now') THEN 0
-                    WHEN strftime('%m-%d', e.dob) > strftime('%m-%d', 'now') THEN
-                        CAST((julianday(strftime('%Y', 'now') || '-' || strftime('%m-%d', e.dob)) - julianday('now')) AS INTEGER)
-                    ELSE
-                        CAST((julianday(strftime('%Y', 'now', '+1 year') || '-' || strftime('%m-%d', e.dob)) - julianday('now')) AS INTEGER)
-                END as days_until,
-                (strftime('%Y', 'now') - strftime('%Y', e.dob)) as years_completed
+                e.dob_md
             FROM tbl_employee e
             WHERE e.status = 'active'
-                AND e.dob IS NOT NULL
-                AND (
-                    CASE 
-                        WHEN e.dob IS NULL THEN NULL
-                        WHEN strftime('%m-%d', e.dob) = strftime('%m-%d', 'now') THEN 0
-                        WHEN strftime('%m-%d', e.dob) > strftime('%m-%d', 'now') THEN
-                            CAST((julianday(strftime('%Y', 'now') || '-' || strftime('%m-%d', e.dob)) - julianday('now')) AS INTEGER)
-                        ELSE
-                            CAST((julianday(strftime('%Y', 'now', '+1 year') || '-' || strftime('%m-%d', e.dob)) - julianday('now')) AS INTEGER)
-                    END
-                ) <= ?
-            ORDER BY days_until ASC, emp_name
-            """
+                AND ({ranges})
+            """.format(
+                ranges=" OR ".join("e.dob_md BETWEEN ? AND ?" for _ in windows)
+            )
 
-        cursor.execute(query, (days_limit,))
-        results = cursor.fetchall()
+        conn = self.get_connection()
+        rows = conn.execute(query, [bound for window in windows for bound in window]).fetchall()
         conn.close()
+
+        # (EmployeeId, emp_name, email, join_date, days_until, years_completed)
+        results = []
+        for emp_id, name, email, date_value, month_day in rows:
+            occurrence = next_occurrence(month_day, today)
+            results.append(
+                (
+                    emp_id,
+                    name,
+                    email,
+                    date_value,
+                    (occurrence - today).days,
+                    occurrence.year - int(str(date_value)[:4]),
+                )
+            )
+        results.sort(key=lambda row: (row[4], row[1]))
         return results
 
     def get_today_celebrations(self):
         """Get employees celebrating today (both anniversaries and birthdays)"""
+        today = datetime.now(pytz.utc).date()
+        (low, high), = month_day_windows(today, 0)
         conn = self.get_connection()
         cursor = conn.cursor()
 
@@ -1708,12 +2645,11 @@ class Database:
             e.first_name || ' ' || e.last_name AS emp_name,
             e.email,
             ep.DOJ as date_value,
-            (strftime('%Y', 'now') - strftime('%Y', ep.DOJ)) as years_completed
-        FROM tbl_employee e
-        JOIN TblEmployeeProfile ep ON e.emp_id = ep.EmployeeId
+            (? - strftime('%Y', ep.DOJ)) as years_completed
+        FROM TblEmployeeProfile ep
+        JOIN tbl_employee e ON e.emp_id = ep.EmployeeId
         WHERE e.status = 'active' 
-        AND ep.DOJ IS NOT NULL
-        AND strftime('%m-%d', ep.DOJ) = strftime('%m-%d', 'now')
+        AND ep.doj_md BETWEEN ? AND ?
         
         UNION ALL
         
@@ -1723,14 +2659,20 @@ class Database:
             e.first_name || ' ' || e.last_name AS emp_name,
             e.email,
             e.dob as date_value,
-            (strftime('%Y', 'now') - strftime('%Y', e.dob)) as years_completed
+            (? - strftime('%Y', e.dob)) as years_completed
         FROM tbl_employee e
         WHERE e.status = 'active'
-        AND strftime('%m-%d', e.dob) = strftime('%m-%d', 'now')
+        AND e.dob_md BETWEEN ? AND ?
         
         ORDER BY emp_name
-        """)
+        """, (today.year, low, high) * 2)
 
         results = cursor.fetchall()
         conn.close()
         return results
+
+
+# Time spent in each query method is charged to it while a request is traced.
+instrumentation.instrument_methods(
+    Database, exclude=("connect", "get_connection", "init_app", "init_database")
+)
@@ -0,0 +1,268 @@
+"""
+Append-only error log in JSON Lines.
+
+``ErrorLog.handler`` is a ``QueueHandler``: on the thread that logs an error it
+only collects the details (message, exception, traceback, request) and puts
+them on a queue. A background ``QueueListener`` writes one JSON object per
+line and rotates the file by size, so a failing request never waits on
+the log file or on other workers writing to it.
+
+Each entry has a ``fingerprint``: a hash of the exception type and the code
+path of its traceback (file, function and source line of every frame), or of
+the logger, function and message with digits masked for errors logged without
+one. The first entry for a fingerprint is written in full. Occurrences in the
+next ``window`` seconds are only counted, and the count is written as a short
+``repeat`` entry when the window has passed (checked on the next error) or at
+shutdown. A burst of identical failures therefore writes two lines, not
+thousands.
+
+``read_page()`` pages through the log newest first by reading the files
+backwards from a cursor, so the admin viewer never loads a whole file.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import traceback
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from background import BackgroundWorker
+
+BLOCK = 64 * 1024
+DIGITS = re.compile(r"\d+")
+
+
+def fingerprint(entry, record, frames):
+    if frames:
+        parts = [entry["type"]] + [
+            f"{os.path.basename(frame.filename)}:{frame.name}:{frame.line}" for frame in frames
+        ]
+    else:
+        parts = [record.name, record.funcName, DIGITS.sub("N", str(record.msg))]
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()[:12]
+
+
+class ErrorQueueHandler(QueueHandler):
+    """Turns a record into a plain entry on the logging thread."""
+
+    def __init__(self, log_queue, context=None, on_enqueue=None):
+        super().__init__(log_queue)
+        self.context = context
+        self.on_enqueue = on_enqueue
+
+    def prepare(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "pid": record.process,
+        }
+        frames = None
+        if record.exc_info and record.exc_info[0] is not None:
+            etype, value, tb = record.exc_info
+            entry["type"] = etype.__name__
+            entry["error"] = str(value)
+            entry["traceback"] = "".join(traceback.format_exception(etype, value, tb))
+            frames = traceback.extract_tb(tb)
+        entry["fingerprint"] = fingerprint(entry, record, frames)
+        if self.context is not None:
+            try:
+                entry.update(self.context() or {})
+            except Exception:  # never fail the request that is being logged
+                pass
+        return logging.makeLogRecord(
+            {"entry": entry, "levelno": record.levelno, "levelname": record.levelname}
+        )
+
+    def enqueue(self, record):
+        if self.on_enqueue is not None:
+            self.on_enqueue()
+        super().enqueue(record)
+
+
+class JsonLinesHandler(RotatingFileHandler):
+    """Writes queued entries, folding repeats of a fingerprint into counts."""
+
+    def __init__(self, path, max_bytes, backups, window):
+        super().__init__(path, maxBytes=max_bytes, backupCount=backups,
+                         encoding="utf-8", delay=True)
+        self.window = window
+        # fingerprint -> {"since", "count", "last", ...} of the open window
+        self.windows = {}
+        # fingerprint -> {"count", "type", "message", "last"} for this process
+        self.totals = {}
+
+    def format(self, record):
+        return json.dumps(record.entry, default=str)
+
+    def _write(self, entry):
+        super().emit(logging.makeLogRecord({"entry": entry}))
+
+    def flush_repeats(self, now=None):
+        """Write the counts of every window that has passed (all with now=None)."""
+        for key, window in list(self.windows.items()):
+            if now is not None and now - window["since"] < self.window:
+                continue
+            del self.windows[key]
+            if window["count"]:
+                self._write({
+                    "ts": window["last"], "level": window["level"], "repeat": True,
+                    "fingerprint": key, "count": window["count"],
+                    "first": window["first"], "type": window.get("type"),
+                    "message": window["message"],
+                })
+
+    def emit(self, record):
+        entry = record.entry
+        key = entry["fingerprint"]
+        total = self.totals.setdefault(key, {"count": 0})
+        total.update(count=total["count"] + 1, type=entry.get("type"),
+                     message=entry["message"], last=entry["ts"])
+
+        self.flush_repeats(entry["ts"])
+        window = self.windows.get(key)
+        if window is not None:
+            window["count"] += 1
+            window["first"] = window["first"] or entry["ts"]
+            window["last"] = entry["ts"]
+            return
+        self.windows[key] = {
+            "since": entry["ts"], "count": 0, "first": None, "last": None,
+            "level": entry["level"], "type": entry.get("type"), "message": entry["message"],
+        }
+        entry["count"] = 1
+        self._write(entry)
+
+    def close(self):
+        self.acquire()
+        try:
+            self.flush_repeats()
+        finally:
+            self.release()
+        super().close()
+
+
+class ErrorLog(BackgroundWorker):
+    """
+    The queue, listener and file handler of one error log. Attach ``handler``
+    to a logger; the listener thread starts with the first error.
+    """
+
+    def __init__(self, path, max_bytes=5 * 1024 * 1024, backups=5, window=60, context=None):
+        super().__init__()
+        self.path = path
+        self.backups = backups
+        self._queue = queue.SimpleQueue()
+        self.handler = ErrorQueueHandler(self._queue, context, self.ensure_started)
+        self.handler.setLevel(logging.ERROR)
+        self.writer = JsonLinesHandler(path, max_bytes, backups, window)
+        self._listener = None
+
+    def _launch(self):
+        self._listener = QueueListener(self._queue, self.writer)
+        self._listener.start()
+
+    def _halt(self):
+        if self._listener is not None:
+            self._listener.stop()
+        self._listener = None
+
+    def flush(self):
+        """
+        Write everything logged so far. Stops the listener; the next error
+        starts it again.
+        """
+        self.stop()
+        self.writer.flush()
+
+    def close(self):
+        """Write what is queued and the pending repeat counts."""
+        self.flush()
+        self.writer.close()
+
+    @property
+    def totals(self):
+        """Occurrences per fingerprint logged by this process."""
+        # A copy: the listener thread updates the dict while it writes.
+        self.writer.acquire()
+        try:
+            return {key: dict(total) for key, total in self.writer.totals.items()}
+        finally:
+            self.writer.release()
+
+    def files(self):
+        return [self.path] + [f"{self.path}.{i}" for i in range(1, self.backups + 1)]
+
+    def read_page(self, cursor=None, limit=50):
+        """
+        Up to ``limit`` entries older than ``cursor``, newest first, and the
+        cursor of the next page (None at the end). A cursor is
+        ``"<file index>.<byte offset>"``; None starts at the newest entry.
+        """
+        index, end = 0, None
+        if cursor:
+            try:
+                index, offset = cursor.split(".")
+                index, end = int(index), int(offset) if offset else None
+            except ValueError:
+                index, end = 0, None
+        files = self.files()
+        entries = []
+        while index < len(files) and len(entries) < limit:
+            want = limit - len(entries)
+            try:
+                with open(files[index], "rb") as f:
+                    lines = read_backwards(f, end, want)
+            except FileNotFoundError:
+                return entries, None
+            for offset, line in lines:
+                end = offset
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+            if len(lines) < want or end == 0:
+                # This file is done; older entries are in the next backup.
+                index, end = index + 1, None
+        if index >= len(files) or not os.path.exists(files[index]):
+            return entries, None
+        return entries, f"{index}.{'' if end is None else end}"
+
+
+def read_backwards(f, end=None, limit=50):
+    """
+    ``(offset, line)`` of up to ``limit`` complete lines that end at or before
+    byte ``end`` of a binary file (None: its end), last line first. A last
+    line without its newline is still being written and is skipped.
+    """
+    if end is None:
+        end = f.seek(0, os.SEEK_END)
+        while end > 0:
+            start = max(0, end - BLOCK)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline != -1:
+                end = start + newline + 1
+                break
+            end = start
+    lines = []
+    pos, buf = end, b""
+    while len(lines) < limit:
+        cut = buf.rfind(b"\n", 0, len(buf) - 1)
+        if cut == -1:
+            if pos == 0:
+                if buf:
+                    lines.append((0, buf.rstrip(b"\n")))
+                break
+            step = min(BLOCK, pos)
+            pos -= step
+            f.seek(pos)
+            buf = f.read(step) + buf
+            continue
+        lines.append((pos + cut + 1, buf[cut + 1:].rstrip(b"\n")))
+        buf = buf[:cut + 1]
+    return lines
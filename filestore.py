@@ -0,0 +1,84 @@
+"""
+Content-addressed storage for uploaded files (expense invoices, policy PDFs).
+
+Each upload is streamed to a temporary file while it is hashed and then
+stored once under its SHA-256, sharded by the first two byte pairs of the
+hash (``files/ab/cd/abcd...``). Identical uploads share one file; the rows
+that point at it are counted in ``TblStoredFile.RefCount`` by triggers
+(migration 0012), and ``collect()`` deletes files nothing points at any more.
+The hash doubles as a strong ETag, since a stored file never changes.
+"""
+
+import hashlib
+import os
+import tempfile
+import time
+
+CHUNK = 1024 * 1024
+
+# A file stored this recently is kept even without references: its row is
+# about to be written by the request that uploaded it.
+GRACE_SECONDS = 3600
+
+
+class FileStore:
+    def __init__(self, root, db):
+        # Absolute, so send_file() does not resolve it against the app root.
+        self.root = os.path.abspath(root)
+        self.db = db
+
+    @staticmethod
+    def relative(sha256):
+        """Location of a file below the store root, with forward slashes."""
+        return f"{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+    def path(self, sha256):
+        return os.path.join(self.root, *self.relative(sha256).split("/"))
+
+    def save(self, stream):
+        """Store the content of a file-like object; returns ``(sha256, size)``."""
+        tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            digest = hashlib.sha256()
+            size = 0
+            with os.fdopen(fd, "wb") as f:
+                while True:
+                    chunk = stream.read(CHUNK)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            sha256 = digest.hexdigest()
+
+            # Register before placing the file: once the row is touched,
+            # collect() leaves the content alone for GRACE_SECONDS.
+            self.db.register_stored_file(sha256, size)
+            path = self.path(sha256)
+            if os.path.exists(path):
+                os.remove(tmp)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return sha256, size
+
+    def _unlink(self, sha256):
+        try:
+            os.remove(self.path(sha256))
+        except FileNotFoundError:
+            pass
+
+    def collect(self, grace=GRACE_SECONDS):
+        """Delete unreferenced files older than ``grace`` seconds; returns their hashes."""
+        return self.db.purge_stored_files(int(time.time()) - grace, self._unlink)
+
+    def missing(self):
+        """Registered hashes whose file is not on disk."""
+        return [sha256 for sha256, _ in self.db.get_stored_files()
+                if not os.path.exists(self.path(sha256))]
@@ -0,0 +1,162 @@
+"""
+Resized, recompressed copies of uploaded images.
+
+Every uploaded wiki category image and job banner gets one derivative per
+entry of ``SIZES`` in a ``derived/`` folder next to it: a WebP and a JPEG
+(PNG when the image has transparency) fallback, scaled to fit the size's box.
+Uploads only queue the image; a background thread does the encoding, and
+until it has, templates keep linking the original. Requires Pillow; without
+it, no derivatives are made and pages always use the originals.
+
+    python maintenance.py images check|rebuild
+"""
+
+import os
+
+from background import QueueWorker
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - Pillow is optional
+    Image = None
+
+# Upload folders whose images get derivatives.
+FOLDERS = ("static/bngImg", "static/wikiCatImg")
+
+# name: bounding box in pixels, about twice the largest CSS size it is shown at.
+SIZES = {
+    "thumb": (240, 240),
+    "card": (960, 540),
+}
+
+EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp")
+DERIVED = "derived"
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+
+def derived_path(path, size, ext):
+    directory, name = os.path.split(path)
+    stem = os.path.splitext(name)[0]
+    return os.path.join(directory, DERIVED, f"{stem}.{size}{ext}")
+
+
+def _save(image, path, fmt, **options):
+    # Write next to the target and rename, so pages never link a partial file.
+    tmp = path + ".tmp"
+    image.save(tmp, fmt, **options)
+    os.replace(tmp, path)
+
+
+def build(path):
+    """Write every derivative of one image; returns the paths written."""
+    os.makedirs(os.path.join(os.path.dirname(path), DERIVED), exist_ok=True)
+    written = []
+    with Image.open(path) as original:
+        image = ImageOps.exif_transpose(original)
+        alpha = image.mode in ("RGBA", "LA") or (
+            image.mode == "P" and "transparency" in image.info
+        )
+        image = image.convert("RGBA" if alpha else "RGB")
+        for size, box in SIZES.items():
+            scaled = image.copy()
+            scaled.thumbnail(box, Image.LANCZOS)
+            webp = derived_path(path, size, ".webp")
+            _save(scaled, webp, "WEBP", quality=WEBP_QUALITY, method=4)
+            if alpha:
+                fallback = derived_path(path, size, ".png")
+                _save(scaled, fallback, "PNG", optimize=True)
+            else:
+                fallback = derived_path(path, size, ".jpg")
+                _save(scaled, fallback, "JPEG", quality=JPEG_QUALITY, optimize=True,
+                      progressive=True)
+            written += [webp, fallback]
+    return written
+
+
+def remove(path):
+    """Delete the derivatives of an image."""
+    for size in SIZES:
+        for ext in (".webp", ".jpg", ".png"):
+            try:
+                os.remove(derived_path(path, size, ext))
+            except FileNotFoundError:
+                pass
+
+
+def variants(path, size):
+    """
+    ``(webp, fallback)`` paths of an image at ``size``: the derivatives when
+    they are at least as new as the image, else ``(None, path)``.
+    """
+    webp = derived_path(path, size, ".webp")
+    try:
+        if os.path.getmtime(webp) < os.path.getmtime(path):
+            return None, path
+    except OSError:
+        return None, path
+    for ext in (".jpg", ".png"):
+        fallback = derived_path(path, size, ext)
+        if os.path.exists(fallback):
+            return webp, fallback
+    return None, path
+
+
+def originals(folder):
+    """The images directly inside an upload folder."""
+    if not os.path.isdir(folder):
+        return []
+    return sorted(
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if name.lower().endswith(EXTENSIONS) and os.path.isfile(os.path.join(folder, name))
+    )
+
+
+def stale(folders=FOLDERS):
+    """Images whose derivatives are missing or older than the image."""
+    return [path for folder in folders for path in originals(folder)
+            if any(variants(path, size)[0] is None for size in SIZES)]
+
+
+class DerivativeWorker(QueueWorker):
+    """
+    Background encoder for uploaded images. ``submit()`` queues a path and
+    returns at once; a daemon thread builds the derivatives, and whatever is
+    still queued is built at interpreter exit.
+    """
+
+    name = "image-derivatives"
+
+    def __init__(self):
+        super().__init__()
+        self.stats = {"queued": 0, "built": 0, "failed": 0}
+
+    def submit(self, path):
+        if Image is None:
+            return False
+        with self._lock:
+            if path not in self._pending:
+                self._pending.append(path)
+                self.stats["queued"] += 1
+        self.ensure_started()
+        self._wake.set()
+        return True
+
+    def drain(self):
+        """Build everything queued so far; returns the number of images done."""
+        if Image is None:
+            return 0
+        done = 0
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return done
+                path = self._pending.popleft()
+            try:
+                build(path)
+                self.stats["built"] += 1
+                done += 1
+            except (OSError, ValueError, Image.DecompressionBombError):
+                # Deleted meanwhile, or not an image Pillow can read: keep
+                # serving the original.
+                self.stats["failed"] += 1
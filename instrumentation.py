@@ -0,0 +1,330 @@
+"""
+Per-request timing and SQL instrumentation, exported as Prometheus text.
+
+``begin()``/``end()`` bracket a request on the current thread. While a request
+is open:
+
+* every statement SQLite runs (including BEGIN/COMMIT and trigger bodies) is
+  counted by ``trace``, the ``set_trace_callback`` of each connection;
+* ``TimedConnection``/``TimedCursor`` (the connection factory used by
+  ``Database.connect``) time ``execute*`` and the fetches, and count the rows
+  fetched;
+* ``instrument_methods`` wraps the public ``Database`` methods, so time is
+  also attributed to the method that ran the SQL.
+
+With a ``querylog.SlowQueryLog`` installed as ``slow_queries``, each
+statement's execute and fetch time is also added up until it is done, and
+slow ones are handed to the log, in or outside a request.
+
+``Metrics`` keeps per-endpoint latency histograms and SQL totals of the
+process and renders them in the Prometheus text format. Outside a request
+(scripts, the wiki view flusher) nothing is recorded.
+"""
+
+import functools
+import inspect
+import sqlite3
+import threading
+import time
+
+# Histogram bucket bounds in seconds.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_local = threading.local()
+
+# querylog.SlowQueryLog that statements at or over its threshold are handed
+# to; None disables the per-statement timing.
+slow_queries = None
+
+
+class RequestStats:
+    __slots__ = ("start", "statements", "sql_time", "rows", "methods")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.statements = 0
+        self.sql_time = 0.0
+        self.rows = 0
+        # (calls, seconds) per outermost Database method
+        self.methods = {}
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+
+def begin():
+    _local.stats = RequestStats()
+    return _local.stats
+
+
+def current():
+    return getattr(_local, "stats", None)
+
+
+def end():
+    stats = current()
+    _local.stats = None
+    return stats
+
+
+def trace(statement):
+    stats = getattr(_local, "stats", None)
+    if stats is not None:
+        stats.statements += 1
+
+
+class TimedCursor(sqlite3.Cursor):
+    # [sql, parameters, many, method, seconds] of the statement being run,
+    # kept while a slow query log is installed.
+    _statement = None
+
+    def _run(self, call, *args):
+        stats = getattr(_local, "stats", None)
+        statement = self._statement
+        if stats is None and statement is None:
+            return call(*args)
+        start = time.perf_counter()
+        try:
+            return call(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            if stats is not None:
+                stats.sql_time += elapsed
+            if statement is not None:
+                statement[4] += elapsed
+
+    def _count(self, rows):
+        stats = getattr(_local, "stats", None)
+        if stats is not None:
+            stats.rows += rows
+
+    def _begin(self, sql, parameters, many):
+        self._finish()
+        if slow_queries is not None:
+            self._statement = [sql, parameters, many, getattr(_local, "method", None), 0.0]
+
+    def _finish(self):
+        # The statement is done (all rows fetched, or the cursor is reused,
+        # closed or dropped): hand it to the slow query log if it was slow.
+        statement = self._statement
+        if statement is None:
+            return
+        self._statement = None
+        log = slow_queries
+        if log is not None and statement[4] >= log.threshold:
+            log.record(self.connection, *statement)
+
+    def execute(self, sql, parameters=()):
+        self._begin(sql, parameters, False)
+        return self._run(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._begin(sql, seq_of_parameters, True)
+        return self._run(super().executemany, sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        self._finish()
+        return self._run(super().executescript, sql_script)
+
+    def fetchone(self):
+        row = self._run(super().fetchone)
+        if row is None:
+            self._finish()
+        else:
+            self._count(1)
+        return row
+
+    def fetchmany(self, size=None):
+        if size is None:
+            size = self.arraysize
+        rows = self._run(super().fetchmany, size)
+        self._count(len(rows))
+        if len(rows) < size:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._run(super().fetchall)
+        self._count(len(rows))
+        self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            row = self._run(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+        self._count(1)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+class TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    # sqlite3.Connection.execute* bypass an overridden Cursor.execute.
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+def _timed_method(name, fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if getattr(_local, "method", None) is not None:
+            # Called by another Database method, which is charged for it.
+            return fn(*args, **kwargs)
+        _local.method = name
+        stats = getattr(_local, "stats", None)
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.method = None
+            if stats is not None:
+                calls, seconds = stats.methods.get(name, (0, 0.0))
+                stats.methods[name] = (calls + 1, seconds + time.perf_counter() - start)
+
+    return wrapper
+
+
+def instrument_methods(cls, exclude=()):
+    """Wrap the public methods of ``cls`` (not generators) with _timed_method."""
+    for name, fn in list(vars(cls).items()):
+        if (
+            name.startswith("_")
+            or name in exclude
+            or not inspect.isfunction(fn)
+            or inspect.isgeneratorfunction(fn)
+        ):
+            continue
+        setattr(cls, name, _timed_method(name, fn))
+    return cls
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+
+
+class Metrics:
+    """Request and SQL totals of this process."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # endpoint -> [bucket counts..., count, sum]
+        self._latency = {}
+        # (endpoint, status) -> requests
+        self._requests = {}
+        # endpoint -> [statements, sql seconds, rows]
+        self._sql = {}
+        # Database method -> [calls, seconds]
+        self._methods = {}
+
+    def observe(self, endpoint, status, duration, stats):
+        with self._lock:
+            latency = self._latency.get(endpoint)
+            if latency is None:
+                latency = self._latency[endpoint] = [0] * len(self.buckets) + [0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if duration <= bound:
+                    latency[i] += 1
+            latency[-2] += 1
+            latency[-1] += duration
+
+            key = (endpoint, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+
+            sql = self._sql.setdefault(endpoint, [0, 0.0, 0])
+            sql[0] += stats.statements
+            sql[1] += stats.sql_time
+            sql[2] += stats.rows
+            for name, (calls, seconds) in stats.methods.items():
+                method = self._methods.setdefault(name, [0, 0.0])
+                method[0] += calls
+                method[1] += seconds
+
+    def render(self, extra=()):
+        """
+        Prometheus text exposition. ``extra`` is an iterable of
+        ``(name, type, help, value)`` for values kept elsewhere.
+        """
+        with self._lock:
+            latency = {key: list(value) for key, value in self._latency.items()}
+            requests = dict(self._requests)
+            sql = {key: list(value) for key, value in self._sql.items()}
+            methods = {key: list(value) for key, value in self._methods.items()}
+
+        out = [
+            "# HELP hrms_request_duration_seconds Time to produce a response, by endpoint.",
+            "# TYPE hrms_request_duration_seconds histogram",
+        ]
+        for endpoint, values in sorted(latency.items()):
+            for bound, count in zip(self.buckets, values):
+                out.append(f"hrms_request_duration_seconds_bucket{{{_labels(endpoint=endpoint, le=bound)}}} {count}")
+            out.append(f"hrms_request_duration_seconds_bucket{{{_labels(endpoint=endpoint, le='+Inf')}}} {values[-2]}")
+            out.append(f"hrms_request_duration_seconds_sum{{{_labels(endpoint=endpoint)}}} {values[-1]:.6f}")
+            out.append(f"hrms_request_duration_seconds_count{{{_labels(endpoint=endpoint)}}} {values[-2]}")
+
+        out += [
+            "# HELP hrms_requests_total Responses by endpoint and status code.",
+            "# TYPE hrms_requests_total counter",
+        ]
+        for (endpoint, status), count in sorted(requests.items()):
+            out.append(f"hrms_requests_total{{{_labels(endpoint=endpoint, status=status)}}} {count}")
+
+        for index, (name, help_text) in enumerate((
+            ("hrms_sql_statements_total", "SQLite statements run, by endpoint."),
+            ("hrms_sql_seconds_total", "Time spent executing statements and fetching rows, by endpoint."),
+            ("hrms_sql_rows_total", "Rows fetched, by endpoint."),
+        )):
+            out += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for endpoint, values in sorted(sql.items()):
+                value = f"{values[index]:.6f}" if isinstance(values[index], float) else values[index]
+                out.append(f"{name}{{{_labels(endpoint=endpoint)}}} {value}")
+
+        out += [
+            "# HELP hrms_db_method_calls_total Database method calls made by requests.",
+            "# TYPE hrms_db_method_calls_total counter",
+        ]
+        out += [f"hrms_db_method_calls_total{{{_labels(method=name)}}} {values[0]}"
+                for name, values in sorted(methods.items())]
+        out += [
+            "# HELP hrms_db_method_seconds_total Time spent in Database methods called by requests.",
+            "# TYPE hrms_db_method_seconds_total counter",
+        ]
+        out += [f"hrms_db_method_seconds_total{{{_labels(method=name)}}} {values[1]:.6f}"
+                for name, values in sorted(methods.items())]
+
+        for name, kind, help_text, value in extra:
+            out += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
+        return "\n".join(out) + "\n"
+
+
+def server_timing(stats, duration):
+    """``Server-Timing`` header value for one request."""
+    return (
+        f"app;dur={duration * 1000:.1f}, "
+        f'sql;dur={stats.sql_time * 1000:.1f};desc="{stats.statements} statements, {stats.rows} rows"'
+    )
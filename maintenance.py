@@ -0,0 +1,137 @@
+"""
+Check and rebuild derived tables and files from the data they summarise.
+
+    python maintenance.py wiki-views check   [--db project_tracking.db] [--from YYYY-MM-DD] [--to YYYY-MM-DD]
+    python maintenance.py wiki-views rebuild [--db project_tracking.db] [--from YYYY-MM-DD] [--to YYYY-MM-DD]
+    python maintenance.py leave-ledger check|rebuild [--db project_tracking.db]
+    python maintenance.py images check|rebuild
+    python maintenance.py files check|rebuild [--db project_tracking.db] [--store files]
+
+``wiki-views`` is the ``TblWikiViewDaily`` rollup of ``TblWikiViews``;
+``leave-ledger`` is ``TblLeaveLedger``, the leave days per employee, type,
+month and status derived from ``tbl_leave_request``; ``images`` are the
+resized copies of uploaded images (see ``images.py``); ``files`` are the
+reference counts of the content-addressed file store (``filestore.py``), whose
+``rebuild`` also moves invoices and policies uploaded before it into the
+store. ``check`` lists every entry whose stored value differs from its source
+and exits non-zero if there are any; ``rebuild`` recomputes it
+(``--from``/``--to`` limit the wiki view days).
+"""
+
+import argparse
+import os
+import sys
+
+import images
+from database import PRAGMA_PROFILES, Database
+from filestore import FileStore
+
+
+def wiki_views(db, args):
+    if args.command == "rebuild":
+        written = db.rebuild_wiki_view_rollup(args.start, args.end)
+        print(f"TblWikiViewDaily: {written} page-days rebuilt")
+        return 0
+
+    mismatches = db.check_wiki_view_rollup(args.start, args.end)
+    for wiki_id, day, expected, stored in mismatches:
+        print(f"  wiki {wiki_id} {day}: log {expected}, rollup {stored}")
+    print(f"TblWikiViewDaily: {len(mismatches)} page-days differ from TblWikiViews")
+    return 1 if mismatches else 0
+
+
+def leave_ledger(db, args):
+    if args.command == "rebuild":
+        print(f"TblLeaveLedger: {db.rebuild_leave_ledger()} entries rebuilt")
+        return 0
+
+    mismatches = db.check_leave_ledger()
+    for emp_id, leave_type_id, month, status, expected, stored in mismatches:
+        print(f"  employee {emp_id} type {leave_type_id} {month} {status}: "
+              f"requests {expected} days, ledger {stored}")
+    print(f"TblLeaveLedger: {len(mismatches)} entries differ from tbl_leave_request")
+    return 1 if mismatches else 0
+
+
+def image_derivatives(db, args):
+    if args.command == "rebuild":
+        if images.Image is None:
+            print("Pillow is not installed (pip install Pillow)")
+            return 1
+        built = failed = 0
+        for folder in images.FOLDERS:
+            for path in images.originals(folder):
+                try:
+                    images.build(path)
+                    built += 1
+                except (OSError, ValueError) as exc:
+                    print(f"  {path}: {exc}")
+                    failed += 1
+        print(f"derived images: {built} originals rebuilt, {failed} failed")
+        return 1 if failed else 0
+
+    missing = images.stale()
+    for path in missing:
+        print(f"  {path}")
+    print(f"derived images: {len(missing)} originals without current derivatives")
+    return 1 if missing else 0
+
+
+def stored_files(db, args):
+    store = FileStore(args.store, db)
+    if args.command == "rebuild":
+        imported = 0
+        for kind, row_id, path, name in db.get_legacy_uploads():
+            # Some rows were written on Windows.
+            path = path.replace("\\", "/")
+            if not os.path.isfile(path):
+                print(f"  {kind} {row_id}: {path} not found, left as is")
+                continue
+            with open(path, "rb") as f:
+                sha256, _ = store.save(f)
+            name = os.path.basename(name.replace("\\", "/"))
+            db.attach_stored_file(kind, row_id, sha256, store.path(sha256), name)
+            os.remove(path)
+            imported += 1
+        recounted = db.rebuild_stored_file_refs()
+        purged = store.collect()
+        print(f"TblStoredFile: {imported} legacy files imported, {recounted} counts fixed, "
+              f"{len(purged)} unreferenced files removed")
+        return 0
+
+    mismatches = db.check_stored_files()
+    for sha256, expected, stored in mismatches:
+        print(f"  {sha256}: {expected} references, RefCount {stored}")
+    missing = store.missing()
+    for sha256 in missing:
+        print(f"  {sha256}: file missing from {args.store}")
+    print(f"TblStoredFile: {len(mismatches)} counts differ from their references, "
+          f"{len(missing)} files missing")
+    return 1 if mismatches or missing else 0
+
+
+TARGETS = {
+    "wiki-views": wiki_views,
+    "leave-ledger": leave_ledger,
+    "images": image_derivatives,
+    "files": stored_files,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python maintenance.py")
+    parser.add_argument("target", choices=list(TARGETS))
+    parser.add_argument("command", choices=["check", "rebuild"])
+    parser.add_argument("--db", default="project_tracking.db")
+    parser.add_argument("--profile", default="prod", choices=list(PRAGMA_PROFILES))
+    parser.add_argument("--from", dest="start", default=None, help="first day (inclusive)")
+    parser.add_argument("--to", dest="end", default=None, help="last day (inclusive)")
+    parser.add_argument("--store", default="files", help="file store directory")
+    args = parser.parse_args(argv)
+
+    db = Database(args.db, profile=args.profile)
+    return TARGETS[args.target](db, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
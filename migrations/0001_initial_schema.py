@@ -0,0 +1,181 @@
+"""Baseline schema: the core HRMS tables."""
+
+
+def upgrade(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS tbl_employee (
+            emp_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            first_name TEXT NOT NULL,
+            last_name TEXT NOT NULL,
+            gender TEXT NOT NULL,
+            dob DATE NOT NULL,
+            address TEXT NOT NULL,
+            phone_no TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            status TEXT DEFAULT 'active',
+            emp_type TEXT DEFAULT 'emp',
+            inserted_date DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS tbl_project (
+            project_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            project_name TEXT NOT NULL,
+            priority TEXT NOT NULL,
+            project_desc TEXT,
+            project_status TEXT DEFAULT 'active',
+            start_date DATE NOT NULL,
+            end_date DATE,
+            inserted_date DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS tbl_task (
+            task_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            project_id INTEGER NOT NULL,
+            emp_id INTEGER NOT NULL,
+            task_desc TEXT NOT NULL,
+            priority TEXT NOT NULL,
+            status TEXT DEFAULT 'pending',
+            start_date DATE NOT NULL,
+            end_date DATE,
+            inserted_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (project_id) REFERENCES tbl_project (project_id),
+            FOREIGN KEY (emp_id) REFERENCES tbl_employee (emp_id)
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS tbl_task_details (
+            detail_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_id INTEGER NOT NULL,
+            desc TEXT NOT NULL,
+            inserted_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+            status TEXT DEFAULT 'incomplete',
+            FOREIGN KEY (task_id) REFERENCES tbl_task (task_id)
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS tbl_leave_type (
+            leave_type_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            leave_type     TEXT NOT NULL UNIQUE CHECK (LENGTH(leave_type)<=50),
+            inserted_date  DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS tbl_leave_request (
+            request_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+            leave_type_id   INTEGER NOT NULL,
+            employee_id     INTEGER NOT NULL,
+            start_date      DATE    NOT NULL,
+            end_date        DATE    NOT NULL,
+            leave_desc      TEXT    CHECK (LENGTH(leave_desc)<=500),
+            manager_id      INTEGER,
+            comments        TEXT    CHECK (LENGTH(comments)<=200),
+            status          TEXT    DEFAULT 'pending',   -- pending/approved/rejected
+            inserted_date   DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (leave_type_id) REFERENCES tbl_leave_type(leave_type_id),
+            FOREIGN KEY (employee_id)  REFERENCES tbl_employee(emp_id),
+            FOREIGN KEY (manager_id)   REFERENCES tbl_employee(emp_id)
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS tbl_expense_type (
+            expense_type_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            expense_type    TEXT NOT NULL UNIQUE,            -- duplication guard
+            inserted_date   DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS tbl_expenses (
+            expense_id        INTEGER PRIMARY KEY AUTOINCREMENT,
+            expense_type_id   INTEGER NOT NULL,
+            employee_id       INTEGER NOT NULL,
+            exp_description   TEXT CHECK (LENGTH(exp_description)<=500),
+            manager_id        INTEGER,                      -- who will approve
+            approver_comments TEXT CHECK (LENGTH(approver_comments)<=200),
+            given_by_id       INTEGER,                      -- who reimbursed / paid
+            final_comments    TEXT CHECK (LENGTH(final_comments)<=200),
+            status            TEXT  DEFAULT 'pending',      -- pending/approved/rejected
+            inserted_date     DATETIME DEFAULT CURRENT_TIMESTAMP,
+            amount            REAL,
+
+            FOREIGN KEY (expense_type_id) REFERENCES tbl_expense_type(expense_type_id),
+            FOREIGN KEY (employee_id)     REFERENCES tbl_employee(emp_id),
+            FOREIGN KEY (manager_id)      REFERENCES tbl_employee(emp_id),
+            FOREIGN KEY (given_by_id)     REFERENCES tbl_employee(emp_id)
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS TblWikiCategory (
+            CategoryId INTEGER PRIMARY KEY AUTOINCREMENT,
+            Category   TEXT    NOT NULL,
+            CatImg     TEXT,
+            inserted_date DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS TblPolicies (
+            PolicyID          INTEGER PRIMARY KEY AUTOINCREMENT,
+            PolicyName        TEXT    NOT NULL UNIQUE,
+            FilePath          TEXT    NOT NULL,
+            FileName          TEXT    NOT NULL,      -- timestamp-prefixed name on disk
+            OriginalFileName  TEXT    NOT NULL,      -- name user uploaded
+            FileSize          INTEGER NOT NULL,      -- bytes
+            UploadedAt        TEXT    NOT NULL       -- ISO-8601 timestamp
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS TblWikiPage (
+            WikiId       INTEGER PRIMARY KEY AUTOINCREMENT,
+            CategoryId   INTEGER NOT NULL,
+            Title        TEXT    NOT NULL,
+            Descri       TEXT,
+            InsertedDate DATETIME DEFAULT CURRENT_TIMESTAMP,
+            RowStatus    INTEGER DEFAULT 0,
+            FOREIGN KEY (CategoryId) REFERENCES TblWikiCategory(CategoryId)
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS TblWikiViews (
+            WikiViewId   INTEGER PRIMARY KEY AUTOINCREMENT,
+            WikiId       INTEGER NOT NULL,
+            EmployeeId   INTEGER NOT NULL,
+            ViewDateTime DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (WikiId)     REFERENCES TblWikiPage(WikiId),
+            FOREIGN KEY (EmployeeId) REFERENCES tbl_employee(emp_id)
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS TblEmployeeProfile (
+            ProfileId INTEGER PRIMARY KEY AUTOINCREMENT,
+            EmployeeId INTEGER NOT NULL UNIQUE,
+            EmgUpdatedByEmp INTEGER DEFAULT 0,
+            UANNo TEXT,
+            PANNO TEXT,
+            AadharNo TEXT,
+            BankName TEXT,
+            BranchName TEXT,
+            ACNo TEXT,
+            IFSCode TEXT,
+            Designation TEXT,
+            EmgContact TEXT,
+            ReportingMng TEXT,
+            DOJ DATE,
+            PrgLng TEXT,
+            FrmWrk TEXT,
+            FOREIGN KEY(EmployeeId) REFERENCES tbl_employee(emp_id)
+        )
+    """)
@@ -0,0 +1,57 @@
+"""
+Secondary indexes for the hot lookups and paginated listings.
+
+Each index is built and committed on its own so the migration can run against
+a live WAL database: readers are never blocked, and writers only wait for the
+index currently being built. Indexes on tables that only exist in some
+installs (assets) are skipped when the table is missing.
+"""
+
+from migrations import table_exists
+
+TRANSACTIONAL = False
+
+INDEXES = [
+    # get_tasks_by_employee / delete_employee; status filter on the dashboard
+    ("idx_task_emp_status", "tbl_task", "emp_id, status"),
+    # get_tasks_by_project / delete_project, newest first
+    ("idx_task_project_inserted", "tbl_task", "project_id, inserted_date"),
+    # task listing ordered by inserted_date, with and without a status filter
+    ("idx_task_inserted", "tbl_task", "inserted_date"),
+    ("idx_task_status_inserted", "tbl_task", "status, inserted_date"),
+    # get_task_details / has_task_detail_today
+    ("idx_task_details_task_inserted", "tbl_task_details", "task_id, inserted_date"),
+    # employee leave history and the admin listing
+    ("idx_leave_request_emp_inserted", "tbl_leave_request", "employee_id, inserted_date"),
+    ("idx_leave_request_status_inserted", "tbl_leave_request", "status, inserted_date"),
+    ("idx_leave_request_inserted", "tbl_leave_request", "inserted_date"),
+    # expense listings (per employee, by status, newest first)
+    ("idx_expenses_emp_inserted", "tbl_expenses", "employee_id, inserted_date"),
+    ("idx_expenses_status_inserted", "tbl_expenses", "status, inserted_date"),
+    ("idx_expenses_inserted", "tbl_expenses", "inserted_date"),
+    # wiki view log: per-page history and date-range counts (covering)
+    ("idx_wiki_views_wiki_time", "TblWikiViews", "WikiId, ViewDateTime"),
+    ("idx_wiki_views_time_wiki", "TblWikiViews", "ViewDateTime, WikiId"),
+    # asset allocation and issue lookups
+    (
+        "idx_allocate_assets_emp_status",
+        "TblAllocateAssets",
+        "EmployeeId, Status, AllocateDate",
+    ),
+    ("idx_allocate_assets_asset", "TblAllocateAssets", "AssetId"),
+    ("idx_asset_issues_asset_emp_status", "TblAssetIssues", "AssetId, EmployeeId, Status"),
+    ("idx_asset_issues_emp_reported", "TblAssetIssues", "EmployeeId, ReportedDate"),
+]
+
+
+def create_indexes(conn, indexes):
+    for name, table, columns in indexes:
+        if not table_exists(conn, table):
+            continue
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+        conn.commit()
+    conn.execute("PRAGMA optimize")
+
+
+def upgrade(conn):
+    create_indexes(conn, INDEXES)
@@ -0,0 +1,95 @@
+"""
+Tables and columns the app relies on that were only ever created by hand in
+the production database: careers, assets, asset allocation and issues, policy
+acknowledgments, and the approval/invoice columns on ``tbl_expenses``.
+"""
+
+from migrations import add_column
+
+
+def upgrade(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS TblCareers (
+            CareerId INTEGER PRIMARY KEY AUTOINCREMENT,
+            JobTitle TEXT(200),
+            Exp TEXT(100),
+            Sal TEXT(50),
+            Location TEXT(50),
+            Description TEXT(1000),
+            BannerImg TEXT(50)
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS TblAssets (
+            AssetId INTEGER PRIMARY KEY AUTOINCREMENT,
+            ItemName TEXT(250),
+            Model TEXT(100),
+            Price REAL,
+            Descriptions TEXT(500),
+            Status TEXT(50)
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS TblAllocateAssets (
+            AllocatedId INTEGER PRIMARY KEY AUTOINCREMENT,
+            AssetId INTEGER NOT NULL,
+            EmployeeId INTEGER NOT NULL,
+            AllocateDate DATE,
+            Status TEXT(50),
+            AllocatedBy TEXT,
+            Description TEXT,
+            FOREIGN KEY(AssetId) REFERENCES TblAssets(AssetId),
+            FOREIGN KEY(EmployeeId) REFERENCES tbl_employee(emp_id)
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS TblAssetIssues (
+            IssueId INTEGER PRIMARY KEY AUTOINCREMENT,
+            AssetId INTEGER NOT NULL,
+            EmployeeId INTEGER NOT NULL,
+            IssueText TEXT NOT NULL,
+            ReportedDate TEXT DEFAULT CURRENT_DATE,
+            Status TEXT DEFAULT 'Open',
+            ResolvedComment TEXT,
+            ResolvedDate TEXT,
+            FOREIGN KEY (AssetId) REFERENCES TblAssets(AssetId),
+            FOREIGN KEY (EmployeeId) REFERENCES tbl_employee(emp_id)
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS TblPolicyAcknowledgments (
+            AckID INTEGER PRIMARY KEY AUTOINCREMENT,
+            PolicyID INTEGER NOT NULL,
+            EmployeeID INTEGER NOT NULL,
+            Status TEXT NOT NULL CHECK (Status IN ('pending', 'accepted', 'rejected', 'hold')),
+            AcknowledgedAt DATETIME,
+            HoldReason TEXT,
+            HoldRequestedAt DATETIME,
+            IPAddress TEXT,
+            UserAgent TEXT,
+            Notes TEXT,
+            FOREIGN KEY (PolicyID) REFERENCES TblPolicies(PolicyID),
+            FOREIGN KEY (EmployeeID) REFERENCES tbl_employee(emp_id),
+            UNIQUE(PolicyID, EmployeeID)
+        )
+    """)
+
+    add_column(conn, "tbl_expenses", "approved_date", "DATETIME NULL")
+    add_column(conn, "tbl_expenses", "approved_by", "TEXT")
+    add_column(conn, "tbl_expenses", "expense_date", "DATE")
+    add_column(conn, "tbl_expenses", "invoice_path", "TEXT")
+    add_column(conn, "TblEmployeeProfile", "EmgUpdatedByEmp", "INTEGER DEFAULT 0")
+
+    # The 0002 indexes for these tables are skipped on installs that did not
+    # have them yet.
+    for name, table, columns in (
+        ("idx_allocate_assets_emp_status", "TblAllocateAssets", "EmployeeId, Status, AllocateDate"),
+        ("idx_allocate_assets_asset", "TblAllocateAssets", "AssetId"),
+        ("idx_asset_issues_asset_emp_status", "TblAssetIssues", "AssetId, EmployeeId, Status"),
+        ("idx_asset_issues_emp_reported", "TblAssetIssues", "EmployeeId, ReportedDate"),
+    ):
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
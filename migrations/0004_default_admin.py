@@ -0,0 +1,26 @@
+"""Seed the default admin account (admin@company.com / admin123) if no admin exists."""
+
+import hashlib
+
+
+def upgrade(conn):
+    if conn.execute("SELECT 1 FROM tbl_employee WHERE emp_type = 'admin' LIMIT 1").fetchone():
+        return
+    conn.execute(
+        """
+        INSERT INTO tbl_employee
+        (first_name, last_name, gender, dob, address, phone_no, email, password, emp_type)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """,
+        (
+            "Admin",
+            "User",
+            "Male",
+            "1990-01-01",
+            "Admin Address",
+            "1234567890",
+            "admin@company.com",
+            hashlib.sha256("admin123".encode()).hexdigest(),
+            "admin",
+        ),
+    )
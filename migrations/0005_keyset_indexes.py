@@ -0,0 +1,26 @@
+"""
+Composite (filter column, inserted_date) indexes for the cursor-paginated
+listings. Together with the rowid that SQLite appends to every index, each one
+serves ``WHERE col = ? AND (inserted_date, id) < (?, ?) ORDER BY inserted_date
+DESC, id DESC`` as a bounded index range scan. The unfiltered and
+status-filtered keys are already covered by migration 0002.
+"""
+
+import importlib
+
+TRANSACTIONAL = False
+
+INDEXES = [
+    # view_tasks filtered by employee
+    ("idx_task_emp_inserted", "tbl_task", "emp_id, inserted_date"),
+    # admin_leave_requests filtered by leave type
+    ("idx_leave_request_type_inserted", "tbl_leave_request", "leave_type_id, inserted_date"),
+    # existing_expenses filtered by expense type
+    ("idx_expenses_type_inserted", "tbl_expenses", "expense_type_id, inserted_date"),
+]
+
+
+def upgrade(conn):
+    importlib.import_module("migrations.0002_hot_lookup_indexes").create_indexes(
+        conn, INDEXES
+    )
@@ -0,0 +1,42 @@
+"""
+Month-day ordinals (``MMDD`` as an integer, e.g. 1231) for birthdays and work
+anniversaries: ``tbl_employee.dob_md`` and ``TblEmployeeProfile.doj_md``.
+
+Triggers keep them in step with ``dob``/``DOJ`` on every insert and update,
+whichever code path writes the row, and the indexes let the celebration
+queries select an upcoming window as a range instead of evaluating date
+arithmetic for every employee.
+"""
+
+from migrations import add_column
+
+ORDINALS = [
+    # (table, key column, date column, ordinal column)
+    ("tbl_employee", "emp_id", "dob", "dob_md"),
+    ("TblEmployeeProfile", "EmployeeId", "DOJ", "doj_md"),
+]
+
+
+def upgrade(conn):
+    for table, key, source, column in ORDINALS:
+        add_column(conn, table, column, "INTEGER")
+        value = f"CAST(strftime('%m%d', NEW.{source}) AS INTEGER)"
+        for event in ("INSERT", f"UPDATE OF {source}"):
+            name = f"trg_{table.lower()}_{column}_{event.split()[0].lower()}"
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {name}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE {table} SET {column} = {value} WHERE {key} = NEW.{key};
+                END
+            """)
+        conn.execute(
+            f"UPDATE {table} SET {column} = CAST(strftime('%m%d', {source}) AS INTEGER)"
+        )
+
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_employee_status_dob_md ON tbl_employee (status, dob_md)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_employee_profile_doj_md ON TblEmployeeProfile (doj_md)"
+    )
@@ -0,0 +1,72 @@
+"""
+Daily rollup of the wiki view log: ``TblWikiViewDaily`` holds one row per
+page and UTC day with the number of views and of distinct viewers.
+
+A trigger on ``TblWikiViews`` folds every inserted view into its day as part
+of the same transaction, whichever code path records it (the write-behind
+recorder inserts a whole batch in one), so the report reads a few rows per
+page and day instead of aggregating the raw log. Existing views are backfilled
+here; ``python maintenance.py wiki-views rebuild`` recomputes any day range
+from the raw log.
+
+``idx_wiki_views_wiki_emp_time`` answers the trigger's "has this employee
+already viewed this page today" probe. The raw listing is paged newest first
+by ``(ViewDateTime, WikiViewId)``, which ``idx_wiki_views_time`` serves
+directly; it replaces ``idx_wiki_views_time_wiki``, whose only reader was the
+date-range count that now comes from the rollup.
+"""
+
+UNIQUE_VIEWER = """
+    NOT EXISTS (
+        SELECT 1 FROM TblWikiViews
+        WHERE WikiId = NEW.WikiId
+          AND EmployeeId = NEW.EmployeeId
+          AND ViewDateTime >= DATE(NEW.ViewDateTime)
+          AND ViewDateTime < DATE(NEW.ViewDateTime, '+1 day')
+          AND WikiViewId <> NEW.WikiViewId
+    )
+"""
+
+
+def upgrade(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS TblWikiViewDaily (
+            WikiId        INTEGER NOT NULL,
+            Day           TEXT    NOT NULL,
+            Views         INTEGER NOT NULL DEFAULT 0,
+            UniqueViewers INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (WikiId, Day)
+        ) WITHOUT ROWID
+    """)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_wiki_view_daily_day "
+        "ON TblWikiViewDaily (Day, WikiId, Views, UniqueViewers)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_wiki_views_wiki_emp_time "
+        "ON TblWikiViews (WikiId, EmployeeId, ViewDateTime)"
+    )
+    conn.execute("DROP INDEX IF EXISTS idx_wiki_views_time_wiki")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_wiki_views_time ON TblWikiViews (ViewDateTime)")
+
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_tblwikiviews_daily_insert
+        AFTER INSERT ON TblWikiViews
+        WHEN NEW.ViewDateTime IS NOT NULL
+        BEGIN
+            INSERT INTO TblWikiViewDaily (WikiId, Day, Views, UniqueViewers)
+            VALUES (NEW.WikiId, DATE(NEW.ViewDateTime), 1, 1)
+            ON CONFLICT (WikiId, Day) DO UPDATE SET
+                Views = Views + 1,
+                UniqueViewers = UniqueViewers + ({UNIQUE_VIEWER});
+        END
+    """)
+
+    conn.execute("DELETE FROM TblWikiViewDaily")
+    conn.execute("""
+        INSERT INTO TblWikiViewDaily (WikiId, Day, Views, UniqueViewers)
+        SELECT WikiId, DATE(ViewDateTime), COUNT(*), COUNT(DISTINCT EmployeeId)
+        FROM TblWikiViews
+        WHERE ViewDateTime IS NOT NULL
+        GROUP BY WikiId, DATE(ViewDateTime)
+    """)
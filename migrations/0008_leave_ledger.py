@@ -0,0 +1,51 @@
+"""
+Leave ledger: ``TblLeaveLedger`` holds the number of leave days per employee,
+leave type, calendar month (``YYYY-MM``) and request status. A request that
+spans several months contributes the days falling in each of them.
+
+``Database.add_leave_request``, ``update_leave_status`` and
+``delete_leave_request`` adjust it in the same transaction as the request
+row, so the leave summary sums a handful of ledger rows per employee instead
+of rescanning every request. The ledger is backfilled here from the existing
+requests; ``python maintenance.py leave-ledger check|rebuild`` compares it
+with, or rebuilds it from, ``tbl_leave_request``.
+"""
+
+# One row per request and month it touches: (s, e) is the part of the
+# request inside that month.
+LEDGER_ROWS = """
+    WITH RECURSIVE span (employee_id, leave_type_id, status, s, e) AS (
+        SELECT employee_id, leave_type_id, COALESCE(status, 'pending'),
+               DATE(start_date), DATE(end_date)
+        FROM tbl_leave_request
+        WHERE DATE(end_date) >= DATE(start_date)
+        UNION ALL
+        SELECT employee_id, leave_type_id, status,
+               DATE(s, 'start of month', '+1 month'), e
+        FROM span
+        WHERE DATE(s, 'start of month', '+1 month') <= e
+    )
+    SELECT employee_id, leave_type_id, strftime('%Y-%m', s), status,
+           CAST(SUM(JULIANDAY(MIN(e, DATE(s, 'start of month', '+1 month', '-1 day')))
+                    - JULIANDAY(s) + 1) AS INTEGER)
+    FROM span
+    GROUP BY 1, 2, 3, 4
+"""
+
+
+def upgrade(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS TblLeaveLedger (
+            EmployeeId  INTEGER NOT NULL,
+            LeaveTypeId INTEGER NOT NULL,
+            Month       TEXT    NOT NULL,
+            Status      TEXT    NOT NULL,
+            Days        INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (EmployeeId, Month, LeaveTypeId, Status)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("DELETE FROM TblLeaveLedger")
+    conn.execute(
+        "INSERT INTO TblLeaveLedger (EmployeeId, LeaveTypeId, Month, Status, Days) "
+        + LEDGER_ROWS
+    )
@@ -0,0 +1,50 @@
+"""
+Canonical UTC epoch-second timestamps for expenses: ``tbl_expenses.inserted_ts``
+and ``approved_ts``.
+
+``inserted_date``/``approved_date`` hold a mix of tz-aware ISO strings
+(written by ``add_expense``/``update_expense_status``) and naive
+``CURRENT_TIMESTAMP`` text. SQLite's ``strftime('%s', ...)`` normalises both
+to UTC, and triggers keep the integer columns in step on every insert and
+update, whichever code path writes the row. The expense listing orders, pages
+and filters by date on the integers, so its indexes move to them as well.
+"""
+
+from migrations import add_column
+
+TIMESTAMPS = [
+    # (source column, epoch column)
+    ("inserted_date", "inserted_ts"),
+    ("approved_date", "approved_ts"),
+]
+
+INDEXES = [
+    # (old text-date index, new index, columns)
+    ("idx_expenses_inserted", "idx_expenses_inserted_ts", "inserted_ts"),
+    ("idx_expenses_status_inserted", "idx_expenses_status_inserted_ts", "status, inserted_ts"),
+    ("idx_expenses_emp_inserted", "idx_expenses_emp_inserted_ts", "employee_id, inserted_ts"),
+    ("idx_expenses_type_inserted", "idx_expenses_type_inserted_ts", "expense_type_id, inserted_ts"),
+]
+
+
+def upgrade(conn):
+    for source, column in TIMESTAMPS:
+        add_column(conn, "tbl_expenses", column, "INTEGER")
+        value = f"CAST(strftime('%s', NEW.{source}) AS INTEGER)"
+        for event in ("INSERT", f"UPDATE OF {source}"):
+            name = f"trg_tbl_expenses_{column}_{event.split()[0].lower()}"
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {name}
+                AFTER {event} ON tbl_expenses
+                BEGIN
+                    UPDATE tbl_expenses SET {column} = {value}
+                    WHERE expense_id = NEW.expense_id;
+                END
+            """)
+        conn.execute(
+            f"UPDATE tbl_expenses SET {column} = CAST(strftime('%s', {source}) AS INTEGER)"
+        )
+
+    for old, name, columns in INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {old}")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON tbl_expenses ({columns})")
@@ -0,0 +1,39 @@
+"""
+Per-table version counters for the reference-data cache.
+
+``TblCacheVersion`` holds one counter per cached lookup table. Triggers bump
+it on every insert, update and delete of that table, whichever connection or
+worker process commits the change, so ``Database``'s in-process cache can
+tell whether its copy is still current by reading one tiny row.
+"""
+
+TABLES = [
+    "tbl_employee",
+    "tbl_project",
+    "tbl_leave_type",
+    "tbl_expense_type",
+    "TblWikiCategory",
+]
+
+
+def upgrade(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS TblCacheVersion (
+            TableName TEXT PRIMARY KEY,
+            Version   INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """)
+    for table in TABLES:
+        conn.execute(
+            "INSERT OR IGNORE INTO TblCacheVersion (TableName, Version) VALUES (?, 0)",
+            (table,),
+        )
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table.lower()}_version_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE TblCacheVersion SET Version = Version + 1
+                    WHERE TableName = '{table}';
+                END
+            """)
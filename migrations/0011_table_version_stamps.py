@@ -0,0 +1,52 @@
+"""
+Version stamps for conditional GET.
+
+Extends ``TblCacheVersion`` (migration 0010) with ``Modified``, the epoch
+second of the table's last write, and adds counters for the tables behind
+the list pages and JSON endpoints that answer ``If-None-Match`` /
+``If-Modified-Since``. The version triggers of all tracked tables are
+recreated so every write bumps both columns.
+"""
+
+from migrations import add_column
+
+TABLES = [
+    # reference tables from 0010
+    "tbl_employee",
+    "tbl_project",
+    "tbl_leave_type",
+    "tbl_expense_type",
+    "TblWikiCategory",
+    # listings and detail endpoints
+    "tbl_task",
+    "tbl_task_details",
+    "tbl_leave_request",
+    "tbl_expenses",
+    "TblWikiPage",
+]
+
+
+def upgrade(conn):
+    add_column(conn, "TblCacheVersion", "Modified", "INTEGER NOT NULL DEFAULT 0")
+    for table in TABLES:
+        conn.execute(
+            "INSERT OR IGNORE INTO TblCacheVersion (TableName, Version) VALUES (?, 0)",
+            (table,),
+        )
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            name = f"trg_{table.lower()}_version_{event.lower()}"
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+            conn.execute(f"""
+                CREATE TRIGGER {name}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE TblCacheVersion
+                    SET Version = Version + 1,
+                        Modified = CAST(strftime('%s', 'now') AS INTEGER)
+                    WHERE TableName = '{table}';
+                END
+            """)
+    conn.execute(
+        "UPDATE TblCacheVersion SET Modified = CAST(strftime('%s', 'now') AS INTEGER) "
+        "WHERE Modified = 0"
+    )
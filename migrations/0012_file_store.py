@@ -0,0 +1,59 @@
+"""
+Content-addressed file store for expense invoices and policy PDFs.
+
+``TblStoredFile`` has one row per distinct file content, keyed by its
+SHA-256, with the number of ``tbl_expenses.invoice_sha256`` and
+``TblPolicies.Sha256`` values pointing at it. Triggers keep ``RefCount``
+current on every insert, update and delete of either column, whichever code
+path writes the row; ``filestore.FileStore`` registers the content before the
+referencing row is written and removes files no row points at any more.
+``Touched`` is the epoch second the content was last uploaded, so a file that
+was just stored but not yet referenced is not collected.
+
+Rows written before this migration keep their path columns and no hash;
+``python maintenance.py files rebuild`` moves those files into the store.
+"""
+
+from migrations import add_column
+
+REFERENCES = [
+    # (table, hash column)
+    ("tbl_expenses", "invoice_sha256"),
+    ("TblPolicies", "Sha256"),
+]
+
+
+def upgrade(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS TblStoredFile (
+            Sha256   TEXT    PRIMARY KEY,
+            Size     INTEGER NOT NULL,
+            RefCount INTEGER NOT NULL DEFAULT 0,
+            Touched  INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+    for table, column in REFERENCES:
+        add_column(conn, table, column, "TEXT")
+        prefix = f"trg_{table.lower()}_{column.lower()}"
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {prefix}_insert
+            AFTER INSERT ON {table} WHEN NEW.{column} IS NOT NULL
+            BEGIN
+                UPDATE TblStoredFile SET RefCount = RefCount + 1 WHERE Sha256 = NEW.{column};
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {prefix}_delete
+            AFTER DELETE ON {table} WHEN OLD.{column} IS NOT NULL
+            BEGIN
+                UPDATE TblStoredFile SET RefCount = RefCount - 1 WHERE Sha256 = OLD.{column};
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {prefix}_update
+            AFTER UPDATE OF {column} ON {table} WHEN OLD.{column} IS NOT NEW.{column}
+            BEGIN
+                UPDATE TblStoredFile SET RefCount = RefCount - 1 WHERE Sha256 = OLD.{column};
+                UPDATE TblStoredFile SET RefCount = RefCount + 1 WHERE Sha256 = NEW.{column};
+            END
+        """)
@@ -0,0 +1,10 @@
+"""
+Drop ``idx_leave_request_summary``. It covered the join of the old
+``get_leave_summary`` over ``tbl_leave_request``; the summary reads
+``TblLeaveLedger`` since migration 0008, so the index only slowed down
+leave request writes.
+"""
+
+
+def upgrade(conn):
+    conn.execute("DROP INDEX IF EXISTS idx_leave_request_summary")
@@ -0,0 +1,137 @@
+"""
+Versioned schema migrations.
+
+Each migration is a module in this package named ``NNNN_description.py`` that
+defines ``upgrade(conn)``. Migrations run in version order and every applied
+version is recorded in the ``schema_version`` table, so a database only ever
+runs the ones it has not seen. Migrations must be idempotent (``IF NOT EXISTS``
+and friends) so they are safe against databases that were created by hand.
+
+The highest applied version is mirrored into ``PRAGMA user_version``; checking
+whether a database is current is a single integer comparison against
+``latest_version()``, which only looks at file names.
+
+Apply or inspect migrations from the command line with ``python -m migrations``.
+
+By default a migration runs inside a single ``BEGIN IMMEDIATE`` transaction.
+Long-running ones (index builds, backfills) can set ``TRANSACTIONAL = False``
+and commit in smaller steps themselves, which keeps writers on a live database
+blocked only briefly.
+"""
+
+import importlib
+import os
+import re
+
+_MIGRATION_RE = re.compile(r"^(\d{4})_(\w+)\.py$")
+
+
+def _files():
+    for filename in os.listdir(os.path.dirname(__file__)):
+        match = _MIGRATION_RE.match(filename)
+        if match:
+            yield int(match.group(1)), match.group(2), filename[:-3]
+
+
+def latest_version():
+    """Highest migration version shipped with the code (no imports)."""
+    return max((version for version, _, _ in _files()), default=0)
+
+
+def discover():
+    """Return ``[(version, name, module)]`` sorted by version."""
+    found = [
+        (version, name, importlib.import_module(f"{__name__}.{module}"))
+        for version, name, module in _files()
+    ]
+    found.sort(key=lambda m: m[0])
+    return found
+
+
+def stored_version(conn):
+    """The version recorded in the database header (``PRAGMA user_version``)."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def is_current(conn):
+    return stored_version(conn) >= latest_version()
+
+
+def table_exists(conn, table):
+    return (
+        conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone()
+        is not None
+    )
+
+
+def column_exists(conn, table, column):
+    return any(row[1] == column for row in conn.execute(f"PRAGMA table_info({table})"))
+
+
+def add_column(conn, table, column, decl):
+    """``ALTER TABLE ... ADD COLUMN`` unless the column is already there."""
+    if not column_exists(conn, table, column):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def ensure_version_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version    INTEGER PRIMARY KEY,
+            name       TEXT NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.commit()
+
+
+def current_version(conn):
+    ensure_version_table(conn)
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def applied_versions(conn):
+    ensure_version_table(conn)
+    return {row[0] for row in conn.execute("SELECT version FROM schema_version")}
+
+
+def upgrade(conn, target=None, log=None):
+    """
+    Apply every pending migration up to ``target`` (default: latest).
+    Returns the list of ``(version, name)`` pairs that were applied.
+
+    Safe to call from several workers at once: each transactional migration
+    re-checks ``schema_version`` after taking the write lock, and recording a
+    version is ``INSERT OR IGNORE``.
+    """
+    applied = []
+    done = applied_versions(conn)
+    for number, name, module in discover():
+        if number in done or (target is not None and number > target):
+            continue
+        transactional = getattr(module, "TRANSACTIONAL", True)
+        try:
+            if transactional:
+                conn.execute("BEGIN IMMEDIATE")
+                if conn.execute(
+                    "SELECT 1 FROM schema_version WHERE version = ?", (number,)
+                ).fetchone():
+                    conn.rollback()
+                    continue
+            if log:
+                log(f"Applying migration {number:04d}_{name}")
+            module.upgrade(conn)
+            conn.execute(
+                "INSERT OR IGNORE INTO schema_version (version, name) VALUES (?, ?)",
+                (number, name),
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append((number, name))
+
+    conn.execute(f"PRAGMA user_version = {current_version(conn)}")
+    return applied
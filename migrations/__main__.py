@@ -0,0 +1,41 @@
+"""
+Command-line entry point for schema migrations.
+
+    python -m migrations status  [--db project_tracking.db]
+    python -m migrations upgrade [--db project_tracking.db] [--to N]
+"""
+
+import argparse
+import sqlite3
+
+import migrations
+from database import PRAGMA_PROFILES, apply_pragmas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m migrations")
+    parser.add_argument("command", choices=["status", "upgrade"])
+    parser.add_argument("--db", default="project_tracking.db")
+    parser.add_argument("--profile", default="prod", choices=list(PRAGMA_PROFILES))
+    parser.add_argument("--to", type=int, default=None, help="stop after this version")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    apply_pragmas(conn, args.profile)
+    try:
+        if args.command == "upgrade":
+            applied = migrations.upgrade(conn, target=args.to, log=print)
+            if not applied:
+                print("Nothing to apply.")
+
+        done = migrations.applied_versions(conn)
+        print(f"{args.db}: schema version {migrations.stored_version(conn)}")
+        for version, name, _ in migrations.discover():
+            mark = "applied" if version in done else "pending"
+            print(f"  {version:04d}_{name:<32} {mark}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
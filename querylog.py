@@ -0,0 +1,144 @@
+"""
+Slow query log: statements that took at least ``threshold`` seconds,
+aggregated by the fingerprint of their normalised SQL.
+
+``instrumentation.TimedCursor`` times each statement from ``execute`` until
+its last row is fetched and hands the slow ones to ``SlowQueryLog.record``
+with the ``Database`` method that ran it. The SQL is normalised (literals
+and ``IN``/``VALUES`` lists become placeholders, comments and whitespace are
+dropped); of the bound parameters only the types are kept. The first time a
+fingerprint is seen its ``EXPLAIN QUERY PLAN`` is captured on the same
+connection with the same parameters, and the tables it reads with a full
+scan are listed. Each slow statement is logged on the ``slow_query`` logger
+at WARNING; ``entries()`` returns the aggregate for the admin page.
+"""
+
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger("slow_query")
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_VALUES = re.compile(r"(VALUES\s*\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+", re.I)
+_NAMED = re.compile(r"[:@$]\w+|\?\d*")
+_SPACE = re.compile(r"\s+")
+# SCAN <table> [AS alias] without an index; not SCAN CONSTANT ROW/SUBQUERY.
+_FULL_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW|SUBQUERY|\()(\S+)(?!.*\bUSING\b)")
+
+
+def normalize(sql):
+    sql = _COMMENTS.sub(" ", sql)
+    sql = _STRINGS.sub("?", sql)
+    sql = _NAMED.sub("?", sql)
+    sql = _NUMBERS.sub("?", sql)
+    sql = _LISTS.sub("(...)", sql)
+    sql = _VALUES.sub(r"\1", sql)
+    return _SPACE.sub(" ", sql).strip().rstrip(";")
+
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:12]
+
+
+def _type(value):
+    return "NULL" if value is None else type(value).__name__
+
+
+def parameter_shape(parameters, many=False):
+    """Types of the bound parameters, e.g. ``(int, str, NULL)``."""
+    if many:
+        if isinstance(parameters, (list, tuple)):
+            first = parameters[0] if parameters else ()
+            return f"{len(parameters)} x {parameter_shape(first)}"
+        return "many"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {_type(value)}" for key, value in parameters.items()) + "}"
+    return "(" + ", ".join(_type(value) for value in parameters) + ")"
+
+
+def explain(conn, sql, parameters):
+    """EXPLAIN QUERY PLAN as indented lines; None when it can't be run."""
+    try:
+        # A plain cursor, so the plan query itself is not timed or logged.
+        rows = sqlite3.Cursor(conn).execute("EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+    except (sqlite3.Error, ValueError):
+        return None
+    depth = {0: -1}
+    lines = []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node] + detail)
+    return lines
+
+
+def full_scans(plan):
+    return sorted({match.group(1) for line in plan or ()
+                   for match in [_FULL_SCAN.match(line.strip())] if match})
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms=100, max_entries=500):
+        self.threshold = threshold_ms / 1000
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def record(self, conn, sql, parameters, many, method, seconds):
+        normalized = normalize(sql)
+        key = fingerprint(normalized)
+        shape = parameter_shape(parameters, many)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            first = entry is None
+            if first:
+                if len(self._entries) >= self.max_entries:
+                    return
+                entry = self._entries[key] = {
+                    "fingerprint": key, "sql": normalized, "count": 0, "seconds": 0.0,
+                    "max": 0.0, "methods": {}, "shapes": {}, "first_seen": now,
+                    "plan": None, "scans": [],
+                }
+            entry["count"] += 1
+            entry["seconds"] += seconds
+            entry["max"] = max(entry["max"], seconds)
+            entry["last_seen"] = now
+            method = method or "-"
+            entry["methods"][method] = entry["methods"].get(method, 0) + 1
+            entry["shapes"][shape] = entry["shapes"].get(shape, 0) + 1
+            capture = entry["plan"] is None and not many
+            if capture:
+                # Claimed under the lock so one thread captures it.
+                entry["plan"] = []
+
+        if capture:
+            plan = explain(conn, sql, parameters)
+            with self._lock:
+                entry["plan"] = plan
+                entry["scans"] = full_scans(plan)
+        if first:
+            logger.warning(
+                "%.1f ms %s [%s] %s %s\n%s",
+                seconds * 1000, key, method, normalized, shape,
+                "\n".join(entry["plan"] or ["(no plan)"]),
+            )
+        else:
+            logger.warning("%.1f ms %s [%s] %s", seconds * 1000, key, method, shape)
+
+    def entries(self):
+        """Aggregated entries, most total time first."""
+        with self._lock:
+            entries = [dict(entry, methods=dict(entry["methods"]), shapes=dict(entry["shapes"]))
+                       for entry in self._entries.values()]
+        return sorted(entries, key=lambda entry: entry["seconds"], reverse=True)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,13 @@
+// Tailwind build for static/css/tailwind.css (`python assets.py build`).
+// The colours match the config the pages used with the in-browser compiler.
+module.exports = {
+  content: ["./templates/**/*.html", "./app.py"],
+  theme: {
+    extend: {
+      colors: {
+        primary: "#3B82F6",
+        secondary: "#64748B",
+      },
+    },
+  },
+};